@@ -1,10 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
+from app.recommender import blend_scores
+
+METRICS = ("precision", "recall", "ndcg")
+
+@lru_cache(maxsize=None)
+def discount_table(k):
+    """
+    1 / log2(rank + 1) for ranks 1..k and its running sum (the ideal DCG per
+    number of relevant items), accumulated in the same order as ndcg_at_k.
+    """
+    discounts = np.array([1 / np.log2(idx + 2) for idx in range(k)])
+    ideal = np.zeros(k)
+    total = 0.0
+    for idx in range(k):
+        total += discounts[idx]
+        ideal[idx] = total
+    return discounts, ideal
+
+
+def _ground_truth_lengths(ground_truths):
+    return np.fromiter((len(gt) for gt in ground_truths), dtype=np.int64, count=len(ground_truths))
+
+
+def _hit_matrix(recommender, top, ground_truths, lengths):
+    """hit[i, j]: the j-th recommendation of user i is in that user's ground truth."""
+    n_users, n_items = len(top), recommender.n_items
+    gt_rows = recommender.rows_of([news_id for gt in ground_truths for news_id in gt])
+    gt_users = np.repeat(np.arange(n_users), lengths)
+    known = gt_rows >= 0
+    gt_codes = gt_users[known] * n_items + gt_rows[known]
+    top_codes = np.arange(n_users)[:, np.newaxis] * n_items + top
+    return np.isin(top_codes, gt_codes)
+
+
+def _fill_metrics(metrics, rows, hit, lengths, k):
+    """precision/recall/nDCG@k from a hit matrix, rounded like evaluate_user."""
+    discounts, ideal = discount_table(k)
+    hits = hit.sum(axis=1)
+    if hit.shape[1]:
+        dcg = np.cumsum(np.where(hit, discounts[:hit.shape[1]], 0.0), axis=1)[:, -1]
+    else:
+        dcg = np.zeros(len(hit))
+    idcg = ideal[np.minimum(lengths, k) - 1]
+
+    metrics["precision"][rows] = np.round(hits / k, 4)
+    metrics["recall"][rows] = np.round(hits / lengths, 4)
+    metrics["ndcg"][rows] = np.round(dcg / idcg, 4)
+
+
+def _empty_metrics(n_users):
+    return {name: np.zeros(n_users) for name in METRICS}
+
+
+def _batch_metrics(recommender, queries, ground_truths, k, block_size):
+    """
+    Per-user precision/recall/nDCG arrays for users given as query article +
+    ground-truth clicks.
+    """
+    metrics = _empty_metrics(len(queries))
+    for _ in _fill_blocks(metrics, recommender, queries, ground_truths, k, block_size):
+        pass
+    return metrics
+
+
+def _fill_blocks(metrics, recommender, queries, ground_truths, k, block_size):
+    """Fill `metrics` one block of users at a time, yielding the number of users done after each."""
+    gt_lengths = _ground_truth_lengths(ground_truths)
+    for start in range(0, len(queries), block_size):
+        block = slice(start, start + block_size)
+        top = recommender.rank_many(queries[block])[:, :k]
+        hit = _hit_matrix(recommender, top, ground_truths[block], gt_lengths[block])
+        _fill_metrics(metrics, block, hit, gt_lengths[block], k)
+        yield min(start + block_size, len(queries))
+
+
+def _sweep_metrics(recommender, queries, ground_truths, alphas, ks, block_size):
+    """
+    _batch_metrics for every (alpha, k) pair. Content and CF scores are
+    computed and normalized once per block; only the blend and the top-k
+    selection are repeated.
+    """
+    gt_lengths = _ground_truth_lengths(ground_truths)
+    results = {(alpha, k): _empty_metrics(len(queries)) for alpha in alphas for k in ks}
+    for start in range(0, len(queries), block_size):
+        block = slice(start, start + block_size)
+        content_norm = recommender.normalize_content(recommender.calculate_content_scores(queries[block]))
+        cf_scores = recommender.calculate_cf_scores(queries[block])
+
+        for alpha in alphas:
+            hybrid = blend_scores(content_norm, cf_scores, alpha)
+            for k in ks:
+                top = recommender.select_top(hybrid, k)
+                hit = _hit_matrix(recommender, top, ground_truths[block], gt_lengths[block])
+                _fill_metrics(results[(alpha, k)], block, hit, gt_lengths[block], k)
+    return results
+
+
+def _average(metrics):
+    if len(metrics["precision"]) == 0:
+        return {}
+    return {f"avg_{name}": np.mean(metrics[name]) for name in METRICS}
+
 
 class Evaluator:
-    def __init__(self, recommender, user_clicks, k=10):
+    def __init__(self, recommender, user_clicks, k=10, n_jobs=1, block_size=256):
         self.recommender = recommender
         self.user_clicks = user_clicks
         self.k = k
+        self.n_jobs = n_jobs
+        self.block_size = block_size
 
     def precision_at_k(self, actual, predicted):
         if not actual:
@@ -47,6 +153,8 @@ class Evaluator:
 
         # Assume last click is the "query" article
         last_clicked = actual_clicks[-1]
+        if last_clicked not in self.recommender.data:
+            return None
 
         # All earlier clicks are the "ground truth" to predict
         ground_truth = actual_clicks[:-1]
@@ -65,28 +173,75 @@ class Evaluator:
 
         return {"precision": precision, "recall": recall, "ndcg": ndcg}
     
+    def evaluation_queries(self):
+        """(query article, ground truth) of every user evaluate_user would score, in user order."""
+        queries, ground_truths = [], []
+        for actual_clicks in self.user_clicks.values():
+            if len(actual_clicks) < 2 or actual_clicks[-1] not in self.recommender.data:
+                continue
+            queries.append(actual_clicks[-1])
+            ground_truths.append(actual_clicks[:-1])
+        return queries, ground_truths
+
+    def evaluate_users(self):
+        """
+        Same per-user metrics as evaluate_user, computed in blocks: one matrix
+        product per block of query articles and vectorized hit matrices.
+        Shards are spread over a thread pool when n_jobs > 1.
+        """
+        queries, ground_truths = self.evaluation_queries()
+        if self.n_jobs <= 1 or len(queries) <= self.block_size:
+            return _batch_metrics(self.recommender, queries, ground_truths, self.k, self.block_size)
+
+        results = self._run_sharded(_batch_metrics, queries, ground_truths, (self.k, self.block_size))
+        return {name: np.concatenate([r[name] for r in results]) for name in METRICS}
+
     def evaluate_all(self):
         """
         Evaluate across all users.
         Returns average metrics.
         """
-        all_metrics = []
-
-        for user_id in self.user_clicks.keys():
-            metrics = self.evaluate_user(user_id)
-            if metrics:
-                all_metrics.append(metrics)
-
-        if not all_metrics:
-            return {}
-
-        # Average the results
-        avg_precision = np.mean([m["precision"] for m in all_metrics])
-        avg_recall = np.mean([m["recall"] for m in all_metrics])
-        avg_ndcg = np.mean([m["ndcg"] for m in all_metrics])
-
-        return {
-            "avg_precision": avg_precision,
-            "avg_recall": avg_recall,
-            "avg_ndcg": avg_ndcg
-        }
\ No newline at end of file
+        return _average(self.evaluate_users())
+
+    def evaluate_progress(self, block_size=None):
+        """
+        evaluate_all one block of users at a time, in this process: yields
+        (users done, users to evaluate, averages so far) after every block.
+        The last averages are evaluate_all's.
+        """
+        queries, ground_truths = self.evaluation_queries()
+        metrics = _empty_metrics(len(queries))
+        blocks = _fill_blocks(metrics, self.recommender, queries, ground_truths, self.k, block_size or self.block_size)
+        for done in blocks:
+            yield done, len(queries), _average({name: values[:done] for name, values in metrics.items()})
+
+    def sweep(self, alphas, ks):
+        """
+        Evaluate every (alpha, k) combination in one pass over the users.
+        Each row matches evaluate_all for a recommender with that alpha and topk=k.
+        """
+        alphas, ks = list(dict.fromkeys(alphas)), list(dict.fromkeys(ks))
+        queries, ground_truths = self.evaluation_queries()
+        if self.n_jobs <= 1 or len(queries) <= self.block_size:
+            results = _sweep_metrics(self.recommender, queries, ground_truths, alphas, ks, self.block_size)
+        else:
+            shards = self._run_sharded(_sweep_metrics, queries, ground_truths, (alphas, ks, self.block_size))
+            results = {
+                key: {name: np.concatenate([r[key][name] for r in shards]) for name in METRICS}
+                for key in shards[0]
+            }
+
+        return [
+            {"alpha": alpha, "topk": k, **_average(results[(alpha, k)])}
+            for alpha in alphas for k in ks
+        ]
+
+    def _run_sharded(self, worker, queries, ground_truths, extra_args):
+        # Threads share the memory-mapped banks; the matrix products and top-k selections release the GIL
+        shard_size = -(-len(queries) // self.n_jobs)
+        shards = [
+            (self.recommender, queries[i:i + shard_size], ground_truths[i:i + shard_size]) + extra_args
+            for i in range(0, len(queries), shard_size)
+        ]
+        with ThreadPoolExecutor(max_workers=self.n_jobs, thread_name_prefix="evaluate") as pool:
+            return list(pool.map(lambda shard: worker(*shard), shards))
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import threading
+import numpy as np
+from app import utils
+
+CHANGES = "changes.jsonl"
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over L2-normalized vectors: a query probes its
+    `nprobe` closest centroid lists of News IDs, trading recall@k for latency.
+    """
+    def __init__(self, centroids, ids, assignments):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self._lock = threading.Lock()
+
+        ids = np.asarray(ids, dtype=str)
+        assignments = np.asarray(assignments, dtype=np.int32)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(self.n_lists + 1))
+        self.lists = {
+            list_id: ids[order[bounds[list_id]:bounds[list_id + 1]]]
+            for list_id in range(self.n_lists)
+        }
+        self.list_of = dict(zip(ids.tolist(), assignments.tolist()))
+        self._changes = []  # (News ID, list ID or -1 when removed) not yet in the log
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.list_of)
+
+    # ---------- Building ---------- #
+
+    @classmethod
+    def build(cls, ids, vectors, n_lists=None, n_iter=10, sample_size=100_000, seed=0):
+        vectors = utils.normalize_embeddings(vectors)
+        n = len(vectors)
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, min(n, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignments = _nearest(centroids, sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]  # keep centroids that lost all their points
+            centroids = utils.normalize_embeddings(sums)
+
+        return cls(centroids, ids, _nearest(centroids, vectors))
+
+    # ---------- Querying ---------- #
+
+    def search(self, query, nprobe):
+        """News IDs in the `nprobe` lists closest to a normalized query vector."""
+        nprobe = min(nprobe, self.n_lists)
+        scores = self.centroids @ np.asarray(query, dtype=np.float32).reshape(-1)
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        lists = self.lists
+        return np.concatenate([lists[list_id] for list_id in probe.tolist()])
+
+    # ---------- Incremental updates ---------- #
+
+    def add(self, news_id, vector):
+        """Insert an item, or move it to its new list if it is already indexed."""
+        list_id = int(_nearest(self.centroids, utils.normalize_embeddings(np.atleast_2d(vector)))[0])
+        with self._lock:
+            self._remove(news_id)
+            self.lists[list_id] = np.append(self.lists[list_id], news_id)
+            self.list_of[news_id] = list_id
+            self._changes.append((news_id, list_id))
+
+    def add_many(self, news_ids, vectors):
+        """add() for a batch, assigning all vectors to lists in one pass."""
+        list_ids = _nearest(self.centroids, utils.normalize_embeddings(vectors))
+        with self._lock:
+            for news_id in news_ids:
+                self._remove(news_id)
+            for list_id in np.unique(list_ids).tolist():
+                members = np.asarray(news_ids, dtype=str)[list_ids == list_id]
+                self.lists[list_id] = np.concatenate([self.lists[list_id], members])
+            self.list_of.update(zip(news_ids, list_ids.tolist()))
+            self._changes.extend(zip(news_ids, list_ids.tolist()))
+
+    def remove(self, news_id):
+        with self._lock:
+            if self._remove(news_id):
+                self._changes.append((news_id, -1))
+
+    def _remove(self, news_id):
+        list_id = self.list_of.pop(news_id, None)
+        if list_id is not None:
+            members = self.lists[list_id]
+            # Lists are replaced, never mutated, so concurrent searches keep a consistent view
+            self.lists[list_id] = members[members != news_id]
+        return list_id is not None
+
+    def _replay(self, changes):
+        for news_id, list_id in changes:
+            self._remove(news_id)
+            if list_id >= 0:
+                self.lists[list_id] = np.append(self.lists[list_id], news_id)
+                self.list_of[news_id] = list_id
+
+    # ---------- Persistence ---------- #
+
+    def save_changes(self, directory):
+        """Append the assignments changed since the last save to the change log: O(changes), not O(index)."""
+        with self._lock:
+            changes, self._changes = self._changes, []
+        if changes:
+            with open(os.path.join(directory, CHANGES), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps([news_id, list_id]) + "\n" for news_id, list_id in changes))
+
+    def save(self, directory):
+        """Rewrite the full index (at compaction) and start a new change log."""
+        with self._lock:
+            ids = np.asarray(list(self.list_of.keys()), dtype=str)
+            assignments = np.fromiter(self.list_of.values(), dtype=np.int32, count=len(ids))
+            self._changes = []
+        os.makedirs(directory, exist_ok=True)
+        # Swapped in atomically: another worker may be reloading the index meanwhile
+        for name, array in {"centroids": self.centroids, "ids": ids, "assignments": assignments}.items():
+            tmp = os.path.join(directory, f"{name}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"n_lists": self.n_lists, "n_items": len(ids)}, f)
+        # Replaying a log entry already in the arrays is harmless, so a reload in between stays correct
+        open(os.path.join(directory, CHANGES + ".tmp"), "w").close()
+        os.replace(os.path.join(directory, CHANGES + ".tmp"), os.path.join(directory, CHANGES))
+
+    @classmethod
+    def load(cls, directory):
+        index = cls(
+            np.load(os.path.join(directory, "centroids.npy")),
+            np.load(os.path.join(directory, "ids.npy")),
+            np.load(os.path.join(directory, "assignments.npy"))
+        )
+        if os.path.exists(os.path.join(directory, CHANGES)):
+            with open(os.path.join(directory, CHANGES), encoding="utf-8") as f:
+                index._replay(json.loads(line) for line in f if line.strip())
+        return index
+
+
+def _nearest(centroids, vectors, block_size=8192):
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        assignments[start:start + block_size] = np.argmax(vectors[start:start + block_size] @ centroids.T, axis=1)
+    return assignments
+
+
+def exists(directory):
+    return os.path.exists(os.path.join(directory, "meta.json"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the IVF index over the BERT embedding bank.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--store", help="bert_store directory (rows carry their own News IDs)")
+    source.add_argument("--embeddings", help="legacy bert_embeddings.pt, rows aligned with --news")
+    parser.add_argument("--news", help="news.tsv the legacy embedding rows are aligned with")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--n-iter", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.store:
+        from app.embedding_store import EmbeddingStore
+        bank = EmbeddingStore(args.store).bank()
+        live = bank.index.live_rows
+        ids, vectors = bank.ids[live], bank.rows(live)
+    else:
+        if not args.news:
+            parser.error("--news is required with --embeddings")
+        news = utils.load_news_data(args.news)
+        vectors = utils.to_numpy(utils.load_bert_embeddings(args.embeddings))
+        n = min(len(news), len(vectors))
+        ids, vectors = news.index[:n].to_numpy(dtype=str), vectors[:n]
+
+    index = IVFIndex.build(ids, vectors, n_lists=args.n_lists, n_iter=args.n_iter)
+    index.save(args.out)
+    print(f"Saved IVF index with {index.n_lists} lists over {len(index)} items to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
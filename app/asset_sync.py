@@ -0,0 +1,101 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+VERSION_FILE = "VERSION.json"
+LOCK_FILE = ".write.lock"
+LEADER_FILE = ".leader.lock"
+DEFAULT_INTERVAL = 0.5
+
+
+class AssetSync:
+    """
+    Coordinates the workers serving one asset directory of memory-mapped files:
+    writes take an exclusive file lock and bump VERSION.json, and every worker
+    polls the version and reopens its views when it moves.
+    """
+    def __init__(self, directory, interval=DEFAULT_INTERVAL):
+        self.directory = str(directory)
+        self.interval = interval
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._lock_file = None
+        self._leader_file = None
+        self._watcher = None
+        self._stop = threading.Event()
+
+    @contextmanager
+    def lock(self):
+        """Exclusive across processes; re-entrant within one."""
+        with self._lock:
+            if self._depth == 0:
+                self._lock_file = open(self._path(LOCK_FILE), "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def version(self):
+        try:
+            with open(self._path(VERSION_FILE)) as f:
+                return json.load(f)["version"]
+        except FileNotFoundError:
+            return 0
+
+    def bump(self):
+        """Publish a new version; call with the lock held, once the files are written."""
+        with self.lock():
+            version = self.version() + 1
+            tmp = self._path(VERSION_FILE + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump({"version": version, "pid": os.getpid()}, f)
+            os.replace(tmp, self._path(VERSION_FILE))
+            return version
+
+    def try_lead(self):
+        """Become the leader if no other live worker is; the OS releases the lock at exit."""
+        if self._leader_file is not None:
+            return True
+        f = open(self._path(LEADER_FILE), "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        self._leader_file = f
+        return True
+
+    @property
+    def leader(self):
+        return self._leader_file is not None
+
+    def watch(self, on_change):
+        """Poll the version in the background and call `on_change()` whenever it moves."""
+        if self._watcher is None or not self._watcher.is_alive():
+            self._watcher = threading.Thread(target=self._watch, args=(on_change,), name="asset-sync", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self, on_change):
+        seen = self.version()
+        while not self._stop.wait(self.interval):
+            version = self.version()
+            if version != seen:
+                try:
+                    on_change()
+                    seen = version
+                except Exception as e:
+                    print(f"Asset sync failed, retrying: {e}")
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
@@ -0,0 +1,349 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from app import utils, recommender, cf_index, ann_index, user_profiles, embedding_store, news_catalogue, click_histories, quantization
+
+MODES = ("bert", "tfidf")
+STORE_DIRS = {"bert": "bert_store", "tfidf": "tfidf_store"}
+LEGACY_EMBEDDINGS = {"bert": "bert_embeddings.pt", "tfidf": "tfidf_embeddings.npz"}
+CATALOGUE_DIR = "news_catalogue"
+CLICKS_DIR = "user_clicks"
+LOAD_WORKERS = 4
+WARMUP_TEXTS = ["warming up the encoder", "a second text so batching is exercised too"]
+
+
+class AssetsNotReady(RuntimeError):
+    """Raised by `registry.current` before the first snapshot is published."""
+
+
+class PendingAsset:
+    """
+    Stands in for an asset still loading in the background (the encoders):
+    the snapshot can be published without it, and the first use waits for it.
+    """
+    def __init__(self, future):
+        self._future = future
+
+    @property
+    def loaded(self):
+        return self._future.done()
+
+    def resolve(self):
+        return self._future.result()
+
+    def __getattr__(self, name):
+        return getattr(self._future.result(), name)
+
+
+@dataclass(frozen=True)
+class AssetSnapshot:
+    """
+    One immutable version of everything the endpoints read.
+    Readers grab `registry.current` once per request and use only that.
+    `version` moves with every publish; `content_version` is the version the
+    articles and their embeddings last changed at, so CF updates leave it be.
+    """
+    version: int
+    content_version: int
+    news: object       # CatalogueView: article metadata by News ID
+    catalogue: object  # NewsCatalogue the writes go to, shared across versions
+    embeddings: dict   # mode -> BankView over the store segments
+    stores: dict       # mode -> EmbeddingStore, shared across versions
+    encoders: dict     # mode -> text encoder
+    cf_index: object
+    ann_index: object  # IVF index over the bert bank, None when not built
+    user_clicks: object    # ClickHistories: User ID -> clicked News IDs
+    user_profiles: object  # UserProfileStore, kept across versions
+    recommenders: dict  # mode -> HybridRecommender
+
+    def recommender(self, mode):
+        return self.recommenders[mode]
+
+
+class AssetRegistry:
+    """
+    Process-lifetime holder of the published AssetSnapshot; writes go through `write()`.
+    `bert_precision` picks the bert bank scanned ("float16"/"int8" are re-ranked in
+    float32), `encoder_loaders` overrides encoders by mode and `sync` (AssetSync)
+    coordinates workers sharing the asset directory.
+    """
+    def __init__(self, assets_dir, bert_precision="float32", rerank=quantization.DEFAULT_RERANK, encoder_loaders=None,
+                 sync=None):
+        if bert_precision not in quantization.PRECISIONS:
+            raise ValueError(f"Unknown precision: {bert_precision}")
+        self.assets_dir = Path(assets_dir)
+        self.bert_precision = bert_precision
+        self.rerank = rerank
+        self.encoder_loaders = encoder_loaders or {}
+        self.sync = sync
+        self.owns_cf_index = True
+        self._disk_version = 0  # shared version the published files correspond to
+        self._snapshot = None
+        self._write_lock = threading.RLock()
+        self._compaction = None
+        self.load_state = {}  # asset -> {"state", "seconds", "error"}, for /ready
+        self._load_lock = threading.Lock()
+
+    def path(self, name):
+        return str(self.assets_dir / name)
+
+    @property
+    def current(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise AssetsNotReady("Assets are not loaded yet.")
+        return snapshot
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    def load(self, wait_for_encoders=False):
+        """
+        Open the memory-mapped assets in parallel and publish them; the encoders
+        keep loading in the background behind PendingAsset placeholders.
+        """
+        # Workers load one after the other, so files built on first start are built once
+        with self._write_lock, self._shared():
+            # Encoders get their own threads so they never hold up the mmap-able assets
+            encoder_pool = ThreadPoolExecutor(max_workers=len(MODES), thread_name_prefix="encoder-load")
+            encoders = {
+                mode: PendingAsset(encoder_pool.submit(self._timed, f"{mode}_encoder", self._load_encoder, mode))
+                for mode in MODES
+            }
+            encoder_pool.shutdown(wait=False)
+
+            pool = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="asset-load")
+            # Cached CSR histories; behaviors.tsv is only parsed when it changed
+            user_clicks = pool.submit(self._timed, "user_clicks", click_histories.load_or_build,
+                                      self.path("behaviors.tsv"), self.path(CLICKS_DIR))
+            stores = {mode: pool.submit(self._timed, f"{mode}_store", self.load_store, mode) for mode in MODES}
+            catalogue = pool.submit(self._timed, "news_catalogue", self.load_catalogue)
+            ann = pool.submit(self._timed, "bert_ivf", self._load_ann_index)
+            cf = pool.submit(self._timed, "cf_index", lambda: self._load_cf_index(user_clicks.result()))
+            pool.shutdown(wait=False)
+
+            self._timed("publish", self._publish, encoders, {mode: stores[mode].result() for mode in MODES},
+                        catalogue.result(), cf.result(), ann.result(), user_clicks.result())
+            if self.sync is not None:
+                self._disk_version = self.sync.version()
+            if wait_for_encoders:
+                for encoder in encoders.values():
+                    encoder.resolve()
+            return self._snapshot
+
+    def _load_encoder(self, mode):
+        # One dummy batch pulls in the lazy imports, weights and tokenizer (and the text cleaner for tfidf)
+        if mode in self.encoder_loaders:
+            encoder = self.encoder_loaders[mode]()
+        elif mode == "bert":
+            encoder = utils.load_bert_model(self.path("bert_model"))
+        else:
+            encoder = utils.load_tfidf_model(self.path("tfidf_vectorizer.pkl"))
+        if mode == "bert":
+            encoder.encode(WARMUP_TEXTS, batch_size=len(WARMUP_TEXTS), convert_to_numpy=True)
+        else:
+            encoder.transform([utils.clean_text(text) for text in WARMUP_TEXTS])
+        return encoder
+
+    def _load_ann_index(self):
+        return ann_index.IVFIndex.load(self.path("bert_ivf")) if ann_index.exists(self.path("bert_ivf")) else None
+
+    def _timed(self, name, load, *args):
+        with self._load_lock:
+            self.load_state[name] = {"state": "loading", "seconds": None, "error": None}
+        start = time.perf_counter()
+        try:
+            result = load(*args)
+        except Exception as e:
+            self._set_state(name, "failed", start, error=str(e))
+            raise
+        self._set_state(name, "ready", start)
+        return result
+
+    def _set_state(self, name, state, start, error=None):
+        with self._load_lock:
+            self.load_state[name] = {"state": state, "seconds": round(time.perf_counter() - start, 3), "error": error}
+
+    def refresh(self):
+        """Publish fresh views of the catalogue and embedding banks, reusing everything else."""
+        with self._write_lock:
+            snapshot = self.current
+            self._publish(snapshot.encoders, snapshot.stores, snapshot.catalogue, snapshot.cf_index, snapshot.ann_index, snapshot.user_clicks,
+                          snapshot.user_profiles)
+            return self._snapshot
+
+    def reload(self):
+        """Reopen the stores, catalogue and indexes after another worker changed the files."""
+        with self._write_lock:
+            snapshot = self.current
+            stores = {mode: embedding_store.EmbeddingStore(self.path(STORE_DIRS[mode])) for mode in MODES}
+            catalogue = news_catalogue.NewsCatalogue(self.path(CATALOGUE_DIR))
+            cf = snapshot.cf_index if self.owns_cf_index else cf_index.CFIndex.load(self.path("cf_index"))
+            self._publish(snapshot.encoders, stores, catalogue, cf, self._load_ann_index(), snapshot.user_clicks,
+                          snapshot.user_profiles)
+            return self._snapshot
+
+    def catch_up(self):
+        """Reload if another worker published a newer version of the files."""
+        if self.sync is None or not self.ready:
+            return
+        with self._write_lock, self.sync.lock():
+            version = self.sync.version()
+            if version != self._disk_version:
+                self.reload()
+                self._disk_version = version
+
+    def update_cf_index(self, update):
+        """Publish `update(cf_index)` as the new CF index; the catalogue and banks are reused."""
+        with self._write_lock:
+            snapshot = self.current
+            self._publish(snapshot.encoders, snapshot.stores, snapshot.catalogue, update(snapshot.cf_index),
+                          snapshot.ann_index, snapshot.user_clicks, snapshot.user_profiles, content_changed=False)
+            return self._snapshot
+
+    @contextmanager
+    def write(self):
+        """
+        Serialize a write against the asset files and swap in a new version afterwards.
+        The refresh also runs on failure, since the files may be partially updated,
+        but is skipped when the files did not change (e.g. every job was rejected).
+        """
+        with self._write_lock, self._shared():
+            # Writes go to the latest files, whichever worker wrote them
+            self.catch_up()
+            snapshot = self.current
+            before = _file_state(snapshot)
+            try:
+                yield snapshot
+            finally:
+                if _file_state(snapshot) != before:
+                    if snapshot.ann_index is not None:
+                        snapshot.ann_index.save_changes(self.path("bert_ivf"))
+                    self.refresh()
+                    self._bump()
+                    self._schedule_compaction()
+
+    def compact(self):
+        """Fold the segments, tombstones and catalogue log into new bases, then republish."""
+        with self._write_lock, self._shared():
+            self.catch_up()
+            for store in self.current.stores.values():
+                store.compact()
+            if self.current.catalogue.needs_compaction(max_log=0):
+                self.current.catalogue.compact()
+            if self.current.ann_index is not None:
+                self.current.ann_index.save(self.path("bert_ivf"))
+            self.refresh()
+            self._bump()
+
+    def save_cf_index(self, cf=None):
+        """Persist the CF index (the published one by default); other workers then reload it."""
+        with self._write_lock, self._shared():
+            (self.current.cf_index if cf is None else cf).save(self.path("cf_index"))
+            self._bump()
+
+    def _shared(self):
+        return self.sync.lock() if self.sync is not None else nullcontext()
+
+    def _bump(self):
+        if self.sync is not None:
+            self._disk_version = self.sync.bump()
+
+    def _schedule_compaction(self):
+        """Compact in the background once appends/deletes pile up; writes wait on the lock meanwhile."""
+        snapshot = self.current
+        if not (snapshot.catalogue.needs_compaction()
+                or any(store.needs_compaction() for store in snapshot.stores.values())):
+            return
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self.compact, daemon=True)
+        self._compaction.start()
+
+    def load_store(self, mode):
+        """
+        Open the embedding store of a mode, migrating the legacy .pt/.npz bank
+        (rows aligned with the sorted news.tsv) into it on first start.
+        """
+        directory = self.path(STORE_DIRS[mode])
+        if not embedding_store.exists(directory):
+            news = utils.load_news_data(self.path("news.tsv"))
+            if mode == "bert":
+                embeddings = utils.to_numpy(utils.load_bert_embeddings(self.path(LEGACY_EMBEDDINGS[mode])))
+            else:
+                embeddings = utils.load_tfidf_embeddings(self.path(LEGACY_EMBEDDINGS[mode]))
+            n_rows = min(len(news), embeddings.shape[0])
+            embedding_store.EmbeddingStore.create(directory, embeddings[:n_rows], news.index[:n_rows].to_numpy(dtype=str))
+        return embedding_store.EmbeddingStore(directory)
+
+    def load_catalogue(self):
+        """Open the columnar news catalogue, converting news.tsv into it on first start."""
+        directory = self.path(CATALOGUE_DIR)
+        if not news_catalogue.exists(directory):
+            news_catalogue.NewsCatalogue.from_frame(directory, utils.load_news_data(self.path("news.tsv")))
+        return news_catalogue.NewsCatalogue(directory)
+
+    def _load_cf_index(self, user_clicks):
+        """
+        Open the sparse CF index, building it once if missing: converted from the
+        legacy item_sim_df.pkl when present, otherwise computed from click histories.
+        """
+        directory = self.path("cf_index")
+        if not cf_index.exists(directory):
+            if os.path.exists(self.path("item_sim_df.pkl")):
+                index = cf_index.CFIndex.from_item_sim_df(utils.load_item_sim_df(self.path("item_sim_df.pkl")))
+            else:
+                index = cf_index.CFIndex.from_user_clicks(user_clicks)
+            index.save(directory)
+        return cf_index.CFIndex.load(directory)
+
+    def _publish(self, encoders, stores, catalogue, cf, ann, user_clicks, profiles=None, content_changed=True):
+        # Views over memory-mapped files: neither the catalogue nor a bank is read or copied here
+        news = catalogue.view()
+        embeddings = {mode: stores[mode].bank(self.bert_precision if mode == "bert" else None) for mode in MODES}
+
+        recommenders = {
+            mode: recommender.HybridRecommender(
+                news=news,
+                embeddings=embeddings[mode],
+                model=encoders[mode],
+                cf_index=cf,
+                mode=mode,
+                ann_index=ann,
+                rerank=self.rerank
+            )
+            for mode in MODES
+        }
+
+        if profiles is None:
+            profiles = user_profiles.UserProfileStore.build(user_clicks, recommenders["bert"])
+
+        previous = self._snapshot
+        version = previous.version + 1 if previous is not None else 1
+        content_version = version if content_changed or previous is None else previous.content_version
+        # Single reference assignment: readers see either the old or the new version
+        self._snapshot = AssetSnapshot(
+            version=version,
+            content_version=content_version,
+            news=news,
+            catalogue=catalogue,
+            embeddings=embeddings,
+            stores=stores,
+            encoders=encoders,
+            cf_index=cf,
+            ann_index=ann,
+            user_clicks=user_clicks,
+            user_profiles=profiles,
+            recommenders=recommenders
+        )
+
+
+def _file_state(snapshot):
+    # Every write appends to the catalogue log, or appends to or tombstones rows of the banks
+    return (snapshot.catalogue.log_size,
+            tuple((store.n_rows, len(store.index)) for store in snapshot.stores.values()))
@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import numpy as np
+from app import assets, synthetic, utils, write_queue, Evaluator
+
+MODES = ("bert", "tfidf")
+
+
+def summarize(latencies):
+    """p50/p99/mean/max in ms and operations per second."""
+    latencies = np.asarray(latencies, dtype=np.float64)
+    if len(latencies) == 0:
+        return {"n": 0}
+    wall = latencies.sum()
+    return {
+        "n": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "mean_ms": float(latencies.mean() * 1000),
+        "max_ms": float(latencies.max() * 1000),
+        "throughput_per_s": len(latencies) / wall if wall > 0 else None,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _timed_calls(fn, args):
+    latencies = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_recommend(snapshot, mode, news_ids, alpha, topk):
+    recommender = snapshot.recommender(mode).with_params(alpha=alpha, topk=topk)
+    recommender.recommend(news_ids[0])  # first call pays for lazy setup
+    return summarize(_timed_calls(recommender.recommend, news_ids))
+
+
+def bench_recommend_many(snapshot, mode, news_ids, batch_size, alpha, topk):
+    """Latency per batch; throughput in articles per second."""
+    recommender = snapshot.recommender(mode).with_params(alpha=alpha, topk=topk)
+    batches = [news_ids[i:i + batch_size] for i in range(0, len(news_ids), batch_size)]
+    latencies = _timed_calls(recommender.recommend_many, batches)
+    result = summarize(latencies)
+    result["batch_size"] = batch_size
+    result["throughput_per_s"] = len(news_ids) / sum(latencies) if latencies else None
+    return result
+
+
+def bench_evaluate(snapshot, mode, n_users, topk, seed, repeats=3):
+    """Latency of a full evaluate_all over `n_users` sampled users (like /evaluate-recommender/)."""
+    user_ids = random.Random(seed).sample(list(snapshot.user_clicks.keys()), min(n_users, len(snapshot.user_clicks)))
+    sampled_clicks = {user_id: snapshot.user_clicks.evaluation_clicks(user_id) for user_id in user_ids}
+    evaluator = Evaluator.Evaluator(snapshot.recommender(mode), sampled_clicks, k=topk)
+    latencies = _timed_calls(lambda _: evaluator.evaluate_all(), range(repeats))
+    result = summarize(latencies)
+    result["n_users"] = len(sampled_clicks)
+    result["users_per_s"] = len(sampled_clicks) * repeats / sum(latencies) if latencies else None
+    return result
+
+
+def _item(news_id, rng, words):
+    return {
+        "News_ID": news_id,
+        "Category": "news",
+        "Subcategory": "newsbench",
+        "News_Title": " ".join(rng.choice(words, size=8)),
+        "News_Abstract": " ".join(rng.choice(words, size=16)),
+        "News_Url": " ",
+        "Entities_in_News_Title": [],
+        "Entities_in_News_Abstract": [],
+    }
+
+
+def bench_writes(registry, n_writes, seed):
+    """
+    add/update/delete through the write queue. Latency is submit -> job done,
+    one job at a time; throughput is a burst of `n_writes` jobs that the writer
+    is free to batch. The benchmark articles are deleted again at the end.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.asarray(synthetic.vocabulary(2000))
+    writer = write_queue.WriteQueue(registry)
+    writer.start()
+
+    def run(op, news_id, item=None):
+        job = writer.submit(op, news_id, item)
+        writer.join()
+        if job.status != "done":
+            raise RuntimeError(f"{op} {news_id} failed: {job.error}")
+
+    results = {}
+    single = [f"BENCH{i}" for i in range(n_writes)]
+    results["add"] = summarize(_timed_calls(lambda news_id: run("add", news_id, _item(news_id, rng, words)), single))
+    results["update"] = summarize(_timed_calls(lambda news_id: run("update", news_id, _item(news_id, rng, words)), single))
+    results["delete"] = summarize(_timed_calls(lambda news_id: run("delete", news_id), single))
+
+    burst = [f"BENCHB{i}" for i in range(n_writes)]
+    for op in write_queue.OPS:
+        jobs = []
+        start = time.perf_counter()
+        for news_id in burst:
+            jobs.append(writer.submit(op, news_id, None if op == "delete" else _item(news_id, rng, words)))
+        writer.join()
+        wall = time.perf_counter() - start
+        results[f"{op}_burst"] = {
+            "n": len(jobs),
+            "seconds": wall,
+            "throughput_per_s": len(jobs) / wall if wall > 0 else None,
+            "batches": len({job.version for job in jobs}),
+            "failed": sum(job.status != "done" for job in jobs),
+        }
+    return results
+
+
+def run(assets_dir, n_articles, requests=1000, batch_size=64, eval_users=1000, writes=50,
+        alpha=0.5, topk=10, precision="float32", seed=0, generate_kwargs=None):
+    """
+    Generate the assets if needed, load them and time every operation. Returns the report dict.
+    The text cleaner needs the NLTK data, so that is checked first.
+    """
+    missing = utils.missing_nltk_data()
+    if missing:
+        raise RuntimeError(f"NLTK data missing for the text cleaner: run `python -m nltk.downloader {' '.join(missing)}`")
+
+    report = {
+        "config": {
+            "assets": str(assets_dir), "n_articles": n_articles, "requests": requests, "batch_size": batch_size,
+            "eval_users": eval_users, "writes": writes, "alpha": alpha, "topk": topk,
+            "precision": precision, "seed": seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": {},
+        "peak_rss_mb": {},
+    }
+
+    if not os.path.exists(os.path.join(assets_dir, "synthetic.json")):
+        start = time.perf_counter()
+        report["generate"] = synthetic.generate(assets_dir, n_articles, seed=seed, **(generate_kwargs or {}))
+        report["generate"]["total"] = time.perf_counter() - start
+        report["peak_rss_mb"]["generate"] = peak_rss_mb()
+
+    encoder = synthetic.load_encoder(assets_dir)
+    registry = assets.AssetRegistry(assets_dir, bert_precision=precision, encoder_loaders={"bert": lambda: encoder})
+    start = time.perf_counter()
+    snapshot = registry.load(wait_for_encoders=True)
+    report["load_seconds"] = time.perf_counter() - start
+    report["load_state"] = registry.load_state
+    report["peak_rss_mb"]["load"] = peak_rss_mb()
+
+    rng = random.Random(seed)
+    news_ids = list(snapshot.news)
+    targets = [rng.choice(news_ids) for _ in range(requests)]
+    results = report["results"]
+    for mode in MODES:
+        results[f"recommend_{mode}"] = bench_recommend(snapshot, mode, targets, alpha, topk)
+        results[f"recommend_many_{mode}"] = bench_recommend_many(snapshot, mode, targets, batch_size, alpha, topk)
+        results[f"evaluate_{mode}"] = bench_evaluate(snapshot, mode, eval_users, topk, seed)
+        report["peak_rss_mb"][mode] = peak_rss_mb()
+
+    if writes:
+        results.update(bench_writes(registry, writes, seed))
+        report["peak_rss_mb"]["writes"] = peak_rss_mb()
+    report["peak_rss_mb"]["total"] = peak_rss_mb()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommender on synthetic MIND-shaped assets "
+                                                 "(needs the NLTK stopwords and wordnet data).")
+    parser.add_argument("--assets", default=None, help="asset directory; generated there if it has no synthetic.json "
+                                                       "(default: bench_assets/<n-articles>)")
+    parser.add_argument("--n-articles", type=int, default=10_000)
+    parser.add_argument("--n-users", type=int, default=None, help="defaults to half the articles")
+    parser.add_argument("--item-sim-df", action="store_true", help="also write the dense item_sim_df.pkl (small scales only)")
+    parser.add_argument("--requests", type=int, default=1000, help="single recommendations to time")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--eval-users", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=50, help="jobs per write operation (0 to skip)")
+    parser.add_argument("--alpha", type=float, default=0.5)
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--precision", choices=["float32", "float16", "int8"], default="float32")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark.json", help="JSON report path")
+    args = parser.parse_args()
+
+    assets_dir = args.assets or os.path.join("bench_assets", str(args.n_articles))
+    report = run(assets_dir, args.n_articles, requests=args.requests, batch_size=args.batch_size,
+                 eval_users=args.eval_users, writes=args.writes, alpha=args.alpha, topk=args.topk,
+                 precision=args.precision, seed=args.seed,
+                 generate_kwargs={"n_users": args.n_users, "item_sim_df": args.item_sim_df})
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report["results"].items():
+        if "p50_ms" in result:
+            print(f"{name:24s} p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                  f"{result['throughput_per_s']:10.1f}/s")
+        else:
+            print(f"{name:24s} {result['throughput_per_s']:10.1f}/s in {result['batches']} batches")
+    print(f"peak RSS {report['peak_rss_mb']['total']:.0f} MB; report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
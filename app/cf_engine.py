@@ -0,0 +1,215 @@
+import queue
+import threading
+import time
+import numpy as np
+from app.cf_index import DEFAULT_TOP_N
+
+DEFAULT_MAX_OVERRIDES = 20_000
+
+
+class CoClickEngine:
+    """
+    Keeps the CF index current as clicks arrive: co-click counts (a CSR base
+    plus increments) are updated per click, and only the neighbour lists that
+    changed are recomputed and published as CF index overrides.
+    """
+    def __init__(self, registry, top_n=DEFAULT_TOP_N, max_overrides=DEFAULT_MAX_OVERRIDES, persist_interval=None):
+        self.registry = registry
+        self.top_n = top_n
+        self.max_overrides = max_overrides
+        self.persist_interval = persist_interval
+        self._unsaved_since = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self.ready = threading.Event()
+        self.clicks_applied = 0
+        self.items_refreshed = 0
+        self.failures = 0       # click batches that raised; the engine keeps going
+        self.last_error = None
+        self._listeners = []
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="cf-engine", daemon=True)
+            self._thread.start()
+
+    def submit(self, user_id, news_ids):
+        if self._thread is not None and not self._thread.is_alive():
+            return  # stopped (its start-up build failed): nothing would consume the queue
+        self._queue.put((user_id, list(news_ids)))
+
+    def on_refresh(self, listener):
+        """Call `listener(news_ids, version)` with the items whose neighbour lists a published version changed."""
+        self._listeners.append(listener)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self, timeout=None):
+        """Wait until every click submitted so far is in the published CF index."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    # ---------- Counts ---------- #
+
+    def build(self, histories):
+        """Co-click counts of `histories` (ClickHistories); item codes follow its `item_ids`."""
+        self.item_ids = histories.item_ids.tolist()
+        self.code_of = {news_id: code for code, news_id in enumerate(self.item_ids)}
+        clicks = histories.click_matrix()
+        self._base = (clicks.T @ clicks).tocsr()
+        self._counts = np.zeros(max(16, 2 * len(self.item_ids)), dtype=np.float64)
+        self._counts[:len(self.item_ids)] = self._base.diagonal()
+        self._increments = {}  # code -> {code: count} added since the base
+        self._histories = histories
+        self._clicked = {}     # User ID -> set of codes, filled on first click
+
+    def add_clicks(self, clicks):
+        """Count (User ID, [News IDs]) clicks; returns the codes whose neighbour lists changed."""
+        clicked_now = set()
+        for user_id, news_ids in clicks:
+            seen = self._user_codes(user_id)
+            for news_id in news_ids:
+                code = self._code(news_id)
+                if code in seen:  # histories hold each item once
+                    continue
+                for other in seen:
+                    self._bump(code, other)
+                    self._bump(other, code)
+                self._bump(code, code)
+                self._counts[code] += 1
+                seen.add(code)
+                clicked_now.add(code)
+                self.clicks_applied += 1
+
+        touched = set(clicked_now)
+        for code in clicked_now:
+            touched.update(self._row(code)[0].tolist())
+        return touched
+
+    def neighbours(self, code):
+        """Top-N (codes, cosine similarities) of an item, ordered like CFIndex.from_similarity."""
+        cols, counts = self._row(code)
+        similarity = counts / np.sqrt(self._counts[code] * self._counts[cols])
+        if len(cols) > self.top_n:
+            keep = np.sort(np.argpartition(-similarity, self.top_n - 1)[:self.top_n])
+            cols, similarity = cols[keep], similarity[keep]
+        order = np.argsort(-similarity, kind="stable")
+        return cols[order], similarity[order]
+
+    def _row(self, code):
+        # Base row plus increments, columns ascending
+        if code < self._base.shape[0]:
+            start, end = self._base.indptr[code], self._base.indptr[code + 1]
+            row = dict(zip(self._base.indices[start:end].tolist(), self._base.data[start:end].tolist()))
+        else:
+            row = {}
+        for other, count in self._increments.get(code, {}).items():
+            row[other] = row.get(other, 0) + count
+        cols = np.fromiter(sorted(row), dtype=np.int64, count=len(row))
+        return cols, np.fromiter((row[col] for col in cols.tolist()), dtype=np.float64, count=len(row))
+
+    def _bump(self, code, other):
+        row = self._increments.setdefault(code, {})
+        row[other] = row.get(other, 0) + 1
+
+    def _code(self, news_id):
+        code = self.code_of.get(news_id)
+        if code is None:
+            code = self.code_of[news_id] = len(self.item_ids)
+            self.item_ids.append(news_id)
+            if code >= len(self._counts):
+                self._counts = np.concatenate([self._counts, np.zeros_like(self._counts)])
+        return code
+
+    def _user_codes(self, user_id):
+        seen = self._clicked.get(user_id)
+        if seen is None:
+            known = self._histories[user_id] if user_id in self._histories else []
+            seen = self._clicked[user_id] = {self.code_of[news_id] for news_id in known}
+        return seen
+
+    # ---------- Publishing ---------- #
+
+    def refresh(self, cf, touched):
+        """CF index with the neighbour lists of the `touched` codes recomputed."""
+        lists = {code: self.neighbours(code) for code in touched}
+        codes = np.fromiter(set(touched).union(*(cols.tolist() for cols, _ in lists.values())), dtype=np.int64)
+        news_ids = np.asarray([self.item_ids[code] for code in codes.tolist()], dtype=str)
+
+        # Items the index has not seen yet become new rows
+        rows = cf.index.rows(news_ids)
+        new = rows < 0
+        rows[new] = len(cf) + np.arange(int(new.sum()))
+        row_of = dict(zip(codes.tolist(), rows.tolist()))
+
+        updates = {
+            row_of[code]: (np.fromiter((row_of[col] for col in cols.tolist()), dtype=np.int32, count=len(cols)), sims)
+            for code, (cols, sims) in lists.items()
+        }
+        self.items_refreshed += len(updates)
+        return cf.with_updates(news_ids[new], updates)
+
+    def _run(self):
+        try:
+            self.build(self.registry.current.user_clicks)
+        except Exception as e:
+            self._failed(f"Building co-click counts failed, CF updates are off: {e}")
+            return
+        self.ready.set()
+        while True:
+            try:
+                clicks = [self._queue.get(timeout=self.persist_interval)]
+            except queue.Empty:
+                clicks = []
+            while True:
+                try:
+                    clicks.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                touched = self.add_clicks(clicks)
+                if touched:
+                    self._unsaved_since = self._unsaved_since or time.monotonic()
+                    snapshot = self.registry.update_cf_index(lambda cf: self._refreshed(cf, touched))
+                    changed = [self.item_ids[code] for code in touched]
+                    for listener in self._listeners:
+                        listener(changed, snapshot.version)
+                if self._unsaved_since is not None and self.persist_interval is not None \
+                        and time.monotonic() - self._unsaved_since >= self.persist_interval:
+                    self.registry.save_cf_index()
+                    self._unsaved_since = None
+            except Exception as e:
+                # Counts already added stay; their lists are refreshed with the next clicks on them
+                self._failed(f"Applying the clicks of {len(clicks)} requests to the CF index failed: {e}")
+            finally:
+                for _ in clicks:
+                    self._queue.task_done()
+
+    def _failed(self, message):
+        self.failures += 1
+        self.last_error = message
+        print(message)
+
+    def _refreshed(self, cf, touched):
+        cf = self.refresh(cf, touched)
+        if len(cf.overrides) > self.max_overrides:
+            self.registry.save_cf_index(cf)
+            self._unsaved_since = None
+            cf = cf.compacted()
+        return cf
+
+    def status(self):
+        return {
+            "ready": self.ready.is_set(),
+            "running": self._thread is not None and self._thread.is_alive(),
+            "pending": self.pending(),
+            "clicks_applied": self.clicks_applied,
+            "items_refreshed": self.items_refreshed,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
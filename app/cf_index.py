@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, csc_matrix, issparse
+from app.id_index import IdIndex
+from app.click_histories import ClickHistories
+
+DEFAULT_TOP_N = 200
+
+
+class CFIndex:
+    """
+    Top-N item-item CF similarities as CSR arrays; `overrides` (row -> (rows,
+    similarities)) hold incremental updates until `compacted()`.
+    """
+    def __init__(self, ids, indptr, indices, data, overrides=None):
+        self.ids = np.asarray(ids)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.float32)
+        self.overrides = overrides or {}
+        self.index = IdIndex(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, news_id):
+        return news_id in self.index
+
+    def row_of(self, news_id):
+        return self.index.row(news_id)
+
+    def neighbours(self, news_id):
+        """(neighbour rows, similarities) of one item, or None if the item has no CF data."""
+        row = self.index.row(news_id)
+        if row is None:
+            return None
+        return self._neighbours_of_row(row)
+
+    def _neighbours_of_row(self, row):
+        override = self.overrides.get(row)
+        if override is not None:
+            return override
+        if row >= len(self.indptr) - 1:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def to_csr(self):
+        index = self.compacted()
+        n = len(index)
+        return csr_matrix((index.data, index.indices, index.indptr), shape=(n, n))
+
+    # ---------- Incremental updates ---------- #
+
+    def with_updates(self, new_ids, updates):
+        """
+        Copy with `new_ids` appended as rows and the neighbour lists in `updates`
+        (row -> (rows, similarities)) replaced. The stored arrays are shared.
+        """
+        ids = np.concatenate([self.ids.astype(str), np.asarray(new_ids, dtype=str)]) if len(new_ids) else self.ids
+        updates = {row: (np.asarray(rows, dtype=np.int32), np.asarray(sims, dtype=np.float32))
+                   for row, (rows, sims) in updates.items()}
+        return CFIndex(ids, self.indptr, self.indices, self.data, {**self.overrides, **updates})
+
+    def compacted(self):
+        """Same index with the overrides folded into the CSR arrays."""
+        if not self.overrides and len(self.indptr) - 1 == len(self.ids):
+            return self
+        lists = [self._neighbours_of_row(row) for row in range(len(self))]
+        indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(rows) for rows, _ in lists], out=indptr[1:])
+        return CFIndex(
+            self.ids,
+            indptr,
+            np.concatenate([rows for rows, _ in lists]) if lists else np.empty(0, dtype=np.int32),
+            np.concatenate([sims for _, sims in lists]) if lists else np.empty(0, dtype=np.float32)
+        )
+
+    # ---------- Building ---------- #
+
+    @classmethod
+    def from_similarity(cls, ids, similarity, top_n=DEFAULT_TOP_N, block_size=1024):
+        """
+        Keep the top-N entries of every column of a square similarity matrix
+        (dense or sparse). Column `j` becomes the neighbour list of `ids[j]`.
+        Sparse columns are read straight from the CSC arrays, never densified.
+        """
+        n = len(ids)
+        indptr = [0]
+        indices, data = [], []
+
+        def keep(rows, values):
+            nonzero = values != 0
+            rows, values = rows[nonzero], values[nonzero]
+            if len(rows) > top_n:
+                top = np.argpartition(-values, top_n - 1)[:top_n]
+                top.sort()  # back to row order, so ties break by row
+                rows, values = rows[top], values[top]
+            order = np.argsort(-values, kind="stable")
+            indices.append(rows[order].astype(np.int32))
+            data.append(values[order].astype(np.float32))
+            indptr.append(indptr[-1] + len(rows))
+
+        if issparse(similarity):
+            similarity = csc_matrix(similarity)
+            similarity.sort_indices()
+            for column in range(n):
+                start, end = similarity.indptr[column], similarity.indptr[column + 1]
+                keep(similarity.indices[start:end], similarity.data[start:end])
+        else:
+            similarity = np.asarray(similarity)
+            all_rows = np.arange(n)
+            for start in range(0, n, block_size):
+                for column in similarity[:, start:start + block_size].T:
+                    keep(all_rows, column)
+
+        return cls(
+            ids,
+            np.asarray(indptr, dtype=np.int64),
+            np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+            np.concatenate(data) if data else np.empty(0, dtype=np.float32)
+        )
+
+    @classmethod
+    def from_item_sim_df(cls, item_sim_df, top_n=DEFAULT_TOP_N):
+        """Convert the legacy item_sim_df (column = target item) into a compact index."""
+        if len(item_sim_df.columns) and all(isinstance(dtype, pd.SparseDtype) for dtype in item_sim_df.dtypes):
+            similarity = item_sim_df.sparse.to_coo().tocsc()
+        else:
+            similarity = item_sim_df.to_numpy()
+        return cls.from_similarity(item_sim_df.columns.to_numpy(dtype=str), similarity, top_n=top_n)
+
+    @classmethod
+    def from_user_clicks(cls, user_clicks, top_n=DEFAULT_TOP_N):
+        """
+        Item-item cosine similarity over a {User ID: [News IDs]} mapping or ClickHistories.
+        """
+        if isinstance(user_clicks, ClickHistories):
+            return cls._from_click_matrix(user_clicks.item_ids, user_clicks.click_matrix(), top_n)
+
+        ids = sorted({news_id for clicks in user_clicks.values() for news_id in clicks})
+        col_of = {news_id: col for col, news_id in enumerate(ids)}
+
+        rows, cols = [], []
+        for row, clicks in enumerate(user_clicks.values()):
+            for news_id in set(clicks):
+                rows.append(row)
+                cols.append(col_of[news_id])
+        clicks_matrix = csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(user_clicks), len(ids))
+        )
+        return cls._from_click_matrix(np.asarray(ids, dtype=str), clicks_matrix, top_n)
+
+    @classmethod
+    def _from_click_matrix(cls, ids, clicks_matrix, top_n):
+        co_clicks = (clicks_matrix.T @ clicks_matrix).tocsc()
+        norms = np.sqrt(co_clicks.diagonal())
+        norms[norms == 0] = 1.0
+        inv_norms = csr_matrix((1.0 / norms, (np.arange(len(ids)), np.arange(len(ids)))), shape=co_clicks.shape)
+        similarity = inv_norms @ co_clicks @ inv_norms
+
+        return cls.from_similarity(ids, similarity, top_n=top_n)
+
+    # ---------- Persistence ---------- #
+
+    def save(self, directory):
+        """Write the compacted arrays; files are swapped in atomically so open memory maps stay valid."""
+        index = self.compacted()
+        os.makedirs(directory, exist_ok=True)
+        arrays = {"ids": index.ids.astype(str), "indptr": index.indptr, "indices": index.indices, "data": index.data}
+        for name, array in arrays.items():
+            tmp = os.path.join(directory, f"{name}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"n_items": len(index), "nnz": int(len(index.data))}, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        mmap_mode = "r" if mmap else None
+        return cls(
+            np.load(os.path.join(directory, "ids.npy")),
+            np.load(os.path.join(directory, "indptr.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "indices.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "data.npy"), mmap_mode=mmap_mode)
+        )
+
+
+def exists(directory):
+    return os.path.exists(os.path.join(directory, "meta.json"))
+
+
+def build_cf_index(behaviors_path, top_n=DEFAULT_TOP_N):
+    return CFIndex.from_user_clicks(ClickHistories.from_behaviors(behaviors_path), top_n=top_n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the sparse top-N item-item CF index.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--behaviors", help="behaviors.tsv to compute similarities from click histories")
+    source.add_argument("--item-sim-df", help="legacy item_sim_df.pkl to convert")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N)
+    args = parser.parse_args()
+
+    if args.behaviors:
+        index = build_cf_index(args.behaviors, top_n=args.top_n)
+    else:
+        from app import utils
+        index = CFIndex.from_item_sim_df(utils.load_item_sim_df(args.item_sim_df), top_n=args.top_n)
+
+    index.save(args.out)
+    print(f"Saved CF index with {len(index)} items and {len(index.data)} neighbours to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
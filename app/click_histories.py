@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+from itertools import chain
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+BEHAVIORS_COLUMNS = ["Impression ID", "User ID", "Impression Time", "User Click History", "Impression News"]
+DEFAULT_CHUNK_SIZE = 200_000
+FORMAT = 2  # bumped when the cached arrays change; older caches are rebuilt
+_append_lock = threading.Lock()
+
+
+class ClickHistories(Mapping):
+    """
+    utils.get_user_clicks as a {User ID: [News IDs]} mapping over CSR arrays of
+    article codes, oldest first without repeats; `counts` and `last` keep what
+    `evaluation_clicks()` needs to restore the repeats.
+    """
+    def __init__(self, user_ids, item_ids, indptr, codes, counts, last):
+        self.user_ids = np.asarray(user_ids, dtype=str)
+        self.item_ids = np.asarray(item_ids, dtype=str)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.last = np.asarray(last, dtype=np.int32)
+        self._user_index = pd.Index(self.user_ids)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __iter__(self):
+        return iter(self.user_ids.tolist())
+
+    def __contains__(self, user_id):
+        return user_id in self._user_index
+
+    def __getitem__(self, user_id):
+        try:
+            user = self._user_index.get_loc(user_id)
+        except KeyError:
+            raise KeyError(user_id)
+        return self.item_ids[self.codes[self.indptr[user]:self.indptr[user + 1]]].tolist()
+
+    def evaluation_clicks(self, user_id):
+        """
+        The user's clicks with every repeat, as utils.get_user_clicks lists
+        them up to order: the last click comes last, the rest in first-click order.
+        """
+        user = self._user_index.get_loc(user_id)
+        start, end = self.indptr[user], self.indptr[user + 1]
+        codes = np.repeat(self.codes[start:end], self.counts[start:end])
+        if len(codes):
+            last = int(self.last[user])
+            drop = np.flatnonzero(codes == last)[-1]
+            codes = np.append(np.delete(codes, drop), last)
+        return self.item_ids[codes].tolist()
+
+    @property
+    def lengths(self):
+        return np.diff(self.indptr)
+
+    def most_clicked(self, n):
+        """News IDs of the `n` items clicked by the most users, most clicked first."""
+        counts = np.bincount(self.codes, minlength=len(self.item_ids))
+        top = np.argsort(-counts, kind="stable")[:n]
+        return self.item_ids[top[counts[top] > 0]].tolist()
+
+    def click_matrix(self):
+        """Binary (users x items) CSR click matrix; columns follow `item_ids`."""
+        return csr_matrix(
+            (np.ones(len(self.codes), dtype=np.float32), self.codes, self.indptr),
+            shape=(len(self.user_ids), len(self.item_ids))
+        )
+
+    # ---------- Building ---------- #
+
+    @classmethod
+    def from_behaviors(cls, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Stream behaviors.tsv in chunks, counting (user, item) code pairs: linear in the clicks."""
+        user_codes, item_codes = {}, {}
+        pair_users, pair_items, pair_counts = [], [], []
+        last_clicks = {}  # user code -> item code of the latest click seen
+        reader = pd.read_csv(path, sep="\t", names=BEHAVIORS_COLUMNS, usecols=["User ID", "User Click History"],
+                             dtype=str, chunksize=chunk_size)
+        for chunk in reader:
+            chunk = chunk.fillna("")
+            users = _encode(chunk["User ID"].to_numpy(), user_codes)  # users without clicks are kept too
+            items = chunk["User Click History"].str.split()
+            lengths = items.str.len().to_numpy()
+            flat = np.asarray(list(chain.from_iterable(items)), dtype=object)
+
+            pairs = pd.DataFrame({"user": np.repeat(users, lengths), "item": _encode(flat, item_codes)})
+            last = pairs.drop_duplicates("user", keep="last")
+            last_clicks.update(zip(last["user"].tolist(), last["item"].tolist()))
+            # MIND repeats a user's history on every impression: keep each pair once, with its count
+            counted = pairs.groupby(["user", "item"], sort=False).size()
+            pair_users.append(counted.index.get_level_values("user").to_numpy())
+            pair_items.append(counted.index.get_level_values("item").to_numpy())
+            pair_counts.append(counted.to_numpy())
+
+        empty = np.empty(0, dtype=np.int64)
+        counted = pd.DataFrame({
+            "user": np.concatenate(pair_users) if pair_users else empty,
+            "item": np.concatenate(pair_items) if pair_items else empty,
+            "count": np.concatenate(pair_counts) if pair_counts else empty,
+        }).groupby(["user", "item"], sort=False)["count"].sum()
+        users = counted.index.get_level_values("user").to_numpy()
+        items = counted.index.get_level_values("item").to_numpy()
+        counts = counted.to_numpy()
+
+        # Users in ID order, like the groupby in utils.get_user_clicks; clicks keep their order
+        user_ids = np.asarray(list(user_codes), dtype=str)
+        order = np.argsort(user_ids, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        users = rank[users]
+
+        by_user = np.argsort(users, kind="stable")
+        indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(users, minlength=len(user_ids)), out=indptr[1:])
+        last = np.full(len(user_ids), -1, dtype=np.int64)
+        for user, item in last_clicks.items():
+            last[rank[user]] = item
+        return cls(user_ids[order], np.asarray(list(item_codes), dtype=str), indptr, items[by_user],
+                   counts[by_user], last)
+
+    # ---------- Persistence ---------- #
+
+    def save(self, directory, source=None):
+        os.makedirs(directory, exist_ok=True)
+        # Swapped in atomically: other workers may have the previous arrays mapped
+        arrays = {"user_ids": self.user_ids, "item_ids": self.item_ids, "indptr": self.indptr, "codes": self.codes,
+                  "counts": self.counts, "last": self.last}
+        for name, array in arrays.items():
+            tmp = os.path.join(directory, f"{name}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+        meta = {"n_users": len(self), "n_clicks": int(len(self.codes)), "source": source, "format": FORMAT}
+        with open(os.path.join(directory, "meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(directory, "meta.json.tmp"), os.path.join(directory, "meta.json"))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        mmap_mode = "r" if mmap else None
+        return cls(
+            np.load(os.path.join(directory, "user_ids.npy")),
+            np.load(os.path.join(directory, "item_ids.npy")),
+            np.load(os.path.join(directory, "indptr.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "codes.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "counts.npy"), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, "last.npy"))
+        )
+
+
+def append_clicks(path, user_id, news_ids, known=()):
+    """
+    Append clicks as a behaviors.tsv row, dropping those in `known` or repeated
+    in the batch (so a retry writes nothing). Returns the new clicks.
+    """
+    known = set(known)
+    news_ids = [news_id for news_id in dict.fromkeys(news_ids) if news_id not in known]
+    if not news_ids:
+        return news_ids
+    row = ["", user_id, time.strftime("%m/%d/%Y %I:%M:%S %p"), " ".join(news_ids), ""]
+    with _append_lock, open(path, "a", encoding="utf-8") as f:
+        f.write("\t".join(row) + "\n")
+    return news_ids
+
+
+class ClickLog:
+    """
+    Follows behaviors.tsv from a byte offset: the click rows appended since,
+    by this process or any other, as (User ID, [News IDs]).
+    """
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # A row still being written is picked up by the next read
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        clicks = []
+        for line in data[:end].decode("utf-8").splitlines():
+            fields = line.split("\t")
+            if len(fields) > 3 and fields[3].strip():
+                clicks.append((fields[1], fields[3].split()))
+        return clicks
+
+
+def _encode(values, codes):
+    """Integer codes of `values`, adding unseen values to `codes` (value -> code)."""
+    inverse, uniques = pd.factorize(values)
+    for value in uniques:
+        codes.setdefault(value, len(codes))
+    lookup = np.fromiter((codes[value] for value in uniques), dtype=np.int64, count=len(uniques))
+    return lookup[inverse]
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {"path": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def cached_source(directory):
+    """Stamp (size, mtime) of the behaviors.tsv the cached histories were built from."""
+    with open(os.path.join(directory, "meta.json")) as f:
+        return json.load(f)["source"]
+
+
+def load_or_build(behaviors_path, directory):
+    """
+    Click histories of behaviors.tsv, from the on-disk cache when it was built
+    from the same file (same size and mtime), otherwise rebuilt and cached.
+    """
+    stamp = _source_stamp(behaviors_path)
+    meta_path = os.path.join(directory, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+            if meta.get("source") == stamp and meta.get("format") == FORMAT:
+                return ClickHistories.load(directory)
+
+    histories = ClickHistories.from_behaviors(behaviors_path)
+    histories.save(directory, source=stamp)
+    return ClickHistories.load(directory)
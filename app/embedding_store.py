@@ -0,0 +1,343 @@
+import json
+import os
+import threading
+import numpy as np
+from scipy.sparse import csr_matrix, issparse, vstack
+from app import utils
+from app.id_index import IdIndex
+from app.quantization import QuantizedSegment, quantize
+from app.inverted_index import PostingLists, score_query
+
+MANIFEST = "manifest.json"
+TOMBSTONES = "tombstones.npy"
+POSTING_PARTS = ("indptr", "docs", "weights", "max_weights")
+
+
+class BankView:
+    """
+    Read-only view over the segments of an embedding bank, scored in place.
+    Dense banks may carry quantized segments, sparse ones posting lists.
+    """
+    def __init__(self, segments, index, sparse, quantized=None, precision="float32", postings=None):
+        self.segments = segments
+        self.index = index
+        self.sparse = sparse
+        self.quantized = quantized
+        self.postings = postings
+        self.precision = precision if quantized is not None else "float32"
+        self.offsets = np.cumsum([0] + [segment.shape[0] for segment in segments])
+        dim = segments[0].shape[1] if segments else 0
+        self.shape = (int(self.offsets[-1]), dim)
+
+    @property
+    def ids(self):
+        return self.index.ids
+
+    @property
+    def dead(self):
+        return self.index.dead
+
+    @classmethod
+    def from_matrix(cls, embeddings, ids):
+        """Single in-memory segment, e.g. an embedding bank loaded from a .pt/.npz file."""
+        bank = utils.normalize_embeddings(embeddings)
+        n_rows = min(len(ids), bank.shape[0])
+        return cls([bank[:n_rows]], IdIndex(ids[:n_rows]), issparse(bank))
+
+    def score(self, vectors):
+        """
+        Dot products of normalized query vector(s) with every row: (rows,) for
+        a 1-D dense vector, (queries x rows) for a matrix (sparse queries are
+        always a matrix).
+        """
+        single = not self.sparse and np.ndim(vectors) == 1
+        if self.sparse:
+            vectors = csr_matrix(vectors)
+        n_queries = 1 if single else vectors.shape[0]
+
+        scores = np.empty((n_queries, self.shape[0]), dtype=np.float32)
+        for segment, start, end in zip(self.segments, self.offsets[:-1], self.offsets[1:]):
+            if self.sparse:
+                scores[:, start:end] = (vectors @ segment.T).toarray()
+            else:
+                scores[:, start:end] = np.atleast_2d(vectors @ segment.T)
+        return scores[0] if single else scores
+
+    def score_sparse(self, vector, out=None, top_k=None):
+        """
+        Scores of one sparse (1 x dim) query from the posting lists, written into
+        `out` when given. `top_k` enables pruning: exact for the top-k rows only.
+        """
+        vector = csr_matrix(vector)
+        if out is None:
+            out = np.empty(self.shape[0], dtype=np.float32)
+        return score_query(self.postings, self.offsets, vector.indices, vector.data, out, top_k=top_k, dead=self.dead)
+
+    @property
+    def nbytes(self):
+        if self.sparse:
+            return sum(s.data.nbytes + s.indices.nbytes + s.indptr.nbytes for s in self.segments)
+        return sum(segment.nbytes for segment in self.segments)
+
+    @property
+    def quantized_nbytes(self):
+        return sum(segment.nbytes for segment in self.quantized) if self.quantized is not None else 0
+
+    def score_quantized(self, vectors):
+        """Approximate (queries x rows) dot products from the quantized segments."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        scores = np.empty((vectors.shape[0], self.shape[0]), dtype=np.float32)
+        for segment, start, end in zip(self.quantized, self.offsets[:-1], self.offsets[1:]):
+            scores[:, start:end] = segment.score(vectors)
+        return scores
+
+    def rerank(self, scores, vectors, n_candidates):
+        """Re-score the `n_candidates` best rows of every query exactly against the float32 rows, in place."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        k = min(n_candidates, scores.shape[1])
+        if k == 0:
+            return scores
+        candidates = np.sort(np.argpartition(-scores, k - 1, axis=1)[:, :k], axis=1)
+        for query, rows in enumerate(candidates):
+            scores[query, rows] = self.rows(rows) @ vectors[query]
+        return scores
+
+    def rows(self, rows):
+        """Gather rows (in the given order) into a dense array or a CSR matrix."""
+        rows = np.asarray(rows, dtype=np.int64)
+        segment_of = np.searchsorted(self.offsets, rows, side="right") - 1
+        if self.sparse:
+            parts = [self.segments[s][row - self.offsets[s]] for s, row in zip(segment_of, rows)]
+            return vstack(parts, format="csr") if parts else csr_matrix((0, self.shape[1]), dtype=np.float32)
+
+        gathered = np.empty((len(rows), self.shape[1]), dtype=np.float32)
+        for s in np.unique(segment_of):
+            selected = segment_of == s
+            gathered[selected] = self.segments[s][rows[selected] - self.offsets[s]]
+        return gathered
+
+    def weighted_sum(self, weights):
+        """weights (n x rows, sparse) @ bank, accumulated segment by segment."""
+        total = None
+        for segment, start, end in zip(self.segments, self.offsets[:-1], self.offsets[1:]):
+            part = weights[:, start:end] @ segment
+            total = part if total is None else total + part
+        return total
+
+
+class EmbeddingStore:
+    """
+    Append-only embedding bank of immutable, L2-normalized segments on disk.
+    Deletes and updates tombstone rows; `compact()` rewrites the live ones.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.RLock()
+        with open(self._path(MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.sparse = self.manifest["kind"] == "sparse"
+
+        self._segments = [self._open_segment(segment["name"]) for segment in self.manifest["segments"]]
+        segment_ids = [np.load(self._path(f'{segment["name"]}.ids.npy')) for segment in self.manifest["segments"]]
+        ids = np.concatenate(segment_ids) if segment_ids else np.empty(0, dtype=str)
+        dead = None
+        if os.path.exists(self._path(TOMBSTONES)):
+            dead = np.unpackbits(np.load(self._path(TOMBSTONES)), count=len(ids)).astype(bool)
+        self.index = IdIndex(ids, dead)
+        self._quantized = {}  # (segment name, precision) -> QuantizedSegment
+        self._postings = {}   # segment name -> PostingLists
+
+    @classmethod
+    def create(cls, directory, embeddings, ids):
+        """Start a store from an existing bank (e.g. migrated from bert_embeddings.pt)."""
+        os.makedirs(directory, exist_ok=True)
+        sparse = issparse(embeddings)
+        embeddings = utils.normalize_embeddings(embeddings)
+        manifest = {"kind": "sparse" if sparse else "dense", "dim": int(embeddings.shape[1]), "segments": [], "next_segment": 0}
+        _write_json(os.path.join(directory, MANIFEST), manifest)
+
+        store = cls(directory)
+        store.append(ids, embeddings, normalized=True)
+        return store
+
+    # ---------- Reading ---------- #
+
+    @property
+    def n_rows(self):
+        return self.index.n_rows
+
+    def __contains__(self, news_id):
+        return news_id in self.index
+
+    def row_of(self, news_id):
+        """Live row of a News ID, or None."""
+        return self.index.row(news_id)
+
+    def bank(self, precision=None):
+        """
+        Zero-copy view of the current segments; later writes do not change its shape.
+        With a float16/int8 `precision`, dense banks also get quantized segments,
+        written next to the float32 ones the first time they are asked for.
+        """
+        with self._lock:
+            quantized = postings = None
+            if precision not in (None, "float32") and not self.sparse:
+                quantized = [self._quantized_segment(segment["name"], precision) for segment in self.manifest["segments"]]
+            if self.sparse:
+                postings = [self._posting_lists(segment["name"]) for segment in self.manifest["segments"]]
+            return BankView(list(self._segments), self.index, self.sparse, quantized, precision, postings)
+
+    def needs_compaction(self, max_segments=16, max_dead_fraction=0.1):
+        n_dead = self.index.n_rows - len(self.index)
+        return len(self._segments) > max_segments or n_dead > max_dead_fraction * max(self.n_rows, 1)
+
+    # ---------- Writing ---------- #
+
+    def append(self, ids, vectors, normalized=False):
+        """Append rows as a new segment; returns their row numbers."""
+        ids = np.asarray(ids, dtype=str)
+        if not normalized:
+            vectors = utils.normalize_embeddings(vectors)
+
+        with self._lock:
+            name = f'seg-{self.manifest["next_segment"]:06d}'
+            self._write_segment(name, vectors, ids)
+
+            first_row = self.n_rows
+            self.manifest["segments"].append({"name": name, "rows": len(ids)})
+            self.manifest["next_segment"] += 1
+            self._segments.append(self._open_segment(name))
+            # An appended ID replaces any live row it had before
+            self.index = self.index.append(ids)
+
+            self._save_tombstones()
+            _write_json(self._path(MANIFEST), self.manifest)
+            return np.arange(first_row, first_row + len(ids))
+
+    def overwrite(self, news_id, vector):
+        """Replace the vector of a live row: the old row is tombstoned and the new one appended."""
+        with self._lock:
+            if self.index.row(news_id) is None:
+                raise ValueError("News ID not found.")
+            return self.append([news_id], vector)[0]
+
+    def delete(self, news_id):
+        with self._lock:
+            self.index = self.index.drop(news_id)
+            self._save_tombstones()
+
+    def compact(self):
+        """
+        Rewrite the live rows into one segment and drop the old ones.
+        Returns old row -> new row (-1 for dropped rows).
+        """
+        with self._lock:
+            bank = self.bank()
+            live = bank.index.live_rows
+            vectors = bank.rows(live)
+
+            old_names = [segment["name"] for segment in self.manifest["segments"]]
+            name = f'seg-{self.manifest["next_segment"]:06d}'
+            self._write_segment(name, vectors, bank.ids[live])
+
+            self.manifest["segments"] = [{"name": name, "rows": len(live)}]
+            self.manifest["next_segment"] += 1
+            self._segments = [self._open_segment(name)]
+            self.index = bank.index.compacted()
+            self._save_tombstones()
+            _write_json(self._path(MANIFEST), self.manifest)
+
+            # Readers still holding old views keep their (unlinked) mappings alive
+            for old_name in old_names:
+                for path in self._segment_files(old_name):
+                    os.remove(path)
+                self._postings.pop(old_name, None)
+            self._quantized = {key: segment for key, segment in self._quantized.items() if key[0] not in old_names}
+
+            remap = np.full(len(bank.dead), -1, dtype=np.int64)
+            remap[live] = np.arange(len(live))
+            return remap
+
+    # ---------- Files ---------- #
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _offsets(self):
+        return np.cumsum([0] + [segment["rows"] for segment in self.manifest["segments"]])
+
+    def _segment_files(self, name):
+        suffixes = (".data.npy", ".indices.npy", ".indptr.npy") if self.sparse else (".npy",)
+        quantized = (".float16.npy", ".int8.npy", ".int8.scales.npy") + tuple(
+            f".postings.{part}.npy" for part in POSTING_PARTS)
+        files = [self._path(name + suffix) for suffix in suffixes + (".ids.npy",)]
+        return files + [self._path(name + suffix) for suffix in quantized if os.path.exists(self._path(name + suffix))]
+
+    def _quantized_segment(self, name, precision):
+        segment = self._quantized.get((name, precision))
+        if segment is None:
+            if not os.path.exists(self._path(f"{name}.{precision}.npy")):
+                codes, scales = quantize(np.load(self._path(f"{name}.npy"), mmap_mode="r"), precision)
+                if scales is not None:
+                    np.save(self._path(f"{name}.{precision}.scales.npy"), scales)
+                # Codes last: their presence marks the sidecar complete
+                np.save(self._path(f"{name}.{precision}.npy"), codes)
+            scales_path = self._path(f"{name}.{precision}.scales.npy")
+            segment = self._quantized[(name, precision)] = QuantizedSegment(
+                np.load(self._path(f"{name}.{precision}.npy"), mmap_mode="r"),
+                np.load(scales_path, mmap_mode="r") if precision == "int8" else None
+            )
+        return segment
+
+    def _posting_lists(self, name):
+        # Segments never change once written, so their posting lists are written once
+        postings = self._postings.get(name)
+        if postings is None:
+            if not os.path.exists(self._path(f"{name}.postings.indptr.npy")):
+                built = PostingLists.from_csr(self._segments[self._segment_position(name)])
+                for part in POSTING_PARTS[1:] + POSTING_PARTS[:1]:  # indptr last marks them complete
+                    np.save(self._path(f"{name}.postings.{part}.npy"), getattr(built, part))
+            parts = {part: np.load(self._path(f"{name}.postings.{part}.npy"), mmap_mode="r") for part in POSTING_PARTS}
+            postings = self._postings[name] = PostingLists(n_docs=self._segments[self._segment_position(name)].shape[0], **parts)
+        return postings
+
+    def _segment_position(self, name):
+        return [segment["name"] for segment in self.manifest["segments"]].index(name)
+
+    def _write_segment(self, name, vectors, ids):
+        if self.sparse:
+            vectors = csr_matrix(vectors, dtype=np.float32)
+            np.save(self._path(f"{name}.data.npy"), vectors.data)
+            np.save(self._path(f"{name}.indices.npy"), vectors.indices)
+            np.save(self._path(f"{name}.indptr.npy"), vectors.indptr)
+        else:
+            np.save(self._path(f"{name}.npy"), np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+        np.save(self._path(f"{name}.ids.npy"), ids)
+
+    def _open_segment(self, name):
+        if not self.sparse:
+            return np.load(self._path(f"{name}.npy"), mmap_mode="r")
+        indptr = np.load(self._path(f"{name}.indptr.npy"), mmap_mode="r")
+        return csr_matrix(
+            (np.load(self._path(f"{name}.data.npy"), mmap_mode="r"),
+             np.load(self._path(f"{name}.indices.npy"), mmap_mode="r"),
+             indptr),
+            shape=(len(indptr) - 1, self.manifest["dim"]),
+            copy=False
+        )
+
+    def _save_tombstones(self):
+        tmp = self._path(TOMBSTONES + ".tmp.npy")
+        np.save(tmp, np.packbits(self.index.dead))
+        os.replace(tmp, self._path(TOMBSTONES))
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def exists(directory):
+    return os.path.exists(os.path.join(directory, MANIFEST))
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+class IdIndex:
+    """
+    Immutable News ID <-> row mapping of an embedding bank. Rows never move;
+    writers derive a new index with `append`/`drop` and deleted rows stay
+    (marked dead) until compaction.
+    """
+    def __init__(self, ids, dead=None):
+        self.ids = np.asarray(ids, dtype=str)
+        self.dead = np.zeros(len(self.ids), dtype=bool) if dead is None else np.asarray(dead, dtype=bool)
+        self.live_rows = np.flatnonzero(~self.dead)
+        self._index = pd.Index(self.ids[self.live_rows])
+        # get_indexer reports a miss as -1, which picks the trailing -1 here
+        self._row_or_missing = np.append(self.live_rows, -1)
+
+    @property
+    def n_rows(self):
+        """Rows in the bank, deleted ones included."""
+        return len(self.ids)
+
+    @property
+    def has_dead(self):
+        return len(self.live_rows) < len(self.ids)
+
+    def __len__(self):
+        return len(self.live_rows)
+
+    def __contains__(self, news_id):
+        return news_id in self._index
+
+    def row(self, news_id):
+        """Live row of a News ID, or None."""
+        try:
+            return int(self.live_rows[self._index.get_loc(news_id)])
+        except KeyError:
+            return None
+
+    def rows(self, news_ids):
+        """Live rows of many News IDs at once (-1 when unknown)."""
+        if len(news_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        return self._row_or_missing[self._index.get_indexer(news_ids)]
+
+    def append(self, news_ids):
+        """Index with rows for `news_ids` added at the end; earlier rows of the same IDs are retired."""
+        news_ids = np.asarray(news_ids, dtype=str)
+        # Within the batch, the last row of a repeated ID wins
+        _, last = np.unique(news_ids[::-1], return_index=True)
+        appended_dead = np.ones(len(news_ids), dtype=bool)
+        appended_dead[len(news_ids) - 1 - last] = False
+
+        dead = np.concatenate([self.dead, appended_dead])
+        replaced = self.rows(news_ids)
+        dead[replaced[replaced >= 0]] = True
+        return IdIndex(np.concatenate([self.ids, news_ids]), dead)
+
+    def drop(self, news_id):
+        """Index with the live row of `news_id` retired."""
+        row = self.row(news_id)
+        if row is None:
+            raise ValueError("News ID not found.")
+        dead = self.dead.copy()
+        dead[row] = True
+        return IdIndex(self.ids, dead)
+
+    def without(self, news_ids):
+        """Index with the live rows of any of `news_ids` retired; unknown IDs are ignored."""
+        rows = self.rows(news_ids)
+        rows = rows[rows >= 0]
+        if len(rows) == 0:
+            return self
+        dead = self.dead.copy()
+        dead[rows] = True
+        return IdIndex(self.ids, dead)
+
+    def compacted(self):
+        """Index over the live rows only, in row order, as written by a compaction."""
+        return IdIndex(self.ids[self.live_rows])
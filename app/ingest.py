@@ -0,0 +1,133 @@
+import argparse
+import json
+from itertools import islice
+from app import utils
+
+FORMATS = ("jsonl", "tsv")
+REQUIRED_FIELDS = ("News_ID", "Category", "Subcategory", "News_Title", "News_Abstract")
+# news.tsv column order, as NewsItem fields
+TSV_FIELDS = REQUIRED_FIELDS + ("News_Url", "Entities_in_News_Title", "Entities_in_News_Abstract")
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 64
+
+
+def parse_item(line, fmt):
+    """
+    One news item from a JSONL line (NewsItem fields) or a news.tsv row.
+    Raises ValueError for malformed lines.
+    """
+    if fmt == "jsonl":
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON: {e}")
+        if not isinstance(item, dict):
+            raise ValueError("expected a JSON object")
+    else:
+        values = line.rstrip("\r\n").split("\t")
+        if len(values) < len(REQUIRED_FIELDS):
+            raise ValueError(f"expected at least {len(REQUIRED_FIELDS)} tab-separated columns")
+        item = dict(zip(TSV_FIELDS, values))
+
+    missing = [field for field in REQUIRED_FIELDS if not isinstance(item.get(field), str)]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+    return item
+
+
+def parse_lines(lines, fmt, errors):
+    """Parse numbered (line_no, line) pairs, skipping blank lines and recording bad ones in `errors`."""
+    for line_no, line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield parse_item(line, fmt)
+        except ValueError as e:
+            errors.append({"line": line_no, "error": str(e)})
+
+
+def chunks(items, chunk_size):
+    items = iter(items)
+    while chunk := list(islice(items, chunk_size)):
+        yield chunk
+
+
+class IngestReport:
+    """Running totals of a bulk ingest."""
+    def __init__(self):
+        self.added = 0
+        self.skipped = []
+        self.errors = []
+
+    def record(self, added, skipped):
+        self.added += len(added)
+        self.skipped.extend(skipped)
+
+    def to_dict(self):
+        return {"added": self.added, "skipped": self.skipped, "errors": self.errors}
+
+
+def ingest_chunk(registry, chunk, report, batch_size=DEFAULT_BATCH_SIZE, n_jobs=1):
+    """Commit one chunk through the registry: one write, one append per file, one refresh."""
+    from app import news_database
+
+    with registry.write() as snapshot:
+        added, skipped = news_database.add_news_items(
+            snapshot.catalogue,
+            chunk,
+            snapshot.stores["bert"],
+            snapshot.stores["tfidf"],
+            snapshot.encoders["bert"],
+            snapshot.encoders["tfidf"],
+            ann_index=snapshot.ann_index,
+            batch_size=batch_size,
+            n_jobs=n_jobs
+        )
+    report.record(added, skipped)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk-add news items offline (stop the API first: it holds the assets in memory)."
+    )
+    parser.add_argument("--input", required=True, help="JSONL file of NewsItem objects or news.tsv-formatted rows")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="defaults to the input file extension")
+    parser.add_argument("--assets", default="app/model_assets", help="model_assets directory")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="items committed per write")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="encoder batch size")
+    parser.add_argument("--n-jobs", type=int, default=1, help="processes for text cleaning")
+    args = parser.parse_args()
+
+    from app import assets, news_database, ann_index
+    fmt = args.format or ("tsv" if args.input.endswith(".tsv") else "jsonl")
+    registry = assets.AssetRegistry(args.assets)
+    stores = {mode: registry.load_store(mode) for mode in assets.MODES}
+    bert_model = utils.load_bert_model(registry.path("bert_model"))
+    tfidf_model = utils.load_tfidf_model(registry.path("tfidf_vectorizer.pkl"))
+    ann = ann_index.IVFIndex.load(registry.path("bert_ivf")) if ann_index.exists(registry.path("bert_ivf")) else None
+    catalogue = registry.load_catalogue()
+
+    report = IngestReport()
+    with open(args.input, encoding="utf-8") as f:
+        for chunk in chunks(parse_lines(enumerate(f, start=1), fmt, report.errors), args.chunk_size):
+            added, skipped = news_database.add_news_items(
+                catalogue, chunk, stores["bert"], stores["tfidf"], bert_model, tfidf_model,
+                ann_index=ann, batch_size=args.batch_size, n_jobs=args.n_jobs
+            )
+            report.record(added, skipped)
+            print(f"Added {report.added} items ({len(report.skipped)} skipped, {len(report.errors)} errors)")
+
+    if ann is not None:
+        ann.save(registry.path("bert_ivf"))
+    if catalogue.needs_compaction():
+        catalogue.compact()
+    for store in stores.values():
+        if store.needs_compaction():
+            store.compact()
+    for error in report.errors[:20]:
+        print(f"line {error['line']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    main()
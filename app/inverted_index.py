@@ -0,0 +1,110 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class PostingLists:
+    """
+    Term-major view of one sparse, row-normalized bank segment: term `t`
+    occurs in rows `docs[indptr[t]:indptr[t + 1]]` (ascending) with weights
+    `weights[...]`. `max_weights[t]` bounds the weight of any row on term `t`.
+    """
+    def __init__(self, indptr, docs, weights, max_weights, n_docs):
+        self.indptr = indptr
+        self.docs = docs
+        self.weights = weights
+        self.max_weights = max_weights
+        self.n_docs = n_docs
+
+    @classmethod
+    def from_csr(cls, segment):
+        by_term = csr_matrix(segment).T.tocsr()
+        by_term.sort_indices()
+        max_weights = np.zeros(by_term.shape[0], dtype=np.float32)
+        non_empty = np.diff(by_term.indptr) > 0
+        if non_empty.any():
+            max_weights[non_empty] = np.maximum.reduceat(by_term.data, by_term.indptr[:-1][non_empty])
+        return cls(by_term.indptr.astype(np.int64), by_term.indices.astype(np.int32),
+                   by_term.data.astype(np.float32), max_weights, segment.shape[0])
+
+    def postings(self, term):
+        start, end = self.indptr[term], self.indptr[term + 1]
+        return self.docs[start:end], self.weights[start:end]
+
+    def accumulate(self, term, weight, out):
+        """out[row] += weight * w(row, term) for every row of the term."""
+        docs, weights = self.postings(term)
+        out[docs] += weight * weights
+
+    def accumulate_candidates(self, term, weight, out, candidates):
+        """
+        Same, but only needed for the (ascending, segment-local) `candidates`
+        rows: the whole term is added when that is cheaper than probing.
+        """
+        docs, weights = self.postings(term)
+        if len(docs) == 0 or len(candidates) == 0:
+            return
+        if len(candidates) >= len(docs):
+            out[docs] += weight * weights
+            return
+        positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+        found = docs[positions] == candidates
+        out[candidates[found]] += weight * weights[positions[found]]
+
+
+def score_query(postings, offsets, terms, weights, out, top_k=None, dead=None):
+    """
+    Dot products of one sparse query (term ids, weights) with every row of the
+    segments, written into `out`. With `top_k`, MaxScore-style pruning keeps
+    the top-k rows not `dead` exact and leaves lower bounds elsewhere.
+    """
+    out[:] = 0
+    if top_k is None:
+        for posting, start, end in zip(postings, offsets[:-1], offsets[1:]):
+            for term, weight in zip(terms, weights):
+                posting.accumulate(term, weight, out[start:end])
+        return out
+
+    bounds = np.array([
+        weight * max((posting.max_weights[term] for posting in postings), default=0.0)
+        for term, weight in zip(terms, weights)
+    ])
+    order = np.argsort(-bounds, kind="stable")
+    remaining = bounds.sum()
+    k = min(top_k, len(out))
+    seen = 0.0
+    next_check = remaining
+    candidates = None
+    for term, weight, bound in zip(terms[order], weights[order], bounds[order]):
+        remaining -= bound
+        seen += bound
+        if candidates is None:
+            for posting, start, end in zip(postings, offsets[:-1], offsets[1:]):
+                posting.accumulate(term, weight, out[start:end])
+            # No row has scored more than `seen` yet, and each failed check waits for `remaining` to halve
+            if k and seen > remaining and remaining <= next_check:
+                candidates = _survivors(out, dead, k, remaining)
+                next_check = remaining / 2
+                if candidates is not None:
+                    # Segment-local survivors, split once for the remaining terms
+                    splits = np.searchsorted(candidates, offsets)
+                    candidates = [candidates[lo:hi] - start for lo, hi, start in zip(splits[:-1], splits[1:], offsets[:-1])]
+        else:
+            for posting, start, end, local in zip(postings, offsets[:-1], offsets[1:], candidates):
+                posting.accumulate_candidates(term, weight, out[start:end], local)
+    return out
+
+
+def _survivors(out, dead, k, remaining):
+    """
+    Live rows that can still reach the top-k, or None while the k-th best
+    live score does not exceed `remaining`. Rows not scored yet can reach
+    `remaining` at most, so they are out as well.
+    """
+    rows = np.flatnonzero(out > 0 if dead is None else (out > 0) & ~dead)
+    if len(rows) < k:
+        return None
+    scores = out[rows]
+    threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+    if threshold <= remaining:
+        return None
+    return rows[scores + remaining >= threshold]
@@ -1,10 +1,16 @@
 import os
-from fastapi import FastAPI, HTTPException, Query
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import Optional, Literal, List
 from pathlib import Path
+import json
 import random
-from app import utils, recommender, news_database, Evaluator
+import threading
+import time
+from app import assets, asset_sync, Evaluator, ingest, write_queue, cf_engine, click_histories, news_database, result_cache, metrics
 
 # Base directory setup
 BASE_DIR = Path(__file__).resolve().parent
@@ -13,13 +19,112 @@ ASSETS_DIR = BASE_DIR / "model_assets"
 print("ASSETS_DIR =", ASSETS_DIR)
 print("Files:", os.listdir(ASSETS_DIR))
 
-app = FastAPI()
+# Precision of the bank scanned for bert content scores: float32 (exact), float16 or int8 (re-ranked)
+BERT_PRECISION = os.environ.get("BERT_PRECISION", "float32")
 
-# Load core data
-print("LOADING ASSETS")
-behaviors = utils.load_behaviors_data(str(ASSETS_DIR / "behaviors.tsv"))
-item_sim_df = utils.load_item_sim_df(str(ASSETS_DIR / "item_sim_df.pkl"))
-user_clicks = utils.get_user_clicks(behaviors)
+# Worker processes serving this asset directory (uvicorn --workers, see start.sh). With more than
+# one, they map the same asset files and coordinate writes through a file lock and a shared version
+WORKERS = int(os.environ.get("WORKERS", "1"))
+sync = asset_sync.AssetSync(ASSETS_DIR) if WORKERS > 1 else None
+# Seconds between saves of the CF index while clicks come in, so the other workers follow it
+CF_PERSIST_INTERVAL = float(os.environ.get("CF_PERSIST_INTERVAL", "5"))
+
+# Shared, versioned assets (news, embedding banks, encoders, recommenders)
+registry = assets.AssetRegistry(ASSETS_DIR, bert_precision=BERT_PRECISION, sync=sync)
+# Single background writer per worker: add/update/delete requests only enqueue a job
+writer = write_queue.WriteQueue(registry, journal_dir=str(ASSETS_DIR / "write_jobs") if sync else None)
+# Co-click counts kept current from new clicks; refreshes the touched CF neighbour lists.
+# With several workers only the leader runs it
+cf_updater = cf_engine.CoClickEngine(registry, persist_interval=CF_PERSIST_INTERVAL if sync else None)
+# Results of /get-hybrid-simil and /recommend/batch per (News ID, mode, alpha, topk, nprobe, prune, content version)
+results = result_cache.ResultCache()
+news_database.on_change(results.invalidate)
+cf_updater.on_refresh(results.invalidate_items)
+# Most-clicked articles precomputed in the background at startup
+WARMUP_ITEMS = 1000
+
+
+def warm_results():
+    snapshot = registry.current
+    result_cache.warm(results, snapshot, snapshot.user_clicks.most_clicked(WARMUP_ITEMS))
+
+
+def follow_clicks():
+    """
+    Multi-worker mode: clicks reach behaviors.tsv through any worker, so every
+    worker applies them to its user profiles from there, and the leader also
+    counts them into the CF index.
+    """
+    log = click_histories.ClickLog(registry.path("behaviors.tsv"),
+                                   click_histories.cached_source(registry.path(assets.CLICKS_DIR))["size"])
+    while True:
+        time.sleep(sync.interval)
+        try:
+            for user_id, news_ids in log.read():
+                snapshot = registry.current
+                snapshot.user_profiles.add_clicks(user_id, news_ids, snapshot.recommender("bert"))
+                if registry.owns_cf_index:
+                    cf_updater.submit(user_id, news_ids)
+        except Exception as e:
+            print(f"Following clicks failed: {e}")
+
+
+def load_assets():
+    print("LOADING ASSETS")
+    if sync is not None:
+        registry.owns_cf_index = sync.try_lead()
+    registry.load()
+    print("ASSETS READY")
+    writer.start()
+    if registry.owns_cf_index:
+        cf_updater.start()
+    if sync is not None:
+        sync.watch(registry.catch_up)
+        threading.Thread(target=follow_clicks, name="click-follower", daemon=True).start()
+    warm_results()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Loaded in the background so the server answers /ready (503 until loaded) right away
+    threading.Thread(target=load_assets, name="asset-loader", daemon=True).start()
+    yield
+    if sync is not None:
+        sync.stop()
+    if registry.ready and registry.owns_cf_index:
+        # Neighbour lists refreshed since the last save would otherwise be lost
+        cf_updater.join(timeout=30)
+        registry.save_cf_index()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    """
+    Request latency per route. With an `X-Profile: 1` header or `?profile=1`,
+    the request is also profiled: its stage breakdown comes back in a
+    Server-Timing header and the most sampled functions in X-Profile-Samples.
+    """
+    start = time.perf_counter()
+    if request.headers.get("X-Profile") == "1" or request.query_params.get("profile") in ("1", "true"):
+        with metrics.profiling() as profile:
+            response = await call_next(request)
+        response.headers["Server-Timing"] = profile.server_timing()
+        response.headers["X-Profile-Samples"] = profile.top_samples()
+    else:
+        response = await call_next(request)
+
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, request.method,
+                                    route.path if route is not None else "unmatched", response.status_code)
+    return response
+
+
+@app.exception_handler(assets.AssetsNotReady)
+def assets_not_ready(request, exc):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 
 # ========== Data Models ========== #
@@ -34,91 +139,262 @@ class NewsItem(BaseModel):
     Entities_in_News_Abstract: Optional[list] = []
 
 
+class BatchRecommendRequest(BaseModel):
+    News_IDs: List[str]
+    topk: int = 10
+    model: Literal["bert", "tfidf"] = "bert"
+    alpha: float = 0.5
+
+
+class UserClicks(BaseModel):
+    User_ID: str
+    News_IDs: List[str]
+
+
 # ========== Endpoints ========== #
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the memory-mapped assets are published; encoders may still be warming up."""
+    body = {"ready": registry.ready, "assets": registry.load_state}
+    if not registry.ready:
+        return JSONResponse(status_code=503, content=body)
+    snapshot = registry.current
+    body["version"] = snapshot.version
+    body["encoders_ready"] = all(getattr(encoder, "loaded", True) for encoder in snapshot.encoders.values())
+    if sync is not None:
+        body["worker"] = {"pid": os.getpid(), "leader": registry.owns_cf_index, "shared_version": sync.version()}
+    return body
+
+@app.get("/version")
+def get_version():
+    """
+    Version of the served index, for clients caching results: it changes with
+    every write and CF update. With several workers it is the shared version.
+    """
+    version = registry.current.version if sync is None else sync.version()
+    return {"version": version}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text format: latency histograms, cache counters, catalogue and bank sizes."""
+    stats = results.stats()
+    lines = metrics.REQUEST_SECONDS.render() + metrics.STAGE_SECONDS.render()
+    lines += metrics.gauge("result_cache_lookups_total", "Result cache lookups.", ("result",),
+                           {("hit",): stats["hits"], ("miss",): stats["misses"]}, kind="counter")
+    lines += metrics.gauge("result_cache_evictions_total", "Result cache evictions.", (), {(): stats["evictions"]}, kind="counter")
+    lines += metrics.gauge("result_cache_entries", "Cached results.", (), {(): stats["entries"]})
+    lines += metrics.gauge("result_cache_bytes", "Approximate size of the cached results.", (), {(): stats["bytes"]})
+    lines += metrics.gauge("asset_load_seconds", "Startup load time per asset.", ("asset",),
+                           {(name, ): state["seconds"] for name, state in registry.load_state.items()
+                            if state["seconds"] is not None})
+    lines += metrics.gauge("write_queue_pending", "News writes waiting to be applied.", (), {(): writer.pending()})
+    lines += metrics.gauge("cf_engine_pending", "Click batches waiting to be counted.", (), {(): cf_updater.pending()})
+
+    if registry.ready:
+        snapshot = registry.current
+        lines += metrics.gauge("asset_version", "Published asset version.", (), {(): snapshot.version})
+        lines += metrics.gauge("catalogue_items", "Live news items.", (), {(): len(snapshot.news)})
+        lines += metrics.gauge("cf_index_items", "Items with CF neighbour lists.", (), {(): len(snapshot.cf_index)})
+        lines += metrics.gauge("embedding_bank_bytes", "Size of the embedding banks.", ("mode", "precision"), {
+            **{(mode, "float32"): bank.nbytes for mode, bank in snapshot.embeddings.items()},
+            **{(mode, bank.precision): bank.quantized_nbytes
+               for mode, bank in snapshot.embeddings.items() if bank.quantized is not None},
+        })
+        lines += metrics.gauge("embedding_bank_rows", "Rows in the embedding banks, live and deleted.", ("mode", "state"), {
+            key: value for mode, bank in snapshot.embeddings.items()
+            for key, value in (((mode, "live"), len(bank.index)), ((mode, "deleted"), bank.shape[0] - len(bank.index)))
+        })
+    return "\n".join(lines) + "\n"
+
 @app.get("/get-news-by-id/{News_ID}")
 def get_news_by_id(News_ID: str):
-    news = utils.load_news_data(str(ASSETS_DIR / "news.tsv"))
-    if News_ID not in news.index:
+    record = registry.current.news.get(News_ID)
+    if record is None:
         raise HTTPException(status_code=404, detail="News ID not found")
-    return news.loc[News_ID].to_dict()
+    return record
 
 @app.get("/get-hybrid-simil/{News_ID}")
 def get_hybrid_simil(
     News_ID: str,
     topk: int = 10,
     model: Literal["bert", "tfidf"] = "bert",
-    alpha: float = 0.5
+    alpha: float = 0.5,
+    nprobe: Optional[int] = Query(None, gt=0, description="IVF lists to probe (bert only); more is slower but closer to exact"),
+    prune: bool = Query(False, description="Skip TF-IDF postings that cannot reach the top content scores (tfidf only)")
 ):
-    news = utils.load_news_data(str(ASSETS_DIR / "news.tsv"))
-    if News_ID not in news.index:
+    snapshot = registry.current
+    if News_ID not in snapshot.news:
         raise HTTPException(status_code=404, detail="News ID not found")
 
-    if model == "bert":
-        embeddings, embed_model = utils.load_bert(str(ASSETS_DIR / "bert_embeddings.pt"), str(ASSETS_DIR / "bert_model"))
-    else:
-        embeddings, embed_model = utils.load_tfidf(str(ASSETS_DIR / "tfidf_embeddings.npz"), str(ASSETS_DIR / "tfidf_vectorizer.pkl"))
-
-    recommender_obj = recommender.HybridRecommender(
-        news=news,
-        embeddings=embeddings,
-        model=embed_model,
-        item_sim_df=item_sim_df,
-        mode=model,
-        alpha=alpha,
-        topk=topk
-    )
-    return recommender_obj.recommend(News_ID)
-
-@app.post("/add-news-item")
+    key = (News_ID, model, alpha, topk, nprobe, prune)
+    result = results.get(key, snapshot)
+    if result is None:
+        recommender_obj = snapshot.recommender(model).with_params(alpha=alpha, topk=topk, nprobe=nprobe, prune=prune)
+        result = recommender_obj.recommend(News_ID)
+        results.put(key, snapshot, result)
+    return result
+
+@app.post("/recommend/batch")
+def recommend_batch(request: BatchRecommendRequest):
+    snapshot = registry.current
+    news_ids = list(dict.fromkeys(request.News_IDs))
+    found = [news_id for news_id in news_ids if news_id in snapshot.news]
+    not_found = [news_id for news_id in news_ids if news_id not in snapshot.news]
+
+    found_results = {}
+    for news_id in found:
+        result = results.get((news_id, request.model, request.alpha, request.topk, None, False), snapshot)
+        if result is not None:
+            found_results[news_id] = result
+
+    # Only the misses are scored, still as one batch
+    missing = [news_id for news_id in found if news_id not in found_results]
+    recommender_obj = snapshot.recommender(request.model).with_params(alpha=request.alpha, topk=request.topk)
+    for news_id, result in zip(missing, recommender_obj.recommend_many(missing)):
+        results.put((news_id, request.model, request.alpha, request.topk, None, False), snapshot, result)
+        found_results[news_id] = result
+
+    return {
+        "results": {news_id: found_results[news_id] for news_id in found},
+        "not_found": not_found
+    }
+
+@app.get("/recommend/user/{user_id}")
+def recommend_for_user(
+    user_id: str,
+    topk: int = 10,
+    model: Literal["bert", "tfidf"] = "bert",
+    alpha: float = 0.5
+):
+    snapshot = registry.current
+    profiles = snapshot.user_profiles
+    if user_id not in profiles:
+        raise HTTPException(status_code=404, detail="User ID not found")
+
+    recommender_obj = snapshot.recommender(model).with_params(alpha=alpha, topk=topk)
+    profile = profiles.profile(user_id, recommender_obj)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="User has no clicks on known news items")
+
+    return recommender_obj.recommend_profile(profile, profiles.history(user_id))
+
+@app.post("/add-user-clicks")
+def add_user_clicks(clicks: UserClicks):
+    snapshot = registry.current
+    profiles = snapshot.user_profiles
+    known = profiles.history(clicks.User_ID) if clicks.User_ID in profiles else ()
+    # Logged to behaviors.tsv for the next rebuild, minus the ones the user already has. With
+    # several workers, every worker picks them up from there (follow_clicks); otherwise they are
+    # applied here, the CF in the background
+    new_clicks = click_histories.append_clicks(registry.path("behaviors.tsv"), clicks.User_ID, clicks.News_IDs, known)
+    if sync is None and new_clicks:
+        profiles.add_clicks(clicks.User_ID, new_clicks, snapshot.recommender("bert"))
+        cf_updater.submit(clicks.User_ID, new_clicks)
+    return {
+        "status": "success",
+        "message": f"{len(new_clicks)} new clicks recorded for {clicks.User_ID}.",
+        "cf_pending": cf_updater.pending(),
+    }
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return results.stats()
+
+
+@app.get("/cf-engine/status")
+def cf_engine_status():
+    return {**cf_updater.status(), "cf_items": len(registry.current.cf_index), "leader": registry.owns_cf_index}
+
+@app.get("/get-text-simil")
+def get_text_simil(
+    text: str,
+    topk: int = 10,
+    model: Literal["bert", "tfidf"] = "bert",
+    alpha: float = 0.5
+):
+    recommender_obj = registry.current.recommender(model).with_params(alpha=alpha, topk=topk)
+    return recommender_obj.recommend_text(text)
+
+def queued(job, message):
+    return {"status": "queued", "job_id": job.job_id, "message": message}
+
+@app.post("/add-news-item", status_code=202)
 def add_news(item: NewsItem):
-    try:
-        news_df = utils.load_news_data(str(ASSETS_DIR / "news.tsv"))
-        news_database.add_news_item(news_df, str(ASSETS_DIR / "news.tsv"), item.model_dump())
+    job = writer.submit("add", item.News_ID, item.model_dump())
+    return queued(job, f'News "{item.News_ID}" queued for adding.')
 
-        news_database.update_bert_embedding(item.model_dump(), str(ASSETS_DIR / "bert_model"), str(ASSETS_DIR / "bert_embeddings.pt"))
-        news_database.update_tfidf_embedding(item.model_dump(), str(ASSETS_DIR / "tfidf_vectorizer.pkl"), str(ASSETS_DIR / "tfidf_embeddings.npz"))
+async def numbered_lines(stream):
+    """(line number, text) pairs from a streamed request body."""
+    line_no, pending = 0, b""
+    async for data in stream:
+        *lines, pending = (pending + data).split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.decode("utf-8")
+    if pending:
+        yield line_no + 1, pending.decode("utf-8")
 
-        return {"status": "success", "message": f'News "{item.News_ID}" added and encoded.'}
+async def parse_stream(lines, fmt, errors):
+    async for line_no, line in lines:
+        for item in ingest.parse_lines([(line_no, line)], fmt, errors):
+            yield item
 
-    except ValueError as ve:
-        raise HTTPException(status_code=400, detail=str(ve))
+@app.post("/add-news-items/bulk")
+async def add_news_bulk(
+    request: Request,
+    format: Literal["jsonl", "tsv"] = Query("jsonl", description="JSONL of NewsItem objects or news.tsv-formatted rows"),
+    chunk_size: int = Query(ingest.DEFAULT_CHUNK_SIZE, gt=0, description="items committed per write"),
+    batch_size: int = Query(ingest.DEFAULT_BATCH_SIZE, gt=0, description="encoder batch size"),
+    n_jobs: int = Query(1, ge=1, le=os.cpu_count() or 1, description="processes for text cleaning")
+):
+    """
+    Stream many news items in the request body. Every chunk is encoded in
+    batches and committed on its own, so items of earlier chunks stay added
+    if a later one fails.
+    """
+    report = ingest.IngestReport()
+    chunk = []
+    try:
+        async for item in parse_stream(numbered_lines(request.stream()), format, report.errors):
+            chunk.append(item)
+            if len(chunk) == chunk_size:
+                await run_in_threadpool(ingest.ingest_chunk, registry, chunk, report, batch_size, n_jobs)
+                chunk = []
+        if chunk:
+            await run_in_threadpool(ingest.ingest_chunk, registry, chunk, report, batch_size, n_jobs)
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body is not valid UTF-8: {e}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal error after {report.added} items: {str(e)}")
 
-@app.put("/update-news-item/{news_id}")
+    return {"status": "success", **report.to_dict()}
+
+@app.put("/update-news-item/{news_id}", status_code=202)
 def update_news_item_endpoint(news_id: str, item: NewsItem):
-    try:
-        news_database.update_news_item(
-            news_id,
-            str(ASSETS_DIR / "news.tsv"),
-            item.model_dump(),
-            str(ASSETS_DIR / "bert_embeddings.pt"),
-            str(ASSETS_DIR / "tfidf_embeddings.npz"),
-            str(ASSETS_DIR / "bert_model"),
-            str(ASSETS_DIR / "tfidf_vectorizer.pkl")
-        )
-        return {"status": "success", "message": f"{news_id} updated."}
-
-    except ValueError as ve:
-        raise HTTPException(status_code=404, detail=str(ve))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job = writer.submit("update", news_id, {**item.model_dump(), "News_ID": news_id})
+    return queued(job, f"{news_id} queued for update.")
 
-@app.delete("/delete-news-item/{news_id}")
+@app.delete("/delete-news-item/{news_id}", status_code=202)
 def delete_news_item_endpoint(news_id: str):
-    try:
-        news_database.delete_news_item(
-            news_id,
-            str(ASSETS_DIR / "news.tsv"),
-            str(ASSETS_DIR / "bert_embeddings.pt"),
-            str(ASSETS_DIR / "tfidf_embeddings.npz")
-        )
-        return {"status": "success", "message": f"{news_id} deleted."}
-    except ValueError as ve:
-        raise HTTPException(status_code=404, detail=str(ve))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job = writer.submit("delete", news_id)
+    return queued(job, f"{news_id} queued for deletion.")
+
+@app.get("/write-jobs/{job_id}")
+def get_write_job(job_id: str):
+    job = writer.job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job ID not found")
+    return {**job.to_dict(), "pending": writer.pending()}
+
+def sample_user_clicks(user_clicks, n_users, seed):
+    user_ids = list(user_clicks.keys())
+    if seed:
+        random.seed(seed)
+    sampled_users = random.sample(user_ids, min(n_users, len(user_ids)))
+    # With repeats, as utils.get_user_clicks lists them: the metrics count them
+    return {u: user_clicks.evaluation_clicks(u) for u in sampled_users}
 
 @app.post("/evaluate-recommender/")
 def evaluate_recommender(
@@ -126,39 +402,73 @@ def evaluate_recommender(
     alpha: float = Query(0.5, ge=0, le=1),
     topk: int = Query(10, gt=0),
     n_users: int = Query(100, gt=0),
-    seed: Optional[int] = None
+    seed: Optional[int] = None,
+    n_jobs: int = Query(1, ge=1, le=os.cpu_count() or 1)
 ):
-    news_df = utils.load_news_data(str(ASSETS_DIR / "news.tsv"))
-    user_click_sample = utils.get_user_clicks(behaviors)
-
-    if model == "bert":
-        embeddings, embed_model = utils.load_bert(str(ASSETS_DIR / "bert_embeddings.pt"), str(ASSETS_DIR / "bert_model"))
-    else:
-        embeddings, embed_model = utils.load_tfidf(str(ASSETS_DIR / "tfidf_embeddings.npz"), str(ASSETS_DIR / "tfidf_vectorizer.pkl"))
+    snapshot = registry.current
+    sampled_clicks = sample_user_clicks(snapshot.user_clicks, n_users, seed)
 
-    user_ids = list(user_click_sample.keys())
-    if seed:
-        random.seed(seed)
-    sampled_users = random.sample(user_ids, min(n_users, len(user_ids)))
-    sampled_clicks = {u: user_click_sample[u] for u in sampled_users}
-
-    recommender_obj = recommender.HybridRecommender(
-        news=news_df,
-        embeddings=embeddings,
-        model=embed_model,
-        item_sim_df=item_sim_df,
-        mode=model,
-        alpha=alpha,
-        topk=topk
-    )
+    recommender_obj = snapshot.recommender(model).with_params(alpha=alpha, topk=topk)
 
-    evaluator = Evaluator.Evaluator(recommender_obj, sampled_clicks, k=topk)
+    evaluator = Evaluator.Evaluator(recommender_obj, sampled_clicks, k=topk, n_jobs=n_jobs)
     results = evaluator.evaluate_all()
 
     return {
         "model": model,
         "alpha": alpha,
         "topk": topk,
-        "n_users": len(sampled_users),
+        "n_users": len(sampled_clicks),
         "metrics": results
-    }
\ No newline at end of file
+    }
+
+@app.post("/evaluate-recommender/stream")
+def evaluate_recommender_stream(
+    model: Literal["bert", "tfidf"] = Query("bert"),
+    alpha: float = Query(0.5, ge=0, le=1),
+    topk: int = Query(10, gt=0),
+    n_users: int = Query(100, gt=0),
+    seed: Optional[int] = None,
+    block_size: int = Query(64, gt=0, description="users evaluated between two progress lines")
+):
+    """
+    Same evaluation as /evaluate-recommender/, streamed as JSON lines: one
+    {"done", "total", "metrics"} line per block of users with the averages so
+    far, then a final line with "final": true and the full result.
+    """
+    snapshot = registry.current
+    sampled_clicks = sample_user_clicks(snapshot.user_clicks, n_users, seed)
+    recommender_obj = snapshot.recommender(model).with_params(alpha=alpha, topk=topk)
+    evaluator = Evaluator.Evaluator(recommender_obj, sampled_clicks, k=topk)
+
+    def lines():
+        done, total, results = 0, 0, {}
+        for done, total, results in evaluator.evaluate_progress(block_size):
+            yield json.dumps({"done": done, "total": total, "metrics": results}) + "\n"
+        yield json.dumps({
+            "done": done, "total": total, "final": True,
+            "model": model, "alpha": alpha, "topk": topk, "n_users": len(sampled_clicks), "metrics": results
+        }) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/evaluate-recommender/sweep")
+def evaluate_recommender_sweep(
+    model: Literal["bert", "tfidf"] = Query("bert"),
+    alphas: List[float] = Query([0.0, 0.25, 0.5, 0.75, 1.0]),
+    topks: List[int] = Query([5, 10, 20]),
+    n_users: int = Query(100, gt=0),
+    seed: Optional[int] = None,
+    n_jobs: int = Query(1, ge=1, le=os.cpu_count() or 1)
+):
+    if any(not 0 <= alpha <= 1 for alpha in alphas) or any(k <= 0 for k in topks):
+        raise HTTPException(status_code=422, detail="alphas must be in [0, 1] and topks positive.")
+
+    snapshot = registry.current
+    sampled_clicks = sample_user_clicks(snapshot.user_clicks, n_users, seed)
+
+    evaluator = Evaluator.Evaluator(snapshot.recommender(model), sampled_clicks, n_jobs=n_jobs)
+    return {
+        "model": model,
+        "n_users": len(sampled_clicks),
+        "results": evaluator.sweep(alphas, topks)
+    }
@@ -0,0 +1,159 @@
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Seconds; Prometheus' default latency buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label set, in the Prometheus exposition format."""
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.label_names + ("le",), labels + (bound,))} {cumulative}')
+            lines.append(f"{self.name}_count{base} {cumulative}")
+            lines.append(f"{self.name}_sum{base} {values[-1]}")
+        return lines
+
+
+def gauge(name, help_text, label_names, samples, kind="gauge"):
+    """Exposition lines of a gauge (or counter) from {label values: value}."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for label_values, value in samples.items():
+        lines.append(f"{name}{_labels(label_names, label_values)} {value}")
+    return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency by route.", ("method", "route", "status"))
+STAGE_SECONDS = Histogram("recommender_stage_seconds", "Time spent per recommendation stage.", ("mode", "stage"))
+
+
+# ---------- Per-request profiling ---------- #
+
+class Profile:
+    """
+    Stage breakdown of one opted-in request, plus stack samples of the thread
+    running it. Spans nest: a stage's time includes the stages inside it.
+    """
+    def __init__(self, sample_interval=0.001):
+        self.stages = []  # (stage, seconds) in completion order
+        self.sample_interval = sample_interval
+        self.samples = Counter()  # "function (file:line)" -> samples
+        self._thread_id = None
+        self._depth = 0  # open spans; samples are only taken inside one
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def enter(self):
+        self._depth += 1
+        if self._sampler is None:
+            # The first span tells which thread does the work (sync endpoints run in the threadpool)
+            self._thread_id = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._sampler.start()
+
+    def record(self, stage, seconds):
+        self._depth -= 1
+        self.stages.append((stage, seconds))
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def totals(self):
+        totals = {}
+        for stage, seconds in self.stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def server_timing(self):
+        """Server-Timing header value (durations in ms)."""
+        return ", ".join(f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.totals().items())
+
+    def top_samples(self, n=5):
+        return "; ".join(f"{frame} x{count}" for frame, count in self.samples.most_common(n))
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None and self._depth > 0:
+                self.samples[_app_frame(frame)] += 1
+
+
+def _app_frame(frame):
+    # Innermost frame of our own code, so the samples read as pipeline stages rather than numpy internals
+    innermost = frame
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(APP_DIR):
+            innermost = frame
+            break
+        frame = frame.f_back
+    code = innermost.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{innermost.f_lineno})"
+
+
+_profile = contextvars.ContextVar("profile", default=None)
+
+
+@contextmanager
+def profiling(sample_interval=0.001):
+    """Profile the stages run in this context (and in threadpool calls made from it)."""
+    profile = Profile(sample_interval)
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+        profile.stop()
+
+
+@contextmanager
+def span(stage, mode=""):
+    """Time a pipeline stage into the stage histogram and the active profile, if any."""
+    profile = _profile.get()
+    if profile is not None:
+        profile.enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, mode, stage)
+        if profile is not None:
+            profile.record(stage, seconds)
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import threading
+import numpy as np
+from app.id_index import IdIndex
+
+COLUMNS = ("Category", "Subcategory", "News Title", "News Abstract", "News Url",
+           "Entities in News Title", "Entities in News Abstract")
+# NewsItem field of every column
+ITEM_FIELDS = ("Category", "Subcategory", "News_Title", "News_Abstract", "News_Url",
+               "Entities_in_News_Title", "Entities_in_News_Abstract")
+
+MANIFEST = "manifest.json"
+LOG = "log.jsonl"
+DEFAULT_MAX_LOG = 50_000
+
+
+class StringColumn:
+    """UTF-8 strings stored back to back in one byte array, with row offsets; row fetch is O(1)."""
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return bytes(self.data[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    @staticmethod
+    def encode(values):
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class CatalogueView:
+    """
+    Read-only snapshot of the news catalogue: memory-mapped base columns, an
+    ID index over the base rows and the records written since the base was
+    built. Later writes to the catalogue do not change a view.
+    """
+    def __init__(self, columns, index, overlay):
+        self.columns = columns
+        self.index = index        # base rows; rows replaced or deleted by the log are dead
+        self.overlay = overlay    # News ID -> record, for IDs written since the base
+
+    def __len__(self):
+        return len(self.index) + len(self.overlay)
+
+    def __contains__(self, news_id):
+        return news_id in self.overlay or news_id in self.index
+
+    def __iter__(self):
+        """Live News IDs: base rows first, then the logged ones."""
+        yield from self.index.ids[self.index.live_rows].tolist()
+        yield from self.overlay
+
+    def get(self, news_id):
+        """Record of a News ID (column -> value), or None."""
+        record = self.overlay.get(news_id)
+        if record is not None:
+            return record
+        row = self.index.row(news_id)
+        if row is None:
+            return None
+        return {column: self.columns[column][row] for column in COLUMNS}
+
+    def records(self, news_ids, columns=COLUMNS):
+        """Values of `columns` for many News IDs, as one tuple per ID (None for unknown IDs)."""
+        base_rows = self.index.rows(news_ids)
+        result = []
+        for news_id, row in zip(news_ids, base_rows.tolist()):
+            if row >= 0:
+                result.append(tuple(self.columns[column][row] for column in columns))
+            else:
+                record = self.overlay.get(news_id)
+                result.append(None if record is None else tuple(record[column] for column in columns))
+        return result
+
+
+class NewsCatalogue:
+    """
+    Columnar, mmap-able news catalogue: a base of StringColumns plus a JSON-lines
+    log of puts and deletes, replayed on open and folded in by `compact()`.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.RLock()
+        with open(self._path(MANIFEST)) as f:
+            self.manifest = json.load(f)
+
+        self._open_base(self.manifest["generation"])
+        if os.path.exists(self._path(LOG)):
+            with open(self._path(LOG), encoding="utf-8") as f:
+                self._replay([json.loads(line) for line in f if line.strip()])
+
+    @classmethod
+    def create(cls, directory, news_ids, records):
+        """Write a base from News IDs and their records (column -> str dicts)."""
+        os.makedirs(directory, exist_ok=True)
+        generation = 0
+        if os.path.exists(os.path.join(directory, MANIFEST)):
+            with open(os.path.join(directory, MANIFEST)) as f:
+                generation = json.load(f)["generation"] + 1
+
+        _write_base(directory, generation, news_ids, records)
+        _write_json(os.path.join(directory, MANIFEST), {"generation": generation, "rows": len(news_ids)})
+        open(os.path.join(directory, LOG), "w").close()
+        _remove_generations(directory, keep=generation)
+        return cls(directory)
+
+    @classmethod
+    def from_frame(cls, directory, news_df):
+        """Convert a news frame as returned by utils.load_news_data."""
+        values = news_df[list(COLUMNS)].astype(str).to_numpy()
+        records = ({column: value for column, value in zip(COLUMNS, row)} for row in values)
+        return cls.create(directory, news_df.index.to_numpy(dtype=str), records)
+
+    # ---------- Reading ---------- #
+
+    def __len__(self):
+        return len(self._index) + len(self._overlay)
+
+    def __contains__(self, news_id):
+        return news_id in self._overlay or news_id in self._index
+
+    def view(self):
+        with self._lock:
+            return CatalogueView(self._columns, self._index, dict(self._overlay))
+
+    @property
+    def log_size(self):
+        """Entries in the log since the last compaction."""
+        return self._log_size
+
+    def needs_compaction(self, max_log=DEFAULT_MAX_LOG):
+        return self._log_size > max_log
+
+    # ---------- Writing ---------- #
+
+    def put(self, items):
+        """Add or replace items (NewsItem dicts) with one append to the log."""
+        entries = [{"put": record_of(item), "id": item["News_ID"]} for item in items]
+        self._append(entries)
+
+    def delete(self, news_ids):
+        for news_id in news_ids:
+            if news_id not in self:
+                raise ValueError("News ID not found.")
+        self._append([{"delete": True, "id": news_id} for news_id in news_ids])
+
+    def compact(self):
+        """Fold the log into a new base generation."""
+        with self._lock:
+            view = self.view()
+            news_ids = list(view)
+            records = (view.get(news_id) for news_id in news_ids)
+            generation = self.manifest["generation"] + 1
+
+            _write_base(self.directory, generation, np.asarray(news_ids, dtype=str), records)
+            self.manifest = {"generation": generation, "rows": len(news_ids)}
+            _write_json(self._path(MANIFEST), self.manifest)
+            # Replaying a stale log over the new base is harmless, so truncating second is safe
+            open(self._path(LOG), "w").close()
+
+            self._open_base(generation)
+            _remove_generations(self.directory, keep=generation)
+
+    def _open_base(self, generation):
+        self._columns = {
+            column: StringColumn(
+                np.load(self._path(f"g{generation}.{_file_name(column)}.data.npy"), mmap_mode="r"),
+                np.load(self._path(f"g{generation}.{_file_name(column)}.offsets.npy"), mmap_mode="r"),
+            )
+            for column in COLUMNS
+        }
+        self._index = IdIndex(np.load(self._path(f"g{generation}.ids.npy")))
+        self._overlay = {}
+        self._log_size = 0
+
+    def _append(self, entries):
+        if not entries:
+            return
+        with self._lock:
+            with open(self._path(LOG), "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+                f.flush()
+                os.fsync(f.fileno())
+            self._replay(entries)
+
+    def _replay(self, entries):
+        # Any logged ID shadows its base row, whether it was replaced or deleted
+        for entry in entries:
+            if "put" in entry:
+                self._overlay[entry["id"]] = entry["put"]
+            else:
+                self._overlay.pop(entry["id"], None)
+        self._index = self._index.without([entry["id"] for entry in entries])
+        self._log_size += len(entries)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+
+def record_of(item):
+    """Catalogue record of a NewsItem dict; lists (entities) are stored in their string form, as in news.tsv."""
+    record = {}
+    for column, field in zip(COLUMNS, ITEM_FIELDS):
+        value = item.get(field, " " if field == "News_Url" else [])
+        record[column] = value if isinstance(value, str) else str(value)
+    return record
+
+
+def _file_name(column):
+    return column.lower().replace(" ", "_")
+
+
+def _write_base(directory, generation, news_ids, records):
+    values = {column: [] for column in COLUMNS}
+    for record in records:
+        for column in COLUMNS:
+            values[column].append(record[column])
+
+    for column in COLUMNS:
+        data, offsets = StringColumn.encode(values[column])
+        np.save(os.path.join(directory, f"g{generation}.{_file_name(column)}.data.npy"), data)
+        np.save(os.path.join(directory, f"g{generation}.{_file_name(column)}.offsets.npy"), offsets)
+    np.save(os.path.join(directory, f"g{generation}.ids.npy"), np.asarray(news_ids, dtype=str))
+
+
+def _remove_generations(directory, keep):
+    # Readers holding old views keep their (unlinked) mappings alive
+    for name in os.listdir(directory):
+        if name.startswith("g") and name.endswith(".npy") and not name.startswith(f"g{keep}."):
+            os.remove(os.path.join(directory, name))
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def exists(directory):
+    return os.path.exists(os.path.join(directory, MANIFEST))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert news.tsv into the columnar news catalogue.")
+    parser.add_argument("--news", required=True, help="MIND-style news.tsv")
+    parser.add_argument("--out", required=True, help="output directory")
+    args = parser.parse_args()
+
+    from app import utils
+    catalogue = NewsCatalogue.from_frame(args.out, utils.load_news_data(args.news))
+    print(f"Saved news catalogue with {len(catalogue)} items to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
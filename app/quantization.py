@@ -0,0 +1,103 @@
+import argparse
+import time
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+DEFAULT_RERANK = 300
+
+
+def quantize(vectors, precision):
+    """
+    Quantized copy of normalized rows: (float16 codes, None), or (int8 codes,
+    float32 scale per row) with row = codes * scale.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if precision == "float16":
+        return vectors.astype(np.float16), None
+    if precision == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.empty(0, dtype=np.float32)
+        scales[scales == 0] = 1.0
+        return np.rint(vectors / scales[:, np.newaxis]).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"Unknown precision: {precision}")
+
+
+class QuantizedSegment:
+    """
+    Scoring side of one quantized bank segment. Blocks of codes are widened
+    to float32 just before the product, so the bank itself is read at 2 or 1
+    bytes per value.
+    """
+    def __init__(self, codes, scales=None):
+        self.codes = codes
+        self.scales = scales
+        self.shape = codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def score(self, vectors, block_size=8192):
+        """Approximate dot products of (queries x dim) float32 vectors with every row."""
+        scores = np.empty((vectors.shape[0], self.shape[0]), dtype=np.float32)
+        for start in range(0, self.shape[0], block_size):
+            end = start + block_size
+            scores[:, start:end] = vectors @ self.codes[start:end].astype(np.float32).T
+            if self.scales is not None:
+                scores[:, start:end] *= self.scales[start:end]
+        return scores
+
+
+def recall_at_k(exact_top, approx_top):
+    """Mean fraction of the exact top-k rows found in the approximate top-k, per query."""
+    return float(np.mean([len(np.intersect1d(e, a)) / len(e) for e, a in zip(exact_top, approx_top)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recall and speed of quantized BERT scoring, with and without re-ranking, against exact float32 scores."
+    )
+    parser.add_argument("--store", default="app/model_assets/bert_store", help="bert_store directory")
+    parser.add_argument("--queries", type=int, default=200, help="stored articles used as queries")
+    parser.add_argument("--topk", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=DEFAULT_RERANK, help="candidates re-scored in float32")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app.embedding_store import EmbeddingStore
+    from app.recommender import top_k_rows
+    store = EmbeddingStore(args.store)
+    exact_bank = store.bank()
+    live = exact_bank.index.live_rows
+    rng = np.random.default_rng(args.seed)
+    queries = exact_bank.rows(np.sort(rng.choice(live, size=min(args.queries, len(live)), replace=False)))
+
+    def live_top(scores):
+        scores = scores.copy()
+        scores[:, exact_bank.dead] = -np.inf
+        return top_k_rows(scores, args.topk)
+
+    start = time.perf_counter()
+    exact = exact_bank.score(queries)
+    exact_seconds = time.perf_counter() - start
+    exact_top = live_top(exact)
+    print(f"float32: {exact_bank.nbytes / 2**20:.1f} MiB, {exact_seconds * 1000:.1f} ms for {len(queries)} queries")
+
+    for precision in PRECISIONS[1:]:
+        bank = store.bank(precision=precision)
+        start = time.perf_counter()
+        approx = bank.score_quantized(queries)
+        scan_seconds = time.perf_counter() - start
+        reranked = bank.rerank(approx, queries, args.rerank)
+        rerank_seconds = time.perf_counter() - start
+
+        print(
+            f"{precision}: {bank.quantized_nbytes / 2**20:.1f} MiB, "
+            f"scan {scan_seconds * 1000:.1f} ms, with re-rank {rerank_seconds * 1000:.1f} ms, "
+            f"recall@{args.topk} {recall_at_k(exact_top, live_top(approx)):.4f} (scan only) / "
+            f"{recall_at_k(exact_top, live_top(reranked)):.4f} (re-ranked), "
+            f"max score error {np.abs(approx - exact).max():.5f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,128 +1,374 @@
+import copy
 import numpy as np
 from app import utils
+from app.embedding_store import BankView
+from app.quantization import DEFAULT_RERANK
+from app.metrics import span
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers.util import cos_sim
-
-def tfidf_recommendation(news, target, embedding_bank, model, topk=10):
-    content = target["Category"] + " " + target["Subcategory"] + " " + target["News Title"] + " " + target["News Abstract"]
-    target = utils.clean_text(content)
-    target_vector = model.transform([target])
-
-    similarities = cosine_similarity(embedding_bank, target_vector).flatten()
-    topk_indices = similarities.argsort()[::-1][1:topk+1]
-
-    top_simil = [
-                    {
-                        "News ID": news.index[i],
-                        "Category": news.iloc[i]["Category"],
-                        "Subcategory": news.iloc[i]["Subcategory"],
-                        "News Title": news.iloc[i]["News Title"],
-                        "News Abstract": news.iloc[i]["News Abstract"],
-                        "Similarity": round(float(similarities[i]), 4)
-                    }
-                   for i in topk_indices]
-
-    return top_simil
-
-def bert_recommendation(news, target, embedding_bank, model, topk=10):
-    content = target["Category"] + " " + target["Subcategory"] + " " + target["News Title"] + " " + target["News Abstract"]
-    target_vector = model.encode(content, convert_to_tensor=True)
-
-    similarities = cos_sim(target_vector, embedding_bank)[0].cpu().numpy()
-
-    topk_indices = similarities.argsort()[::-1][1:topk+1]  # +1 to skip identical article
-
-    # Step 5: Build response
-    top_simil = [
-                    {
-                        "News ID": news.index[i],
-                        "Category": news.iloc[i]["Category"],
-                        "Subcategory": news.iloc[i]["Subcategory"],
-                        "News Title": news.iloc[i]["News Title"],
-                        "News Abstract": news.iloc[i]["News Abstract"],
-                        "Similarity": round(float(similarities[i]), 4)
-                    }
-                   for i in topk_indices]
-
-    return top_simil
+
+RESULT_COLUMNS = ["Category", "Subcategory", "News Title", "News Abstract"]
+
+def normalize_scores(values):
+    """
+    Min-max scale to [0, 1] as float32, rounded to 2 decimals; constant input maps to zeros.
+    2-D input is scaled row by row.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if values.size == 0:
+        return values
+    min_val = values.min(axis=-1, keepdims=True)
+    value_range = values.max(axis=-1, keepdims=True) - min_val
+
+    norm = values - min_val  # fresh buffer, the rest is done in place
+    norm *= np.float32(1.0) / (value_range + np.float32(1e-8))
+    np.round(norm, 2, out=norm)
+    norm[np.broadcast_to(value_range < 1e-8, norm.shape)] = 0
+    return norm
+
+def normalize_sparse_scores(values, n_total):
+    """
+    normalize_scores for a vector stored sparsely: `values` are its explicit
+    entries out of `n_total`, the rest being zeros. Returns the normalized
+    entries and the normalized value of the implicit zeros.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if len(values) < n_total:
+        norm = normalize_scores(np.append(values, np.float32(0)))
+        return norm[:-1], norm[-1]
+    return normalize_scores(values), np.float32(0)
+
+def blend_scores(content_norm, cf_norm, alpha):
+    hybrid = content_norm * np.float32(alpha)
+    hybrid += cf_norm * np.float32(1 - alpha)
+    return np.round(hybrid, 4, out=hybrid)
+
+def top_k_indices(scores, k):
+    """Indices of the k highest scores, best first (ties broken by position)."""
+    return top_k_rows(scores[np.newaxis, :], k)[0]
+
+def top_k_rows(scores, k):
+    """Row-wise top_k_indices for a 2-D score matrix."""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((len(scores), 0), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        # argpartition picks any of the rows tied with the k-th score: keep the first ones instead
+        kth = candidate_scores.min(axis=1, keepdims=True)
+        for r in np.flatnonzero((scores == kth).sum(axis=1) > (candidate_scores == kth).sum(axis=1)):
+            greater = np.flatnonzero(scores[r] > kth[r])
+            candidates[r] = np.concatenate([greater, np.flatnonzero(scores[r] == kth[r])[:k - len(greater)]])
+            candidate_scores[r] = scores[r, candidates[r]]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.lexsort((candidates, -candidate_scores))
+    return np.take_along_axis(candidates, order, axis=1)
+
+def _news_content(target):
+    return target["Category"] + " " + target["Subcategory"] + " " + target["News Title"] + " " + target["News Abstract"]
+
+
 class HybridRecommender:
-    def __init__(self, news, embeddings, model, item_sim_df,
-                 mode="bert", alpha=0.5, topk=10):
+    def __init__(self, news, embeddings, model, cf_index,
+                 mode="bert", alpha=0.5, topk=10, ann_index=None, nprobe=None, rerank=DEFAULT_RERANK,
+                 prune=False):
         """
         mode: "bert" or "tfidf"
+        embeddings: BankView from an EmbeddingStore, or a raw bank whose rows follow news order
+        ann_index/nprobe: optional IVF index for approximate bert content scores;
+        exact scoring is used while nprobe is None
+        rerank: when the bank is quantized, candidates per query re-scored in float32
+        prune: tfidf only; skip postings that cannot reach the top `rerank` content
+        scores (those stay exact, the rest are lower bounds)
         """
-        self.data = news  # full sorted news data (indexed)
+        if mode not in ("bert", "tfidf"):
+            raise ValueError("Invalid mode. Choose 'bert' or 'tfidf'.")
+
+        self.data = news  # article metadata by News ID (CatalogueView)
         self.embeddings = embeddings
         self.model = model
-        self.item_sim_df = item_sim_df  # sparse DF
+        self.cf_index = cf_index  # top-N item-item neighbours (CFIndex)
         self.alpha = alpha
         self.topk = topk
         self.mode = mode
+        self.ann_index = ann_index if mode == "bert" else None
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.prune = prune
+
+        # Normalized bank rows are the catalogue: cosine is a dot product and
+        # every score array is indexed by bank row
+        if not isinstance(embeddings, BankView):
+            embeddings = BankView.from_matrix(embeddings, news.index)
+        self.bank = embeddings
+        self.n_items = embeddings.shape[0]
+
+        # News ID <-> row, shared with the store; rows deleted since the last
+        # compaction stay in the bank but are never returned
+        self.index = embeddings.index
+        self.ids = self.index.ids
+        self.dead = self.index.dead
+        self.has_dead = self.index.has_dead
+
+        # Bank row of every CF index row (-1 when the item is not in the catalogue)
+        self.cf_positions = self.rows_of(cf_index.ids)
+        self.cf_catalogue = self.cf_positions[self.cf_positions >= 0]
+
+    def row_of(self, news_id):
+        """Live bank row of a News ID, or None."""
+        return self.index.row(news_id)
+
+    def rows_of(self, news_ids):
+        """Live bank rows of many News IDs at once (-1 when unknown)."""
+        return self.index.rows(news_ids)
+
+    def with_params(self, alpha=None, topk=None, nprobe=None, prune=None):
+        """Cheap per-request view sharing this recommender's data, with its own alpha/topk/nprobe/prune."""
+        view = copy.copy(self)
+        if alpha is not None:
+            view.alpha = alpha
+        if topk is not None:
+            view.topk = topk
+        if nprobe is not None:
+            view.nprobe = nprobe
+        if prune is not None:
+            view.prune = prune
+        return view
 
     def recommend(self, target_id):
-        content_score = self.calculate_content_score(target_id)
-        cf_score = self.calculate_cf_score(target_id)
+        with span("content", self.mode):
+            content_score = self.calculate_content_score(target_id)
+        with span("cf", self.mode):
+            cf_score = self.calculate_cf_score(target_id)
+        return self.combine_scores(content_score, cf_score)
+
+    def recommend_many(self, target_ids, block_size=64):
+        """
+        Recommendations for many articles at once, in the order given. Queries are
+        scored in blocks: one matrix-matrix product per block for the content
+        scores, then a row-wise top-k.
+        """
+        results = []
+        for start in range(0, len(target_ids), block_size):
+            block = target_ids[start:start + block_size]
+            with span("content", self.mode):
+                content_scores = self.calculate_content_scores(block)
+            with span("cf", self.mode):
+                cf_scores = self.calculate_cf_scores(block)
+            results.extend(self.combine_score_rows(content_scores, cf_scores))
+        return results
+
+    def recommend_profile(self, profile, clicked_ids):
+        """
+        Personalized recommendations: content scores against an aggregated user
+        profile plus the summed CF rows of the clicked articles. Clicked articles
+        are masked out of the ranking.
+        """
+        with span("content", self.mode):
+            content_score = self.score_vector(utils.normalize_embeddings(profile))
+        with span("cf", self.mode):
+            cf_score = self.calculate_cf_score_many(clicked_ids)
+
+        clicked_rows = self.rows_of(clicked_ids)
+        exclude = np.zeros(self.n_items, dtype=bool)
+        exclude[clicked_rows[clicked_rows >= 0]] = True
+        return self.combine_scores(content_score, cf_score, exclude=exclude)
+
+    def recommend_text(self, text):
+        """Recommend for free text that is not in the catalogue; the only path that runs the encoder."""
+        with span("content", self.mode):
+            content_score = self.score_vector(self.encode_text(text))
+        cf_score = np.zeros(self.n_items, dtype=np.float32)
         return self.combine_scores(content_score, cf_score)
 
     def calculate_content_score(self, target_id):
-        target = self.data.loc[target_id]
-        content = (
-            target["Category"] + " " +
-            target["Subcategory"] + " " +
-            target["News Title"] + " " +
-            target["News Abstract"]
-        )
+        row = self.row_of(target_id)
+        if row is not None:
+            return self.score_vector(self.bank.rows([row]))
+
+        # Article without a stored row: fall back to encoding its text
+        return self.score_vector(self.encode_text(_news_content(self.data.get(target_id))))
+
+    def calculate_content_scores(self, target_ids):
+        """calculate_content_score for a block of targets, as a (targets x catalogue) matrix."""
+        rows = [self.row_of(target_id) for target_id in target_ids]
+        if None in rows or (self.ann_index is not None and self.nprobe) or self._pruning:
+            return np.stack([self.calculate_content_score(target_id) for target_id in target_ids])
+
+        vectors = self.bank.rows(rows)
+        if self.bank.quantized is not None:
+            return self.score_quantized(vectors)
+        return self.bank.score(vectors)
 
+    def encode_text(self, text):
+        with span("encode", self.mode):
+            if self.mode == "bert":
+                vector = self.model.encode(text, convert_to_numpy=True)
+            else:
+                vector = self.model.transform([utils.clean_text(text)])
+            return utils.normalize_embeddings(vector)
+
+    def score_vector(self, vector):
+        """Cosine similarity of one normalized vector against the whole normalized bank."""
         if self.mode == "bert":
-            target_vector = self.model.encode(content, convert_to_tensor=True)
-            similarities = cos_sim(target_vector, self.embeddings)[0].cpu().numpy()
+            if self.ann_index is not None and self.nprobe:
+                return self.score_vector_approx(vector.reshape(-1))
+            if self.bank.quantized is not None:
+                return self.score_quantized(vector.reshape(1, -1))[0]
+            return self.bank.score(vector.reshape(-1))
+        if self._pruning:
+            return self.bank.score_sparse(vector, top_k=max(self.rerank, self.topk))
+        return self.bank.score(vector)[0]
 
-        elif self.mode == "tfidf":
-            clean_text = utils.clean_text(content)
-            target_vector = self.model.transform([clean_text])
-            similarities = cosine_similarity(self.embeddings, target_vector).flatten()
+    @property
+    def _pruning(self):
+        return self.prune and self.mode == "tfidf" and self.bank.postings is not None
 
-        else:
-            raise ValueError("Invalid mode. Choose 'bert' or 'tfidf'.")
+    def score_quantized(self, vectors):
+        """
+        Similarities from the quantized bank, with the `rerank` best candidates
+        of every query re-scored exactly, while the scan reads 2-4x fewer bytes.
+        Only those candidates have exact content scores, so hybrid rankings can
+        differ from float32 where CF scores lift an article from outside them.
+        """
+        return self.bank.rerank(self.bank.score_quantized(vectors), vectors, self.rerank)
+
+    def score_vector_approx(self, vector):
+        """
+        Exact similarities for the IVF candidates only; every other article gets
+        the lowest candidate score so it normalizes to 0.
+        """
+        rows = self.rows_of(self.ann_index.search(vector, self.nprobe))
+        rows = rows[rows >= 0]
+        if len(rows) == 0:
+            return np.zeros(self.n_items, dtype=np.float32)
 
+        candidate_scores = self.bank.rows(rows) @ vector
+        similarities = np.full(self.n_items, candidate_scores.min(), dtype=np.float32)
+        similarities[rows] = candidate_scores
         return similarities
 
     def calculate_cf_score(self, target_id):
-        # Ensure it's in index
-        if target_id not in self.item_sim_df.columns:
-            return pd.Series([0] * len(self.data), index=self.data.index)
+        """
+        Normalized CF scores aligned to the catalogue. Only the target's
+        neighbour list is read; items without CF data score 0.
+        """
+        neighbours = self.cf_index.neighbours(target_id)
+        if neighbours is None:
+            return np.zeros(self.n_items, dtype=np.float32)
+
+        return self._scatter_cf(*neighbours)
+
+    def calculate_cf_score_many(self, target_ids):
+        """Normalized sum of the CF neighbour lists of several articles, aligned to the catalogue."""
+        neighbours = [self.cf_index.neighbours(target_id) for target_id in target_ids]
+        neighbours = [n for n in neighbours if n is not None]
+        if not neighbours:
+            return np.zeros(self.n_items, dtype=np.float32)
+
+        rows, inverse = np.unique(np.concatenate([n[0] for n in neighbours]), return_inverse=True)
+        sims = np.bincount(inverse, weights=np.concatenate([n[1] for n in neighbours]))
+        return self._scatter_cf(rows, sims)
 
-        # Sparse matrix column → full Series (pandas handles sparse+dense fine)
-        cf_series = self.item_sim_df[target_id]
-        return cf_series.to_numpy()
+    def _scatter_cf(self, rows, sims):
+        """Normalize a sparse CF vector (CF index rows, similarities) onto catalogue positions."""
+        cf_score = np.zeros(self.n_items, dtype=np.float32)
+        norm, zero_norm = normalize_sparse_scores(sims, len(self.cf_index))
+        if zero_norm:
+            cf_score[self.cf_catalogue] = zero_norm
 
+        positions = self.cf_positions[rows]
+        in_catalogue = positions >= 0
+        cf_score[positions[in_catalogue]] = norm[in_catalogue]
+        return cf_score
+
+    def calculate_cf_scores(self, target_ids):
+        return np.stack([self.calculate_cf_score(target_id) for target_id in target_ids])
 
     def normalize(self, score):
         # score can be Series or ndarray
         if isinstance(score, pd.Series):
-            values = score.values
-        else:
-            values = score
+            score = score.values
+        return normalize_scores(score)
+
+    def normalize_content(self, content_scores):
+        """
+        normalize_scores over live rows: deleted rows take the live minimum so
+        they do not stretch the range (and normalize to 0).
+        """
+        scores = np.asarray(content_scores, dtype=np.float32)[..., :self.n_items]
+        if self.has_dead:
+            scores = scores.copy()
+            live_rows = self.index.live_rows
+            live_min = scores[..., live_rows].min(axis=-1, keepdims=True) if len(live_rows) else 0
+            scores[..., self.dead] = live_min
+        return normalize_scores(scores)
 
-        min_val = np.min(values)
-        max_val = np.max(values)
-        if max_val - min_val < 1e-8:
-            return pd.Series([0.0] * len(values), index=self.data.index)
+    def select_top(self, hybrid, k, exclude=None):
+        """Top-k rows of a 1-D or 2-D hybrid score array, skipping deleted and excluded rows."""
+        mask = self.dead if exclude is None else exclude | self.dead
+        if self.has_dead or exclude is not None:
+            hybrid = np.where(mask, -np.inf, hybrid)
+            k = min(k, int((~mask).sum()))
+        if hybrid.ndim == 1:
+            return top_k_indices(hybrid, k)
+        return top_k_rows(hybrid, k)
 
-        norm = (values - min_val) / (max_val - min_val + 1e-8)
-        return np.round(norm, 2)
+    def combine_scores(self, content_score, cf_score, exclude=None):
+        """
+        Blend raw content similarities with normalized CF scores and keep the top-k.
+        exclude: optional boolean mask of catalogue rows that must not be returned
+        """
+        with span("blend", self.mode):
+            content_norm = self.normalize_content(content_score)
+            hybrid = blend_scores(content_norm, cf_score, self.alpha)
+        with span("select", self.mode):
+            top = self.select_top(hybrid, self.topk, exclude=exclude)
+        with span("build", self.mode):
+            return self.build_results(top, content_norm, cf_score, hybrid)
 
-    def combine_scores(self, content_score, cf_score):
-        content_score = np.round(self.normalize(content_score), 4)
-        cf_score = pd.Series(np.round(self.normalize(cf_score), 4), index=self.item_sim_df.index, name="cf_score")
+    def rank_many(self, target_ids):
+        """Catalogue rows of the top-k recommendations of every target, best first."""
+        content_scores = self.calculate_content_scores(target_ids)
+        cf_scores = self.calculate_cf_scores(target_ids)
+        return self.rank_score_rows(content_scores, cf_scores)[0]
 
-        # Attach scores to dataframe
-        result_df = self.data[["Category", "Subcategory", "News Title", "News Abstract"]].copy()
-        result_df["content_score"] = content_score
-        result_df = pd.merge(result_df, cf_score, left_on="News ID", right_on=cf_score.index,how="left")
-        result_df["cf_score"] = result_df["cf_score"].fillna(0)
-        result_df["hybrid_score"] = np.round(self.alpha * result_df["content_score"] + (1 - self.alpha) * result_df["cf_score"], 4)
+    def rank_score_rows(self, content_scores, cf_scores):
+        """Row-wise top-k of the blended scores; also returns the normalized content and hybrid scores."""
+        with span("blend", self.mode):
+            content_norm = self.normalize_content(content_scores)
+            hybrid = blend_scores(content_norm, cf_scores, self.alpha)
+        with span("select", self.mode):
+            return self.select_top(hybrid, self.topk), content_norm, hybrid
 
-        return result_df.sort_values("hybrid_score", ascending=False).head(self.topk).to_dict(orient="records")
+    def combine_score_rows(self, content_scores, cf_scores):
+        """combine_scores for every row of a (targets x catalogue) score matrix."""
+        top, content_norm, hybrid = self.rank_score_rows(content_scores, cf_scores)
+        with span("build", self.mode):
+            return [
+                self.build_results(top[i], content_norm[i], cf_scores[i], hybrid[i])
+                for i in range(len(top))
+            ]
 
+    def build_results(self, rows, content_norm, cf_norm, hybrid):
+        """Materialize article metadata for the selected rows only."""
+        news_ids = self.ids[rows]
+        results = []
+        for row, news_id, record in zip(rows, news_ids, self.data.records(news_ids, RESULT_COLUMNS)):
+            if record is None:
+                continue  # vector committed but catalogue write failed; never surface a blank article
+            category, subcategory, title, abstract = record
+            results.append({
+                "News ID": news_id,
+                "Category": category,
+                "Subcategory": subcategory,
+                "News Title": title,
+                "News Abstract": abstract,
+                "content_score": round(float(content_norm[row]), 4),
+                "cf_score": round(float(cf_norm[row]), 4),
+                "hybrid_score": round(float(hybrid[row]), 4)
+            })
+        return results
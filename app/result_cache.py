@@ -0,0 +1,119 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 300.0
+
+
+class ResultCache:
+    """
+    LRU cache of recommendation results bounded by entries, bytes and age.
+    Entries are keyed on the snapshot's content version; CF updates retire
+    single articles through `invalidate_items()`.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires at, size, result, version), least recently used first
+        self._cf_changed = {}  # News ID -> snapshot version its CF neighbours last changed at
+        self._lock = threading.Lock()
+        self.version = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, snapshot):
+        full_key = key + (snapshot.content_version,)
+        with self._lock:
+            self._see_version(snapshot.content_version)
+            entry = self._entries.get(full_key)
+            if entry is None or entry[0] < time.monotonic() or entry[3] < self._cf_changed.get(key[0], 0):
+                if entry is not None:
+                    self._remove(full_key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, snapshot, result):
+        full_key = key + (snapshot.content_version,)
+        size = _size_of(result)
+        with self._lock:
+            self._see_version(snapshot.content_version)
+            if snapshot.content_version < self.version or size > self.max_bytes:
+                return
+            if snapshot.version < self._cf_changed.get(key[0], 0):
+                return  # computed on CF neighbours that have changed since
+            if full_key in self._entries:
+                self._remove(full_key)
+            self._entries[full_key] = (time.monotonic() + self.ttl, size, result, snapshot.version)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, news_ids=None):
+        """
+        Drop every entry. Any added, changed or deleted article can enter or
+        leave any top-k, so the changed IDs are not enough to narrow it down.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.invalidations += 1
+
+    def invalidate_items(self, news_ids, version):
+        """Retire the results of `news_ids`, whose CF neighbour lists changed in snapshot `version`."""
+        with self._lock:
+            for news_id in news_ids:
+                self._cf_changed[news_id] = version
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _see_version(self, version):
+        if version > self.version:
+            self.version = version
+            self._entries.clear()
+            self._cf_changed.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key)[1]
+
+
+def _size_of(result):
+    # Rough deep size of a result list (dicts of strings and floats)
+    size = sys.getsizeof(result)
+    for item in result:
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in item.items())
+    return size
+
+
+def warm(cache, snapshot, news_ids, mode="bert", alpha=0.5, topk=10):
+    """Precompute the results of `news_ids` for one parameter set (the endpoint defaults by default)."""
+    news_ids = [news_id for news_id in news_ids if news_id in snapshot.news]
+    recommender = snapshot.recommender(mode).with_params(alpha=alpha, topk=topk)
+    for news_id, result in zip(news_ids, recommender.recommend_many(news_ids)):
+        cache.put((news_id, mode, alpha, topk, None, False), snapshot, result)
+    return len(news_ids)
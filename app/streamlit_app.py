@@ -1,7 +1,89 @@
+import json
+import time
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 
 API_URL = "http://localhost:8000"
+JOB_TIMEOUT = 30  # seconds to wait for a queued write
+
+
+# ========== API client ========== #
+
+@st.cache_resource
+def api_session():
+    """One pooled, keep-alive session for every rerun and browser session."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+
+def error_detail(response):
+    try:
+        return response.json()["detail"]
+    except (ValueError, KeyError):
+        return response.text or response.reason
+
+
+def get_json(path, params=None):
+    """(status code, JSON body); server errors raise so that they are never cached."""
+    response = api_session().get(f"{API_URL}{path}", params=params, timeout=30)
+    if response.status_code >= 500:
+        raise requests.HTTPError(error_detail(response), response=response)
+    return response.status_code, response.json()
+
+
+@st.cache_data(ttl=2, show_spinner=False)
+def index_version():
+    """
+    Backend index version; it changes with every write, so results are cached per version.
+    Raises requests.HTTPError (never cached) while the backend cannot answer, e.g. 503 during startup.
+    """
+    status, body = get_json("/version")
+    if status != 200:
+        raise requests.HTTPError(f"/version answered {status}")
+    return body["version"]
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def fetch_recommendations(news_id, model, alpha, topk, version):
+    return get_json(f"/get-hybrid-simil/{news_id}", {"model": model, "alpha": alpha, "topk": topk})
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def fetch_news(news_id, version):
+    return get_json(f"/get-news-by-id/{news_id}")
+
+
+def submit_write(method, path, payload=None):
+    """
+    Queue an add/update/delete (answered with 202, a job ID and a message) and
+    wait for the job to be applied.
+    """
+    try:
+        response = api_session().request(method, f"{API_URL}{path}", json=payload, timeout=30)
+        if response.status_code != 202:
+            st.error(error_detail(response))
+            return
+        queued = response.json()
+        with st.spinner(queued["message"]):
+            deadline = time.time() + JOB_TIMEOUT
+            job = queued
+            while job["status"] in ("queued", "running") and time.time() < deadline:
+                time.sleep(0.2)
+                job = api_session().get(f"{API_URL}/write-jobs/{queued['job_id']}", timeout=10).json()
+    except requests.RequestException as e:
+        st.error(f"Backend not available: {e}")
+        return
+    if job["status"] == "done":
+        index_version.clear()  # the next lookups use the new version
+        st.success(f"{queued['message']} Done.")
+    elif job["status"] == "failed":
+        st.error(job["error"])
+    else:
+        st.info(f"{queued['message']} Still pending (job {queued['job_id']}).")
+
 
 st.set_page_config(page_title="Hybrid News Recommender", layout="wide")
 st.title("📰 Hybrid News Recommender System")
@@ -18,13 +100,11 @@ with tab1:
     topk = st.number_input("Top-K Recommendations", 1, 50, 10)
 
     if st.button("Get Recommendations"):
-        response = requests.get(f"{API_URL}/get-hybrid-simil/{news_id}", params={
-            "model": model,
-            "alpha": alpha,
-            "topk": topk
-        })
-        if response.status_code == 200:
-            results = response.json()
+        try:
+            status, results = fetch_recommendations(news_id, model, alpha, int(topk), index_version())
+        except requests.RequestException as e:
+            status, results = None, {"detail": f"Backend not available: {e}"}
+        if status == 200:
             st.success("Recommendations received!")
             for item in results:
                 st.markdown(f"**{item['News Title']}**")
@@ -32,7 +112,7 @@ with tab1:
                 st.write(item['News Abstract'])
                 st.write("---")
         else:
-            st.error(f"Error: {response.json()['detail']}")
+            st.error(f"Error: {results['detail']}")
 
 # --- ADD TAB ---
 with tab2:
@@ -53,12 +133,8 @@ with tab2:
                 "Subcategory": subcategory,
                 "News_Title": title,
                 "News_Abstract": abstract,
-}
-            r = requests.post(f"{API_URL}/add-news-item", json=payload)
-            if r.ok:
-                st.success(r.json().get("message", "News deleted!"))
-            else:
-                st.error(r.json()["detail"])
+            }
+            submit_write("POST", "/add-news-item", payload)
 
 # --- UPDATE TAB ---
 with tab3:
@@ -67,11 +143,14 @@ with tab3:
 
     if st.button("Fetch Current News"):
         if update_id:
-            r = requests.get(f"{API_URL}/get-news-by-id/{update_id}")
-            if r.ok:
-                st.session_state["update_data"] = r.json()
+            try:
+                status, news = fetch_news(update_id, index_version())
+            except requests.RequestException as e:
+                status, news = None, {"detail": f"Backend not available: {e}"}
+            if status == 200:
+                st.session_state["update_data"] = news
             else:
-                st.error(r.json()["detail"])
+                st.error(news["detail"])
 
     if "update_data" in st.session_state:
         news = st.session_state["update_data"]
@@ -89,11 +168,7 @@ with tab3:
                 "News_Abstract": abstract    
             }
 
-            r = requests.put(f"{API_URL}/update-news-item/{update_id}", json=payload)
-            if r.ok:
-                st.success(r.json().get("message", "News deleted!"))
-            else:
-                st.error(r.json()["detail"])
+            submit_write("PUT", f"/update-news-item/{update_id}", payload)
 
 # --- DELETE TAB ---
 with tab4:
@@ -102,11 +177,7 @@ with tab4:
 
     if st.button("Delete"):
         if delete_id:
-            r = requests.delete(f"{API_URL}/delete-news-item/{delete_id}")
-            if r.ok:
-                st.success(r.json().get("message", "News deleted!"))
-            else:
-                st.error(r.json()["detail"])
+            submit_write("DELETE", f"/delete-news-item/{delete_id}")
         else:
             st.warning("Please enter a News ID to delete.")
 
@@ -120,19 +191,31 @@ with tab5:
     seed = st.number_input("Seed (Optional)", value=42)
 
     if st.button("Evaluate"):
-        response = requests.post(f"{API_URL}/evaluate-recommender/", params={
-            "model": model,
-            "alpha": alpha,
-            "topk": topk,
-            "n_users": n_users,
-            "seed": seed
-        })
-        if response.status_code == 200:
-            metrics = response.json().get("metrics", {})
-            st.success("Evaluation complete!")
-
-            st.subheader("📈 Evaluation Metrics")
-            for key, value in metrics.items():
-                st.markdown(f"**{key}**: {value:.4f}")
-        else:
-            st.error(f"Error: {response.json()['detail']}")
+        # Streamed: one line of running averages per block of users
+        progress = st.progress(0.0, text="Sampling users...")
+        live_metrics = st.empty()
+        try:
+            with api_session().post(f"{API_URL}/evaluate-recommender/stream", params={
+                "model": model,
+                "alpha": alpha,
+                "topk": topk,
+                "n_users": n_users,
+                "seed": seed
+            }, stream=True, timeout=(5, None)) as response:
+                if response.status_code == 200:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        progress.progress(event["done"] / max(event["total"], 1),
+                                          text=f"{event['done']} / {event['total']} users evaluated")
+                        with live_metrics.container():
+                            st.subheader("📈 Evaluation Metrics")
+                            for key, value in event["metrics"].items():
+                                st.markdown(f"**{key}**: {value:.4f}")
+                        if event.get("final"):
+                            st.success("Evaluation complete!")
+                else:
+                    st.error(f"Error: {error_detail(response)}")
+        except requests.RequestException as e:
+            st.error(f"Error: Backend not available: {e}")
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import time
+import zlib
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ("news", "sports", "finance", "lifestyle", "health", "entertainment", "travel", "autos", "weather", "video")
+CONSONANTS = "bcdfghjklmnprstvwz"
+VOWELS = "aeiou"
+DEFAULT_DIM = 64
+
+
+def vocabulary(size):
+    """`size` letters-only pseudo-words, so the text cleaner keeps them as they are."""
+    syllables = [c + v for c in CONSONANTS for v in VOWELS]
+    words = [a + b + c for a in syllables for b in syllables for c in syllables[:8]]
+    if size > len(words):
+        raise ValueError(f"At most {len(words)} words")
+    return words[:size]
+
+
+class HashingEncoder:
+    """
+    Tiny local stand-in for the SentenceTransformer: a text is the normalized sum
+    of fixed random vectors of its words, seeded by a hash of the word. Same
+    `encode()` signature, no download, deterministic across processes.
+    """
+    def __init__(self, dim=DEFAULT_DIM):
+        self.dim = dim
+
+    @lru_cache(maxsize=200_000)
+    def word_vector(self, word):
+        return np.random.default_rng(zlib.crc32(word.encode("utf-8"))).standard_normal(self.dim).astype(np.float32)
+
+    def word_matrix(self, words):
+        return np.stack([self.word_vector(word) for word in words])
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, convert_to_tensor=False, **kwargs):
+        single = isinstance(texts, str)
+        vectors = np.zeros((1 if single else len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate([texts] if single else texts):
+            for word in text.split():
+                vectors[i] += self.word_vector(word)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.maximum(norms, 1e-12)
+        return vectors[0] if single else vectors
+
+
+def generate(out_dir, n_articles, n_users=None, vocab_size=5000, n_topics=50, dim=DEFAULT_DIM,
+             history_mean=12, impressions_per_user=2, item_sim_df=False, seed=0):
+    """
+    Write a MIND-shaped asset directory (news.tsv, behaviors.tsv, stores, TF-IDF
+    vectorizer, catalogue and CF index) whose topics drive both words and clicks.
+    Returns timings per step.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+    import joblib
+    from app import embedding_store, news_catalogue, cf_index, click_histories
+
+    rng = np.random.default_rng(seed)
+    n_users = n_users or max(1, n_articles // 2)
+    words = np.asarray(vocabulary(vocab_size))
+    timings = {}
+    os.makedirs(out_dir, exist_ok=True)
+
+    # ---------- news.tsv ---------- #
+    start = time.perf_counter()
+    news_ids = np.asarray([f"N{i}" for i in range(1, n_articles + 1)])
+    topics = rng.integers(0, n_topics, size=n_articles)
+    # Every topic favours its own slice of the vocabulary (Zipf within the slice)
+    topic_offset = rng.integers(0, vocab_size, size=n_topics)
+    word_ids = (topic_offset[topics][:, np.newaxis] + rng.zipf(1.3, size=(n_articles, 24)) - 1) % vocab_size
+    titles = [" ".join(row) for row in words[word_ids[:, :8]]]
+    abstracts = [" ".join(row) for row in words[word_ids[:, 8:]]]
+    categories = np.asarray(CATEGORIES)[topics % len(CATEGORIES)]
+    subcategories = np.char.add(categories, np.asarray(list("abcdefghijklmnopqrstuvwxyz"))[topics % 26])
+    news = pd.DataFrame({
+        "Category": categories,
+        "Subcategory": subcategories,
+        "News Title": titles,
+        "News Abstract": abstracts,
+        "News Url": [f"https://example.com/{news_id}" for news_id in news_ids],
+        "Entities in News Title": "[]",
+        "Entities in News Abstract": "[]",
+    }, index=pd.Index(news_ids, name="News ID"))
+    news.to_csv(os.path.join(out_dir, "news.tsv"), sep="\t", header=False)
+    timings["news"] = time.perf_counter() - start
+
+    # ---------- behaviors.tsv ---------- #
+    start = time.perf_counter()
+    by_topic = [np.flatnonzero(topics == topic) for topic in range(n_topics)]
+    popularity = [rng.permutation(len(members)) for members in by_topic]
+    with open(os.path.join(out_dir, "behaviors.tsv"), "w", encoding="utf-8") as f:
+        impression_id = 0
+        for user in range(n_users):
+            favourites = rng.choice(n_topics, size=2, replace=False)
+            length = max(1, rng.geometric(1 / history_mean))
+            clicked = _sample_clicks(rng, favourites, by_topic, popularity, length)
+            history = " ".join(news_ids[clicked])
+            for _ in range(impressions_per_user):
+                impression_id += 1
+                positive = _sample_clicks(rng, favourites, by_topic, popularity, 1)
+                if len(positive) == 0:  # the drawn topic has no articles (small catalogues)
+                    positive = rng.integers(0, n_articles, size=1)
+                negatives = rng.integers(0, n_articles, size=4)
+                impressions = " ".join([f"{news_ids[positive[0]]}-1"] + [f"{news_ids[n]}-0" for n in negatives])
+                f.write(f"{impression_id}\tU{user}\t11/11/2019 9:05:58 AM\t{history}\t{impressions}\n")
+    timings["behaviors"] = time.perf_counter() - start
+
+    # ---------- Embedding stores and vectorizer ---------- #
+    start = time.perf_counter()
+    contents = [f"{c} {s} {t} {a}" for c, s, t, a in zip(categories, subcategories, titles, abstracts)]
+    # Generated words are already clean, so the texts are vectorized as they are
+    tfidf = TfidfVectorizer(token_pattern=r"\S+", dtype=np.float32)
+    tfidf_vectors = tfidf.fit_transform(contents)
+    joblib.dump(tfidf, os.path.join(out_dir, "tfidf_vectorizer.pkl"))
+
+    counts = CountVectorizer(token_pattern=r"\S+", vocabulary=tfidf.vocabulary_, dtype=np.float32).transform(contents)
+    terms = np.empty(len(tfidf.vocabulary_), dtype=object)
+    for term, column in tfidf.vocabulary_.items():
+        terms[column] = term
+    bert_vectors = counts @ HashingEncoder(dim).word_matrix(terms)  # what HashingEncoder.encode gives per text
+
+    embedding_store.EmbeddingStore.create(os.path.join(out_dir, "bert_store"), bert_vectors, news_ids)
+    embedding_store.EmbeddingStore.create(os.path.join(out_dir, "tfidf_store"), tfidf_vectors, news_ids)
+    timings["embeddings"] = time.perf_counter() - start
+
+    # ---------- Catalogue and CF ---------- #
+    start = time.perf_counter()
+    news_catalogue.NewsCatalogue.from_frame(os.path.join(out_dir, "news_catalogue"), news)
+    histories = click_histories.ClickHistories.from_behaviors(os.path.join(out_dir, "behaviors.tsv"))
+    index = cf_index.CFIndex.from_user_clicks(histories)
+    index.save(os.path.join(out_dir, "cf_index"))
+    if item_sim_df:
+        similarity = index.to_csr().toarray()
+        pd.DataFrame(similarity.T, index=index.ids, columns=index.ids).to_pickle(os.path.join(out_dir, "item_sim_df.pkl"))
+    timings["catalogue_and_cf"] = time.perf_counter() - start
+
+    with open(os.path.join(out_dir, "synthetic.json"), "w") as f:
+        json.dump({"n_articles": n_articles, "n_users": n_users, "vocab_size": vocab_size,
+                   "n_topics": n_topics, "dim": dim, "seed": seed}, f)
+    return timings
+
+
+def _sample_clicks(rng, favourites, by_topic, popularity, n):
+    # Mostly the user's topics, popular articles first (Zipf over the popularity order)
+    clicks = []
+    for _ in range(n):
+        topic = favourites[rng.integers(0, len(favourites))] if rng.random() < 0.8 else rng.integers(0, len(by_topic))
+        members = by_topic[topic]
+        if len(members) == 0:
+            continue
+        rank = min(rng.zipf(1.5) - 1, len(members) - 1)
+        clicks.append(members[popularity[topic][rank]])
+    return np.unique(np.asarray(clicks, dtype=np.int64))
+
+
+def load_encoder(assets_dir):
+    """The stand-in encoder matching a generated asset directory."""
+    with open(os.path.join(assets_dir, "synthetic.json")) as f:
+        return HashingEncoder(json.load(f)["dim"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MIND-shaped model_assets directory.")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--n-articles", type=int, default=10_000)
+    parser.add_argument("--n-users", type=int, default=None, help="defaults to half the articles")
+    parser.add_argument("--vocab-size", type=int, default=5000)
+    parser.add_argument("--n-topics", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="stand-in BERT dimension")
+    parser.add_argument("--item-sim-df", action="store_true", help="also write the dense legacy item_sim_df.pkl")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timings = generate(args.out, args.n_articles, n_users=args.n_users, vocab_size=args.vocab_size,
+                       n_topics=args.n_topics, dim=args.dim, item_sim_df=args.item_sim_df, seed=args.seed)
+    print(f"Generated {args.n_articles} articles in {args.out}: " + ", ".join(f"{k} {v:.1f}s" for k, v in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import threading
+import numpy as np
+from scipy.sparse import csr_matrix
+
+DEFAULT_DECAY = 0.9
+
+
+def recency_weights(n_clicks, decay=DEFAULT_DECAY):
+    """Weight of every click in a history ordered oldest to newest; the newest click weighs 1."""
+    return decay ** np.arange(n_clicks - 1, -1, -1, dtype=np.float64)
+
+
+class UserProfileStore:
+    """
+    Click histories and BERT user profiles (recency-weighted means of clicked
+    embeddings, kept as weighted sums so new clicks update one row).
+    """
+    def __init__(self, user_ids, histories, profile_sums, weight_totals, decay=DEFAULT_DECAY):
+        self.decay = decay
+        self.user_ids = list(user_ids)
+        self.row_of = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self.histories = list(histories)  # per user: clicked News IDs, oldest first
+        self._sums = np.asarray(profile_sums, dtype=np.float32)
+        self._totals = np.asarray(weight_totals, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __contains__(self, user_id):
+        return user_id in self.row_of
+
+    @classmethod
+    def build(cls, user_clicks, bert_recommender, decay=DEFAULT_DECAY):
+        """
+        Precompute every profile with one sparse (users x articles) weight matrix
+        multiplied by the normalized BERT bank.
+        """
+        user_ids = list(user_clicks.keys())
+        histories = [list(user_clicks[user_id]) for user_id in user_ids]
+
+        lengths = np.fromiter((len(history) for history in histories), dtype=np.int64, count=len(histories))
+        clicked = [news_id for history in histories for news_id in history]
+        rows = np.repeat(np.arange(len(histories)), lengths)
+        weights = np.concatenate([recency_weights(n, decay) for n in lengths]) if clicked else np.empty(0)
+        bank_rows = bert_recommender.rows_of(clicked)
+
+        # Clicks on articles without an embedding do not contribute
+        known = bank_rows >= 0
+        weight_matrix = csr_matrix(
+            (weights[known], (rows[known], bank_rows[known])),
+            shape=(len(histories), bert_recommender.n_items)
+        )
+        profile_sums = bert_recommender.bank.weighted_sum(weight_matrix)
+        weight_totals = np.asarray(weight_matrix.sum(axis=1)).ravel()
+
+        return cls(user_ids, histories, profile_sums, weight_totals, decay=decay)
+
+    def history(self, user_id):
+        return self.histories[self.row_of[user_id]]
+
+    def profile(self, user_id, recommender):
+        """Profile vector of a user in the recommender's embedding space, or None without usable clicks."""
+        row = self.row_of[user_id]
+        if recommender.mode == "bert":
+            total = self._totals[row]
+            return (self._sums[row] / total).astype(np.float32) if total > 0 else None
+
+        history = self.histories[row]
+        bank_rows = recommender.rows_of(history)
+        known = bank_rows >= 0
+        if not known.any():
+            return None
+        weights = recency_weights(len(history), self.decay)[known]
+        weights = csr_matrix(weights / weights.sum())
+        return weights @ recommender.bank.rows(bank_rows[known])
+
+    def add_clicks(self, user_id, news_ids, bert_recommender):
+        """
+        Append new clicks (oldest first) to a user's history, creating the user if
+        needed. The stored profile is decayed and updated in place.
+        """
+        news_ids = list(news_ids)
+        weights = recency_weights(len(news_ids), self.decay)
+        bank_rows = bert_recommender.rows_of(news_ids)
+        known = bank_rows >= 0
+        new_sum = weights[known] @ bert_recommender.bank.rows(bank_rows[known])
+        shift = self.decay ** len(news_ids)
+
+        with self._lock:
+            row = self.row_of.get(user_id)
+            if row is None:
+                row = self._append_user(user_id)
+            self.histories[row] = self.histories[row] + news_ids
+            self._sums[row] = self._sums[row] * shift + new_sum
+            self._totals[row] = self._totals[row] * shift + weights[known].sum()
+
+    def _append_user(self, user_id):
+        row = len(self.user_ids)
+        if row == len(self._sums):
+            # Grow the backing arrays geometrically so appends stay amortized O(dim)
+            capacity = max(16, 2 * row)
+            self._sums = _resize(self._sums, capacity)
+            self._totals = _resize(self._totals, capacity)
+        self.user_ids.append(user_id)
+        self.histories.append([])
+        self.row_of[user_id] = row
+        return row
+
+
+def _resize(array, capacity):
+    resized = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    resized[:len(array)] = array
+    return resized
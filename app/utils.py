@@ -1,38 +1,119 @@
 import re
 import string
-import joblib
-import torch
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+import numpy as np
 import pandas as pd
-from scipy.sparse import load_npz
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from sentence_transformers import SentenceTransformer
+from scipy.sparse import load_npz, issparse
+
+# torch, sentence_transformers, scikit-learn, joblib and nltk are imported where
+# they are used: serving from the stored banks never needs them, and importing
+# them costs seconds at startup
 
 
 def load_tfidf(emb_path, model_path):
-    return load_npz(emb_path), joblib.load(model_path)
+    return load_tfidf_embeddings(emb_path), load_tfidf_model(model_path)
 
 def load_bert(emb_path, model_path):
-    return torch.load(emb_path), SentenceTransformer(model_path)
+    return load_bert_embeddings(emb_path), load_bert_model(model_path)
+
+def load_tfidf_embeddings(emb_path):
+    return load_npz(emb_path)
+
+def load_tfidf_model(model_path):
+    import joblib
+    return joblib.load(model_path)
+
+def load_bert_embeddings(emb_path):
+    import torch
+    return torch.load(emb_path)
+
+def load_bert_model(model_path):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_path)
 
 def load_item_sim_df(path):
     return pd.read_pickle(path)
 
+def to_numpy(embeddings):
+    # A tensor can only exist once torch has been imported by someone else
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.is_tensor(embeddings):
+        embeddings = embeddings.detach().cpu().numpy()
+    return np.asarray(embeddings, dtype=np.float32)
+
+def normalize_embeddings(embeddings):
+    """L2-normalize every row once so cosine similarity becomes a plain dot product."""
+    if issparse(embeddings):
+        from sklearn.preprocessing import normalize
+        return normalize(embeddings.tocsr().astype(np.float32), norm="l2", copy=True)
+    embeddings = to_numpy(embeddings)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+# Compiled once; applied in the same order as the original chain of re.sub calls. They stay separate
+# passes: one alternation matches leftmost-first instead of pass by pass, so "<a [b> c]" or "h[x]ttp://x"
+# would clean differently, and the digit pass must run after punctuation is gone
+_BRACKETS = re.compile(r'\[.*?\]')
+_URLS = re.compile(r'https?://\S+|www\.\S+')
+_TAGS = re.compile(r'<.*?>+')
+_DIGIT_WORDS = re.compile(r'\w*\d\w*')
+# Punctuation and newline removal are plain character deletions: one translate pass
+_DELETE_CHARS = str.maketrans('', '', string.punctuation + '\n')
+
+
+@lru_cache(maxsize=None)
+def _stopwords():
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english'))
+
+@lru_cache(maxsize=None)
+def _lemmatizer():
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+def missing_nltk_data():
+    """The NLTK data packages clean_text needs that are not installed (`python -m nltk.downloader <name>`)."""
+    import nltk
+    missing = []
+    for name in ("stopwords", "wordnet"):
+        try:
+            nltk.data.find(f"corpora/{name}")
+        except LookupError:
+            missing.append(name)
+    return missing
+
+@lru_cache(maxsize=200_000)
+def _lemmatize(word):
+    return _lemmatizer().lemmatize(word)
+
 def clean_text(text):
-    stopwords_english = stopwords.words('english')
-    stemmer = WordNetLemmatizer()
+    stopwords_english = _stopwords()
     text = str(text).lower()
-    text = re.sub('\[.*?\]', '', text)
-    text = re.sub('https?://\S+|www\.\S+', '', text)
-    text = re.sub('<.*?>+', '', text)
-    text = re.sub('[%s]' % re.escape(string.punctuation), '', text)
-    text = re.sub('\n', '', text)
-    text = re.sub('\w*\d\w*', '', text)
+    text = _BRACKETS.sub('', text)
+    text = _URLS.sub('', text)
+    text = _TAGS.sub('', text)
+    text = text.translate(_DELETE_CHARS)
+    text = _DIGIT_WORDS.sub('', text)
+
+    return ' '.join(_lemmatize(word) for word in text.split(' ') if word not in stopwords_english)
 
-    text = ' '.join(word for word in text.split(' ') if word not in stopwords_english)
-    text = ' '.join(stemmer.lemmatize(word) for word in text.split(" "))
+def clean_texts(texts, n_jobs=1, chunksize=256):
+    """
+    Stream clean_text over an iterable, in order. With n_jobs > 1 the input is
+    consumed in chunks and cleaned in a process pool (for bulk re-indexing).
+    """
+    if n_jobs <= 1:
+        for text in texts:
+            yield clean_text(text)
+        return
 
-    return text
+    texts = iter(texts)
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        while chunk := list(islice(texts, chunksize * n_jobs)):
+            yield from pool.map(clean_text, chunk, chunksize=chunksize)
 
 def load_news_data(path):
     return pd.read_csv(path,
@@ -0,0 +1,205 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from app import news_database
+
+OPS = ("add", "update", "delete")
+DEFAULT_MAX_BATCH = 1000
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_FINISHED = 10_000
+
+
+class WriteJob:
+    """One queued add/update/delete and its outcome."""
+    def __init__(self, op, news_id, item=None):
+        self.job_id = uuid.uuid4().hex
+        self.op = op
+        self.news_id = news_id
+        self.item = item
+        self.status = "queued"
+        self.error = None
+        self.version = None  # asset version the write was published in
+        self.batch = None    # number of jobs committed together
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    def finish(self, status, error=None, version=None, batch=None):
+        self.status = status
+        self.error = error
+        self.version = version
+        self.batch = batch
+        self.finished_at = time.time()
+
+    @classmethod
+    def from_dict(cls, record):
+        job = cls(record["op"], record["news_id"])
+        job.__dict__.update(record)
+        return job
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "op": self.op,
+            "news_id": self.news_id,
+            "status": self.status,
+            "error": self.error,
+            "version": self.version,
+            "batch": self.batch,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def coalesce(jobs, catalogue):
+    """
+    Reduce jobs, in submission order, to (upserts, deletes, accepted jobs):
+    the final item of every surviving News ID and the pre-existing IDs deleted.
+    Jobs invalid at their point in the sequence fail on their own.
+    """
+    final = {}  # News ID -> latest item, None once deleted
+    accepted = []
+    for job in jobs:
+        exists = final[job.news_id] is not None if job.news_id in final else job.news_id in catalogue
+        if job.op == "add" and exists:
+            job.finish("failed", error="News item already exists.")
+            continue
+        if job.op != "add" and not exists:
+            job.finish("failed", error="News ID not found.")
+            continue
+        final[job.news_id] = None if job.op == "delete" else job.item
+        accepted.append(job)
+
+    upserts = [item for item in final.values() if item is not None]
+    deletes = [news_id for news_id, item in final.items() if item is None and news_id in catalogue]
+    return upserts, deletes, accepted
+
+
+class WriteQueue:
+    """
+    Single background writer: requests enqueue jobs, and each pending batch is
+    coalesced and committed as one asset version under the registry's write
+    lock. `journal_dir` shares job status across workers.
+    """
+    def __init__(self, registry, max_batch=DEFAULT_MAX_BATCH, batch_size=DEFAULT_BATCH_SIZE,
+                 max_finished=DEFAULT_MAX_FINISHED, journal_dir=None):
+        self.registry = registry
+        self.max_batch = max_batch
+        self.batch_size = batch_size
+        self.max_finished = max_finished
+        self.journal_dir = journal_dir
+        if journal_dir is not None:
+            os.makedirs(journal_dir, exist_ok=True)
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()  # job ID -> job, oldest first
+        self._jobs_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="news-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, op, news_id, item=None):
+        if op not in OPS:
+            raise ValueError(f"Unknown write operation: {op}")
+        job = WriteJob(op, news_id, item)
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+            self._forget_finished()
+        self._record(job)
+        self._queue.put(job)
+        return job
+
+    def job(self, job_id):
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.journal_dir is not None and job_id.isalnum():
+            # Submitted to another worker
+            try:
+                with open(os.path.join(self.journal_dir, f"{job_id}.json")) as f:
+                    job = WriteJob.from_dict(json.load(f))
+            except FileNotFoundError:
+                pass
+        return job
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self, timeout=None):
+        """Wait until every job submitted so far is applied (for tests and shutdown)."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            # Everything submitted in the meantime joins the batch
+            while len(jobs) < self.max_batch:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply(jobs)
+            finally:
+                for job in jobs:
+                    self._record(job)
+                    self._queue.task_done()
+
+    def _apply(self, jobs):
+        for job in jobs:
+            job.status = "running"
+
+        accepted = []
+        try:
+            with self.registry.write() as snapshot:
+                upserts, deletes, accepted = coalesce(jobs, snapshot.catalogue)
+                news_database.apply_changes(
+                    snapshot.catalogue,
+                    upserts,
+                    deletes,
+                    snapshot.stores["bert"],
+                    snapshot.stores["tfidf"],
+                    snapshot.encoders["bert"],
+                    snapshot.encoders["tfidf"],
+                    ann_index=snapshot.ann_index,
+                    batch_size=self.batch_size
+                )
+        except Exception as e:
+            for job in accepted or jobs:
+                if job.status == "running":
+                    job.finish("failed", error=str(e), batch=len(jobs))
+            return
+
+        version = self.registry.current.version
+        for job in accepted:
+            job.finish("done", version=version, batch=len(jobs))
+
+    def _forget_finished(self):
+        # Bounded history: drop the oldest finished jobs first
+        excess = len(self._jobs) - self.max_finished
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at is not None][:excess]:
+            del self._jobs[job_id]
+            if self.journal_dir is not None:
+                try:
+                    os.remove(os.path.join(self.journal_dir, f"{job_id}.json"))
+                except FileNotFoundError:
+                    pass
+
+    def _record(self, job):
+        if self.journal_dir is None:
+            return
+        path = os.path.join(self.journal_dir, f"{job.job_id}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(job.to_dict(), f)
+        os.replace(path + ".tmp", path)
@@ -5,5 +5,7 @@ cd "$(dirname "$0")"
 echo "Contents of model_assets:"
 ls -R app/model_assets
 
-uvicorn app.main:app --host 0.0.0.0 --port 8000 &
+# WORKERS > 1 runs several API processes over the same memory-mapped assets
+export WORKERS="${WORKERS:-1}"
+uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers "$WORKERS" &
 streamlit run app/streamlit_app.py
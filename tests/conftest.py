@@ -0,0 +1,33 @@
+import shutil
+import pytest
+from app import assets, synthetic, utils
+
+N_ARTICLES = 300
+
+
+@pytest.fixture(autouse=True)
+def text_cleaner(monkeypatch):
+    """Without the NLTK data, clean texts with no stopwords and no lemmatization (synthetic words need neither)."""
+    if utils.missing_nltk_data():
+        monkeypatch.setattr(utils, "_stopwords", frozenset)
+        monkeypatch.setattr(utils, "_lemmatize", lambda word: word)
+
+
+@pytest.fixture(scope="session")
+def synthetic_assets(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("synthetic") / "assets"
+    synthetic.generate(directory, N_ARTICLES, seed=0)
+    return directory
+
+
+@pytest.fixture
+def assets_dir(synthetic_assets, tmp_path):
+    """A fresh copy of the synthetic assets, free to write to."""
+    return shutil.copytree(synthetic_assets, tmp_path / "assets")
+
+
+@pytest.fixture
+def registry(assets_dir):
+    registry = assets.AssetRegistry(assets_dir, encoder_loaders={"bert": lambda: synthetic.load_encoder(assets_dir)})
+    registry.load(wait_for_encoders=True)
+    return registry
@@ -0,0 +1,55 @@
+import numpy as np
+from app.ann_index import IVFIndex
+
+
+def clustered_vectors(n=200, dim=16, n_clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_clusters, dim))
+    vectors = centres[rng.integers(0, n_clusters, n)] + 0.05 * rng.normal(size=(n, dim))
+    return np.array([f"N{i}" for i in range(n)]), vectors.astype(np.float32)
+
+
+def lists_of(index):
+    return {list_id: sorted(members.tolist()) for list_id, members in index.lists.items()}
+
+
+def test_full_probe_returns_every_item():
+    ids, vectors = clustered_vectors()
+    index = IVFIndex.build(ids, vectors, n_lists=8)
+    assert sorted(index.search(vectors[0], nprobe=8).tolist()) == sorted(ids.tolist())
+
+
+def test_an_item_is_found_in_its_closest_list():
+    ids, vectors = clustered_vectors()
+    index = IVFIndex.build(ids, vectors, n_lists=8)
+    for row in (0, 17, 150):
+        assert ids[row] in index.search(vectors[row] / np.linalg.norm(vectors[row]), nprobe=1)
+
+
+def test_add_moves_and_remove_drops():
+    ids, vectors = clustered_vectors()
+    index = IVFIndex.build(ids, vectors, n_lists=8)
+    index.add("N0", vectors[1])
+    assert index.list_of["N0"] == index.list_of["N1"]
+    assert sum(members.tolist().count("N0") for members in index.lists.values()) == 1
+    index.add_many(["new1", "new2"], vectors[[2, 3]])
+    index.remove("N5")
+    index.remove("N5")  # removing twice is a no-op
+    assert len(index) == len(ids) + 1
+    assert "N5" not in np.concatenate(list(index.lists.values()))
+
+
+def test_change_log_replays_on_load(tmp_path):
+    ids, vectors = clustered_vectors()
+    index = IVFIndex.build(ids, vectors, n_lists=8)
+    index.save(tmp_path)
+    index.add_many(["new1"], vectors[[4]])
+    index.remove("N6")
+    index.save_changes(tmp_path)
+    index.add("N7", vectors[8])
+    index.save_changes(tmp_path)
+    assert lists_of(IVFIndex.load(tmp_path)) == lists_of(index)
+
+    index.save(tmp_path)  # compaction empties the log
+    assert (tmp_path / "changes.jsonl").read_text() == ""
+    assert lists_of(IVFIndex.load(tmp_path)) == lists_of(index)
@@ -0,0 +1,70 @@
+import subprocess
+import sys
+import threading
+from app import assets, synthetic
+from app.asset_sync import AssetSync
+
+TRY_LOCK = """
+import fcntl, sys
+with open(sys.argv[1], "a") as f:
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        sys.exit(1)
+"""
+
+
+def locked_elsewhere(path):
+    return subprocess.run([sys.executable, "-c", TRY_LOCK, str(path)]).returncode == 1
+
+
+def test_lock_is_exclusive_across_processes_and_reentrant(tmp_path):
+    sync = AssetSync(tmp_path)
+    with sync.lock():
+        with sync.lock():
+            assert sync.bump() == 1
+        assert locked_elsewhere(tmp_path / ".write.lock")
+    assert not locked_elsewhere(tmp_path / ".write.lock")
+    assert sync.version() == 1
+
+
+def test_only_one_leader(tmp_path):
+    first, second = AssetSync(tmp_path), AssetSync(tmp_path)
+    assert first.try_lead() and first.leader
+    assert not second.try_lead() and not second.leader
+
+
+def test_watch_reports_version_changes(tmp_path):
+    sync = AssetSync(tmp_path, interval=0.01)
+    changed = threading.Event()
+    sync.watch(changed.set)
+    other = AssetSync(tmp_path)
+    for _ in range(100):  # the watcher reads its starting version once it runs
+        other.bump()
+        if changed.wait(timeout=0.1):
+            break
+    assert changed.is_set()
+    sync.stop()
+
+
+def test_a_write_in_one_worker_reaches_the_other(assets_dir):
+    def worker():
+        registry = assets.AssetRegistry(assets_dir, encoder_loaders={"bert": lambda: synthetic.load_encoder(assets_dir)},
+                                        sync=AssetSync(assets_dir))
+        registry.load(wait_for_encoders=True)
+        return registry
+
+    writer, reader = worker(), worker()
+    with writer.write() as snapshot:
+        snapshot.catalogue.delete(["N1"])
+        for store in snapshot.stores.values():
+            store.delete("N1")
+    assert "N1" not in writer.current.news
+    assert "N1" in reader.current.news
+
+    reader.catch_up()
+    assert "N1" not in reader.current.news
+    assert reader.current.stores["bert"].row_of("N1") is None
+    version = reader.current.version
+    reader.catch_up()  # nothing new on disk
+    assert reader.current.version == version
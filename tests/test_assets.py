@@ -0,0 +1,73 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+import pytest
+from app import assets, synthetic
+
+
+def test_current_before_load_raises(assets_dir):
+    registry = assets.AssetRegistry(assets_dir)
+    assert not registry.ready
+    with pytest.raises(assets.AssetsNotReady):
+        registry.current
+
+
+def test_load_publishes_a_snapshot(registry):
+    snapshot = registry.current
+    assert snapshot.version == 1
+    assert len(snapshot.news) == 300
+    assert set(snapshot.recommenders) == set(assets.MODES)
+    assert all(state["state"] == "ready" for state in registry.load_state.values())
+
+
+def test_refresh_publishes_a_new_version_and_keeps_the_old_one(registry):
+    before = registry.current
+    after = registry.refresh()
+    assert after.version == before.version + 1
+    assert registry.current is after
+    assert before.recommender("bert").recommend("N1") == after.recommender("bert").recommend("N1")
+
+
+def test_unknown_precision_is_rejected(assets_dir):
+    with pytest.raises(ValueError):
+        assets.AssetRegistry(assets_dir, bert_precision="int4")
+
+
+def test_stored_articles_are_served_while_the_encoder_loads(assets_dir):
+    release = threading.Event()
+
+    def slow_encoder():
+        release.wait(timeout=30)
+        return synthetic.load_encoder(assets_dir)
+
+    registry = assets.AssetRegistry(assets_dir, encoder_loaders={"bert": slow_encoder})
+    snapshot = registry.load()
+    encoder = snapshot.encoders["bert"]
+    assert isinstance(encoder, assets.PendingAsset) and not encoder.loaded
+    assert registry.load_state["bert_encoder"]["state"] == "loading"
+    assert len(snapshot.recommender("bert").recommend("N1")) == 10
+
+    release.set()
+    encoder.resolve()
+    assert registry.load_state["bert_encoder"]["state"] == "ready"
+
+
+def test_a_failed_encoder_is_reported(assets_dir):
+    def broken():
+        raise OSError("weights missing")
+
+    registry = assets.AssetRegistry(assets_dir, encoder_loaders={"bert": broken})
+    registry.load()
+    with pytest.raises(OSError):
+        registry.current.encoders["bert"].resolve()
+    assert registry.load_state["bert_encoder"] == {"state": "failed", "seconds": pytest.approx(0, abs=5),
+                                                   "error": "weights missing"}
+
+
+def test_importing_the_service_modules_defers_heavy_imports():
+    code = ("import sys, app.assets, app.ingest, app.write_queue, app.cf_engine; "
+            "print(sorted(m for m in ('nltk', 'sklearn', 'torch', 'sentence_transformers') if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parents[1]).stdout
+    assert output.strip() == "[]"
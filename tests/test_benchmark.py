@@ -0,0 +1,44 @@
+import json
+import pytest
+from app import benchmark, synthetic, utils
+
+
+def test_generate_is_reproducible(tmp_path):
+    for name in ("a", "b"):
+        synthetic.generate(tmp_path / name, 50, seed=3)
+    for file_name in ("news.tsv", "behaviors.tsv", "synthetic.json"):
+        assert (tmp_path / "a" / file_name).read_bytes() == (tmp_path / "b" / file_name).read_bytes()
+    synthetic.generate(tmp_path / "c", 50, seed=4)
+    assert (tmp_path / "c" / "news.tsv").read_bytes() != (tmp_path / "a" / "news.tsv").read_bytes()
+
+
+def test_encoder_is_deterministic_and_normalized():
+    encoder = synthetic.HashingEncoder(dim=16)
+    vectors = encoder.encode(["bada beba", "bada"])
+    assert vectors.shape == (2, 16)
+    assert encoder.encode("bada beba").tolist() == vectors[0].tolist()
+    assert abs(float((vectors ** 2).sum(axis=1)[1]) - 1) < 1e-5
+
+
+def test_summarize():
+    summary = benchmark.summarize([0.001, 0.003])
+    assert summary["n"] == 2 and summary["max_ms"] == pytest.approx(3.0)
+    assert summary["throughput_per_s"] == pytest.approx(500.0)
+    assert benchmark.summarize([]) == {"n": 0}
+
+
+def test_run_needs_the_nltk_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "missing_nltk_data", lambda: ["wordnet"])
+    with pytest.raises(RuntimeError, match="nltk.downloader wordnet"):
+        benchmark.run(tmp_path / "assets", 50)
+    assert not (tmp_path / "assets").exists()
+
+
+def test_run_reports_every_operation(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "missing_nltk_data", lambda: [])
+    report = benchmark.run(tmp_path / "assets", 80, requests=5, batch_size=2, eval_users=10, writes=2)
+    json.dumps(report)
+    for mode in benchmark.MODES:
+        assert report["results"][f"recommend_{mode}"]["n"] == 5
+        assert report["results"][f"recommend_many_{mode}"]["n"] == 3
+    assert report["generate"]["total"] > 0 and report["peak_rss_mb"]["total"] > 0
@@ -0,0 +1,70 @@
+import numpy as np
+from app.cf_engine import CoClickEngine
+from app.cf_index import CFIndex
+
+NEW_CLICKS = [("U1", ["N5", "N6"]), ("new-user", ["N5", "N7", "N5"]), ("U2", ["X-new"])]
+
+
+def neighbour_map(index, news_id):
+    rows, sims = index.neighbours(news_id)
+    return dict(zip(index.ids[rows].tolist(), sims.tolist()))
+
+
+def rebuilt_index(histories):
+    user_clicks = {user_id: list(histories[user_id]) for user_id in histories}
+    for user_id, news_ids in NEW_CLICKS:
+        user_clicks[user_id] = list(dict.fromkeys(user_clicks.get(user_id, []) + news_ids))
+    return CFIndex.from_user_clicks(user_clicks, top_n=10_000)
+
+
+def assert_same_neighbours(actual, expected):
+    assert actual.keys() == expected.keys()
+    np.testing.assert_allclose([actual[k] for k in expected], list(expected.values()), rtol=1e-5)
+
+
+def test_incremental_lists_match_a_rebuild(registry):
+    histories = registry.current.user_clicks
+    engine = CoClickEngine(registry, top_n=10_000)
+    engine.build(histories)
+    touched = engine.add_clicks(NEW_CLICKS)
+    assert engine.clicks_applied == 5  # "N5" once for the new user
+
+    updated = engine.refresh(CFIndex.from_user_clicks(histories, top_n=10_000), touched)
+    expected = rebuilt_index(histories)
+    for news_id in ("N5", "N6", "N7", "X-new"):
+        assert_same_neighbours(neighbour_map(updated, news_id), neighbour_map(expected, news_id))
+
+
+def test_background_engine_publishes_and_notifies(registry):
+    engine = CoClickEngine(registry)
+    notified = []
+    engine.on_refresh(lambda news_ids, version: notified.append((set(news_ids), version)))
+    engine.start()
+    engine.submit("new-user", ["N5", "N7"])
+    assert engine.join(timeout=30)
+
+    assert engine.ready.is_set() and engine.status()["failures"] == 0
+    assert "N7" in neighbour_map(registry.current.cf_index, "N5")
+    (news_ids, version), = notified
+    assert {"N5", "N7"} <= news_ids and version == registry.current.version
+
+
+def test_a_failing_batch_is_counted_and_the_engine_keeps_going(registry, monkeypatch):
+    engine = CoClickEngine(registry)
+    engine.start()
+    assert engine.ready.wait(timeout=30)
+    update = registry.update_cf_index
+
+    def fail_once(change):
+        monkeypatch.setattr(registry, "update_cf_index", update)
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(registry, "update_cf_index", fail_once)
+    engine.submit("new-user", ["N5", "N7"])
+    assert engine.join(timeout=30)
+    assert engine.failures == 1 and "disk full" in engine.last_error
+
+    engine.submit("new-user", ["N8"])
+    assert engine.join(timeout=30)
+    assert engine.failures == 1
+    assert "N8" in neighbour_map(registry.current.cf_index, "N5")
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from app.cf_index import CFIndex
+
+IDS = np.array(["A", "B", "C", "D"])
+SIMILARITY = np.array([
+    [1.0, 0.5, 0.0, 0.2],
+    [0.5, 1.0, 0.3, 0.0],
+    [0.0, 0.3, 1.0, 0.2],
+    [0.2, 0.0, 0.2, 1.0],
+], dtype=np.float32)
+
+
+def neighbours(index, news_id):
+    rows, sims = index.neighbours(news_id)
+    return list(index.ids[rows]), sims.tolist()
+
+
+def test_top_n_per_column_best_first_ties_by_row():
+    index = CFIndex.from_similarity(IDS, SIMILARITY, top_n=3)
+    assert neighbours(index, "D") == (["D", "A", "C"], [1.0, np.float32(0.2), np.float32(0.2)])
+    assert neighbours(index, "A")[0] == ["A", "B", "D"]  # the zero similarity to C is dropped
+
+
+def test_dense_sparse_and_dataframe_inputs_agree():
+    dense = CFIndex.from_similarity(IDS, SIMILARITY, top_n=2)
+    sparse = CFIndex.from_similarity(IDS, csr_matrix(SIMILARITY), top_n=2)
+    frame = pd.DataFrame(SIMILARITY, index=IDS, columns=IDS).astype(pd.SparseDtype("float32", 0.0))
+    from_frame = CFIndex.from_item_sim_df(frame, top_n=2)
+    for other in (sparse, from_frame):
+        np.testing.assert_array_equal(dense.indptr, other.indptr)
+        np.testing.assert_array_equal(dense.indices, other.indices)
+        np.testing.assert_array_equal(dense.data, other.data)
+
+
+def test_updates_save_and_load_round_trip(tmp_path):
+    index = CFIndex.from_similarity(IDS, SIMILARITY)
+    updated = index.with_updates(["E"], {4: ([0], [0.9]), 0: ([4], [0.9])})
+    assert neighbours(updated, "A")[0] == ["E"]
+    assert index.neighbours("E") is None  # the original is unchanged
+
+    updated.save(tmp_path / "cf")
+    loaded = CFIndex.load(tmp_path / "cf")
+    assert not loaded.overrides
+    for news_id in ["A", "B", "C", "D", "E"]:
+        assert neighbours(loaded, news_id) == neighbours(updated, news_id)
+
+
+def test_from_user_clicks_matches_dict_input(registry):
+    histories = registry.current.user_clicks
+    from_histories = CFIndex.from_user_clicks(histories, top_n=10_000)
+    from_dict = CFIndex.from_user_clicks({user_id: histories[user_id] for user_id in histories}, top_n=10_000)
+    news_id = histories.most_clicked(1)[0]
+    expected = dict(zip(*neighbours(from_histories, news_id)))
+    actual = dict(zip(*neighbours(from_dict, news_id)))
+    assert actual.keys() == expected.keys()
+    np.testing.assert_allclose([actual[k] for k in expected], list(expected.values()), rtol=1e-5)
+    assert expected[news_id] == 1.0
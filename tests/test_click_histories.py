@@ -0,0 +1,55 @@
+import pytest
+from app import click_histories, utils
+from app.click_histories import ClickHistories, ClickLog, append_clicks, load_or_build
+
+ROWS = [
+    ("1", "U2", "N1 N2", "N5-1"),
+    ("2", "U1", "N3", "N5-0"),
+    ("3", "U2", "N1 N2 N3", "N6-1"),
+    ("4", "U3", "", "N5-1"),
+    ("5", "U1", "N3 N4 N3", ""),
+    ("6", "U2", "N2", ""),
+]
+
+
+@pytest.fixture
+def behaviors(tmp_path):
+    path = tmp_path / "behaviors.tsv"
+    path.write_text("".join(f"{i}\t{u}\t11/11/2019 9:05:58 AM\t{h}\t{imp}\n" for i, u, h, imp in ROWS))
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [2, 100])
+def test_histories_match_get_user_clicks(behaviors, chunk_size):
+    expected = utils.get_user_clicks(utils.load_behaviors_data(behaviors))
+    histories = ClickHistories.from_behaviors(behaviors, chunk_size=chunk_size)
+    assert list(histories) == list(expected)
+    for user_id, clicks in expected.items():
+        assert histories[user_id] == list(dict.fromkeys(clicks))
+        evaluation = histories.evaluation_clicks(user_id)
+        assert sorted(evaluation) == sorted(clicks)
+        assert evaluation[-1:] == clicks[-1:]
+    assert histories.most_clicked(2) == ["N3", "N1"]  # by users, ties in first-seen order
+
+
+def test_cache_is_reused_until_the_source_changes(behaviors, tmp_path):
+    cache = tmp_path / "clicks"
+    first = load_or_build(behaviors, cache)
+    assert click_histories.cached_source(cache)["size"] == behaviors.stat().st_size
+    assert load_or_build(behaviors, cache)["U2"] == first["U2"]
+
+    assert append_clicks(behaviors, "U3", ["N7", "N1", "N7"], known=["N1"]) == ["N7"]
+    assert append_clicks(behaviors, "U3", ["N1"], known=["N1"]) == []
+    assert load_or_build(behaviors, cache)["U3"] == ["N7"]
+
+
+def test_click_log_follows_appended_rows(behaviors):
+    log = ClickLog(behaviors, behaviors.stat().st_size)
+    assert log.read() == []
+    append_clicks(behaviors, "U9", ["N1", "N2"])
+    with open(behaviors, "a") as f:
+        f.write("\tU8\ttime\tN3")  # still being written
+    assert log.read() == [("U9", ["N1", "N2"])]
+    with open(behaviors, "a") as f:
+        f.write("\t\n")
+    assert log.read() == [("U8", ["N3"])]
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from app import utils
+from app.embedding_store import EmbeddingStore
+
+
+def dense(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def sparse(n, dim=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return csr_matrix(rng.random((n, dim)) * (rng.random((n, dim)) < 0.2), dtype=np.float32)
+
+
+def to_dense(rows):
+    return rows.toarray() if hasattr(rows, "toarray") else np.asarray(rows)
+
+
+def live_vectors(store):
+    bank = store.bank()
+    return {news_id: to_dense(bank.rows([store.row_of(news_id)]))[0] for news_id in bank.ids[bank.index.live_rows]}
+
+
+@pytest.mark.parametrize("make", [dense, sparse])
+def test_round_trip_after_writes_and_compaction(tmp_path, make):
+    vectors = make(6)
+    store = EmbeddingStore.create(tmp_path, vectors, [f"N{i}" for i in range(6)])
+    store.append(["N6", "N7"], make(2, seed=1))
+    store.overwrite("N2", make(1, seed=2))
+    store.delete("N4")
+    before = live_vectors(store)
+    assert set(before) == {"N0", "N1", "N2", "N3", "N5", "N6", "N7"}
+    np.testing.assert_allclose(before["N2"], to_dense(utils.normalize_embeddings(make(1, seed=2)))[0], atol=1e-6)
+
+    def check(reopened):
+        after = live_vectors(reopened)
+        assert after.keys() == before.keys()
+        for news_id in before:
+            np.testing.assert_allclose(after[news_id], before[news_id], atol=1e-6)
+
+    check(EmbeddingStore(tmp_path))
+    store.compact()
+    assert len(store.manifest["segments"]) == 1 and store.n_rows == len(before)
+    check(store)
+    check(EmbeddingStore(tmp_path))
+
+
+def test_compaction_remaps_rows(tmp_path):
+    store = EmbeddingStore.create(tmp_path, dense(4), ["N0", "N1", "N2", "N3"])
+    store.delete("N1")
+    old_rows = {news_id: store.row_of(news_id) for news_id in ("N0", "N2", "N3")}
+    remap = store.compact()
+    assert remap[1] == -1
+    assert {news_id: remap[row] for news_id, row in old_rows.items()} == {"N0": 0, "N2": 1, "N3": 2}
+
+
+def test_writes_never_change_a_published_bank(tmp_path):
+    store = EmbeddingStore.create(tmp_path, dense(4), ["N0", "N1", "N2", "N3"])
+    bank = store.bank()
+    rows = np.array(bank.rows(np.arange(4)))
+    store.overwrite("N1", dense(1, seed=5))
+    store.append(["N4"], dense(1, seed=6))
+    store.compact()
+    assert bank.shape[0] == 4
+    np.testing.assert_array_equal(bank.rows(np.arange(4)), rows)
+    with pytest.raises(ValueError):
+        store.overwrite("missing", dense(1))
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from app.Evaluator import Evaluator
+
+
+@pytest.fixture
+def evaluator(registry):
+    snapshot = registry.current
+    user_clicks = {user_id: snapshot.user_clicks.evaluation_clicks(user_id) for user_id in snapshot.user_clicks}
+    return Evaluator(snapshot.recommender("bert").with_params(topk=10), user_clicks, k=10, block_size=16)
+
+
+def test_batched_metrics_match_evaluate_user(evaluator):
+    expected = [m for m in map(evaluator.evaluate_user, evaluator.user_clicks) if m is not None]
+    metrics = evaluator.evaluate_users()
+    assert len(expected) > evaluator.block_size
+    for name in ("precision", "recall", "ndcg"):
+        np.testing.assert_allclose(metrics[name], [m[name] for m in expected], atol=1e-4)
+
+
+def test_sharded_evaluation_matches_a_single_job(evaluator):
+    expected = evaluator.evaluate_all()
+    evaluator.n_jobs = 3
+    assert evaluator.evaluate_all() == pytest.approx(expected)
+
+
+def test_progress_ends_at_evaluate_all(evaluator):
+    *_, (done, total, averages) = evaluator.evaluate_progress(block_size=7)
+    assert done == total
+    assert averages == pytest.approx(evaluator.evaluate_all())
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_sweep_rows_match_evaluate_all(evaluator, n_jobs):
+    evaluator.n_jobs = n_jobs
+    rows = evaluator.sweep([0.2, 0.8, 0.2], [5, 10])
+    assert [(row["alpha"], row["topk"]) for row in rows] == [(0.2, 5), (0.2, 10), (0.8, 5), (0.8, 10)]
+    for row in rows:
+        single = Evaluator(evaluator.recommender.with_params(alpha=row["alpha"], topk=row["topk"]),
+                           evaluator.user_clicks, k=row["topk"], block_size=evaluator.block_size)
+        assert {name: row[name] for name in single.evaluate_all()} == pytest.approx(single.evaluate_all())
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from app.id_index import IdIndex
+
+
+def test_lookup_single_and_many():
+    index = IdIndex(["N3", "N1", "N2"])
+    assert index.row("N1") == 1 and index.row("N9") is None
+    np.testing.assert_array_equal(index.rows(["N2", "N9", "N3"]), [2, -1, 0])
+    assert index.rows([]).size == 0
+
+
+def test_append_retires_earlier_rows_and_keeps_the_last_repeat():
+    index = IdIndex(["N1", "N2"]).append(["N2", "N3", "N3"])
+    assert index.n_rows == 5 and len(index) == 3
+    assert [index.row(news_id) for news_id in ("N1", "N2", "N3")] == [0, 2, 4]
+    np.testing.assert_array_equal(index.dead, [False, True, False, True, False])
+
+
+def test_drop_and_without_leave_the_original_unchanged():
+    index = IdIndex(["N1", "N2", "N3"])
+    dropped = index.drop("N2")
+    assert "N2" not in dropped and "N2" in index
+    assert dropped.without(["N1", "N9"]).row("N1") is None
+    assert index.without(["N9"]) is index
+    with pytest.raises(ValueError):
+        dropped.drop("N2")
+
+
+def test_compacted_keeps_live_rows_in_order():
+    index = IdIndex(["N1", "N2", "N3"]).append(["N1"]).drop("N3")
+    compacted = index.compacted()
+    assert compacted.ids.tolist() == ["N2", "N1"]
+    assert not compacted.has_dead
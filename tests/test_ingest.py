@@ -0,0 +1,43 @@
+import json
+from app import ingest
+
+
+def item(news_id, title="local council approves new budget"):
+    return {"News_ID": news_id, "Category": "news", "Subcategory": "local",
+            "News_Title": title, "News_Abstract": "the vote passed"}
+
+
+def test_parse_lines_records_bad_lines():
+    lines = [
+        json.dumps(item("X1")),
+        "",
+        "{not json",
+        json.dumps({"News_ID": "X2"}),
+        "[1, 2]",
+    ]
+    errors = []
+    parsed = list(ingest.parse_lines(enumerate(lines, start=1), "jsonl", errors))
+    assert [p["News_ID"] for p in parsed] == ["X1"]
+    assert [e["line"] for e in errors] == [3, 4, 5]
+    assert "missing fields" in errors[1]["error"]
+
+
+def test_parse_tsv_rows():
+    row = "\t".join(["X1", "news", "local", "title", "abstract", "http://x"])
+    assert ingest.parse_item(row + "\n", "tsv")["News_Url"] == "http://x"
+    errors = []
+    assert not list(ingest.parse_lines([(1, "X1\tnews")], "tsv", errors))
+    assert len(errors) == 1
+
+
+def test_ingest_chunk_adds_new_items_and_skips_duplicates(registry):
+    report = ingest.IngestReport()
+    ingest.ingest_chunk(registry, [item("X1"), item("N1"), item("X2"), item("X1")], report, batch_size=2)
+    assert report.to_dict() == {"added": 2, "skipped": ["N1", "X1"], "errors": []}
+
+    snapshot = registry.current
+    for news_id in ("X1", "X2"):
+        assert news_id in snapshot.news
+        assert all(news_id in store for store in snapshot.stores.values())
+    results = snapshot.recommender("tfidf").with_params(topk=3).recommend("X1")
+    assert {r["News ID"] for r in results[:2]} == {"X1", "X2"}  # identical text
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random, vstack
+from app import utils
+from app.inverted_index import PostingLists, score_query
+from app.recommender import top_k_indices
+
+
+def segments(seed=0):
+    rng = np.random.default_rng(seed)
+    parts = [utils.normalize_embeddings(sparse_random(n, 200, density=0.05, random_state=rng, format="csr", dtype=np.float32))
+             for n in (300, 150, 50)]
+    return parts, np.cumsum([0] + [part.shape[0] for part in parts])
+
+
+def query(bank, row):
+    vector = bank[row]
+    return vector.indices, vector.data
+
+
+def test_unpruned_scores_are_exact():
+    parts, offsets = segments()
+    bank = vstack(parts, format="csr")
+    postings = [PostingLists.from_csr(part) for part in parts]
+    out = np.full(bank.shape[0], 7, dtype=np.float32)
+    terms, weights = query(bank, 10)
+    np.testing.assert_allclose(score_query(postings, offsets, terms, weights, out), (bank @ bank[10].T).toarray().ravel(),
+                               atol=1e-6)
+
+
+@pytest.mark.parametrize("with_dead", [False, True])
+def test_pruned_top_k_is_exact_over_live_rows(with_dead):
+    parts, offsets = segments()
+    bank = vstack(parts, format="csr")
+    postings = [PostingLists.from_csr(part) for part in parts]
+    dead = np.zeros(bank.shape[0], dtype=bool)
+    if with_dead:
+        dead[::3] = True
+    pruned = 0
+    for row in range(0, bank.shape[0], 25):
+        exact = (bank @ bank[row].T).toarray().ravel()
+        out = np.empty(bank.shape[0], dtype=np.float32)
+        terms, weights = query(bank, row)
+        score_query(postings, offsets, terms, weights, out, top_k=5, dead=dead if with_dead else None)
+
+        live_exact = np.where(dead, -np.inf, exact)
+        live_out = np.where(dead, -np.inf, out)
+        top = top_k_indices(live_exact, 5)
+        np.testing.assert_allclose(out[top], exact[top], atol=1e-6)
+        np.testing.assert_allclose(np.sort(live_out[top_k_indices(live_out, 5)]), np.sort(exact[top]), atol=1e-6)
+        assert (out <= exact + 1e-6).all()  # every other row is a lower bound
+        pruned += (out < exact - 1e-6).any()
+    assert pruned
+
+
+def test_pruned_recommendations_match_exact_ones(registry):
+    recommender = registry.current.recommender("tfidf").with_params(topk=10)
+    for news_id in ("N1", "N20", "N40"):
+        exact = [r["News ID"] for r in recommender.recommend(news_id)]
+        pruned = [r["News ID"] for r in recommender.with_params(prune=True).recommend(news_id)]
+        assert pruned == exact
@@ -0,0 +1,35 @@
+from app import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_count{route="/a"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+    ]
+
+
+def test_gauge_lines():
+    assert metrics.gauge("items", "Items.", (), {(): 3}) == ["# HELP items Items.", "# TYPE items gauge", "items 3"]
+    assert metrics.gauge("hits", "Hits.", ("mode",), {("bert",): 1}, kind="counter")[-1] == 'hits{mode="bert"} 1'
+
+
+def test_spans_feed_the_active_profile_only(registry):
+    recommender = registry.current.recommender("bert")
+    with metrics.profiling() as profile:
+        recommender.recommend("N1")
+    stages = profile.totals()
+    assert {"content", "cf", "blend", "select", "build"} <= stages.keys()
+    assert profile.server_timing().startswith("content;dur=")
+
+    recommender.recommend("N1")  # outside the context
+    assert profile.totals() == stages
+    assert any(line.startswith('recommender_stage_seconds_count{mode="bert",stage="content"}')
+               for line in metrics.STAGE_SECONDS.render())
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+from app.news_catalogue import COLUMNS, NewsCatalogue, record_of
+
+
+def item(news_id, title):
+    return {"News_ID": news_id, "Category": "news", "Subcategory": "local", "News_Title": title,
+            "News_Abstract": "abstract ü", "Entities_in_News_Title": [{"Label": "x"}]}
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    frame = pd.DataFrame(
+        [[f"cat{i}", "sub", f"title {i}", "", "http://x", "[]", "[]"] for i in range(3)],
+        index=pd.Index(["N1", "N2", "N3"], name="News ID"), columns=list(COLUMNS)
+    )
+    return NewsCatalogue.from_frame(tmp_path, frame)
+
+
+def snapshot(catalogue):
+    view = catalogue.view()
+    return {news_id: view.get(news_id) for news_id in view}
+
+
+def test_put_and_delete_shadow_the_base(catalogue):
+    view = catalogue.view()
+    catalogue.put([item("N2", "replaced"), item("X1", "new")])
+    catalogue.delete(["N3"])
+    assert view.get("N2")["News Title"] == "title 1"  # earlier views are unchanged
+    latest = catalogue.view()
+    assert list(latest) == ["N1", "N2", "X1"]
+    assert latest.get("N2")["News Title"] == "replaced" and latest.get("N3") is None
+    assert latest.get("X1")["Entities in News Title"] == str([{"Label": "x"}])
+    assert latest.records(["X1", "N9", "N1"], ("News Title",)) == [("new",), None, ("title 0",)]
+    with pytest.raises(ValueError):
+        catalogue.delete(["N3"])
+
+
+def test_reopen_replays_the_log_and_compaction_folds_it(catalogue, tmp_path):
+    catalogue.put([item("N2", "replaced"), item("X1", "new")])
+    catalogue.delete(["N1"])
+    expected = snapshot(catalogue)
+    assert catalogue.log_size == 3
+    assert snapshot(NewsCatalogue(tmp_path)) == expected
+
+    catalogue.compact()
+    assert catalogue.log_size == 0 and catalogue.manifest["generation"] == 1
+    assert snapshot(catalogue) == expected
+    reopened = NewsCatalogue(tmp_path)
+    assert snapshot(reopened) == expected and reopened.log_size == 0
+
+
+def test_record_of_defaults():
+    record = record_of({"News_ID": "X", "Category": "c", "Subcategory": "s", "News_Title": "t", "News_Abstract": "a"})
+    assert record["News Url"] == " " and record["Entities in News Abstract"] == "[]"
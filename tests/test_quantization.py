@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from app import assets, synthetic, utils
+from app.embedding_store import EmbeddingStore
+from app.quantization import QuantizedSegment, quantize
+from app.recommender import top_k_rows
+
+
+def normalized(n=500, dim=32, seed=0):
+    return utils.normalize_embeddings(np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32))
+
+
+@pytest.mark.parametrize("precision, tolerance", [("float16", 1e-3), ("int8", 2e-2)])
+def test_quantized_scores_are_close(precision, tolerance):
+    vectors = normalized()
+    codes, scales = quantize(vectors, precision)
+    scores = QuantizedSegment(codes, scales).score(vectors[:20], block_size=64)
+    np.testing.assert_allclose(scores, vectors[:20] @ vectors.T, atol=tolerance)
+
+
+def test_zero_rows_and_unknown_precision():
+    codes, scales = quantize(np.zeros((2, 4)), "int8")
+    assert not codes.any() and (scales == 1).all()
+    with pytest.raises(ValueError):
+        quantize(np.zeros((1, 4)), "int4")
+
+
+def test_rerank_makes_the_top_k_exact(tmp_path):
+    vectors = normalized()
+    store = EmbeddingStore.create(tmp_path, vectors, [f"N{i}" for i in range(len(vectors))])
+    bank = store.bank(precision="int8")
+    queries = vectors[:20]
+    exact = queries @ vectors.T
+    reranked = bank.rerank(bank.score_quantized(queries), queries, 50)
+    np.testing.assert_array_equal(top_k_rows(reranked, 10), top_k_rows(exact, 10))
+
+
+def test_int8_registry_matches_float32_rankings(assets_dir):
+    def recommend(precision):
+        registry = assets.AssetRegistry(assets_dir, bert_precision=precision,
+                                        encoder_loaders={"bert": lambda: synthetic.load_encoder(assets_dir)})
+        registry.load(wait_for_encoders=True)
+        recommender = registry.current.recommender("bert").with_params(alpha=1.0, topk=10)
+        return [[r["News ID"] for r in results] for results in recommender.recommend_many(["N1", "N2", "N3"])]
+
+    assert recommend("int8") == recommend("float32")
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+
+class NoEncoder:
+    def __getattr__(self, name):
+        raise AssertionError("the encoder must not run for stored articles")
+
+
+@pytest.mark.parametrize("mode", ["bert", "tfidf"])
+def test_stored_articles_are_not_re_encoded(registry, mode):
+    recommender = registry.current.recommender(mode).with_params()
+    expected = recommender.recommend("N7")
+    recommender.model = NoEncoder()
+    assert recommender.recommend("N7") == expected
+
+
+def test_stored_row_matches_encoding_the_text(registry):
+    recommender = registry.current.recommender("bert")
+    stored = recommender.calculate_content_score("N7")
+    encoded = recommender.score_vector(recommender.encode_text(" ".join(
+        registry.current.news.get("N7")[column] for column in ("Category", "Subcategory", "News Title", "News Abstract")
+    )))
+    np.testing.assert_allclose(stored, encoded, atol=1e-5)
+
+
+def test_rows_follow_the_store_after_an_append(registry):
+    store = registry.current.stores["bert"]
+    vector = store.bank().rows([store.row_of("N9")])
+    store.append(["N3"], vector)  # N3 moves to a new row holding N9's vector
+    recommender = registry.refresh().recommender("bert")
+    scores = recommender.calculate_content_score("N3")
+    assert scores[recommender.row_of("N3")] == pytest.approx(1.0, abs=1e-5)
+    assert scores[recommender.row_of("N9")] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_top_k_matches_a_stable_full_sort():
+    from app.recommender import top_k_indices, top_k_rows
+    scores = np.random.default_rng(0).integers(0, 5, size=(4, 50)).astype(np.float32)  # plenty of ties
+    for k in (1, 7, 50, 60):
+        expected = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        np.testing.assert_array_equal(top_k_rows(scores, k), expected)
+        np.testing.assert_array_equal(top_k_indices(scores[0], k), expected[0])
+
+
+def test_results_are_ranked_by_hybrid_score(registry):
+    results = registry.current.recommender("bert").with_params(topk=8).recommend("N11")
+    scores = [result["hybrid_score"] for result in results]
+    assert len(results) == 8
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_deleted_and_excluded_rows_are_never_selected(registry):
+    store = registry.current.stores["bert"]
+    store.delete("N12")
+    recommender = registry.refresh().recommender("bert")
+    hybrid = np.zeros(recommender.n_items, dtype=np.float32)
+    hybrid[recommender.row_of("N13")] = 1.0
+    hybrid[store.index.rows(["N12"])[0]] = 2.0  # tombstoned row
+    exclude = np.zeros(recommender.n_items, dtype=bool)
+    exclude[recommender.row_of("N13")] = True
+    top = recommender.select_top(hybrid, 5, exclude=exclude)
+    assert not set(recommender.ids[top]) & {"N12", "N13"}
+
+
+@pytest.mark.parametrize("mode", ["bert", "tfidf"])
+def test_recommend_many_matches_one_at_a_time(registry, mode):
+    recommender = registry.current.recommender(mode).with_params(topk=6)
+    targets = [f"N{i}" for i in range(1, 40, 3)]
+    batched = recommender.recommend_many(targets, block_size=4)
+    assert len(batched) == len(targets)
+    for target, results in zip(targets, batched):
+        expected = recommender.recommend(target)
+        assert [r["News ID"] for r in results] == [r["News ID"] for r in expected]
+        np.testing.assert_allclose([r["hybrid_score"] for r in results],
+                                   [r["hybrid_score"] for r in expected], atol=1e-5)
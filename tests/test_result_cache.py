@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+from app import result_cache
+from app.result_cache import ResultCache
+
+RESULT = [{"News ID": "N2", "hybrid_score": 0.5}]
+
+
+def snapshot(version, content_version=None):
+    return SimpleNamespace(version=version, content_version=version if content_version is None else content_version)
+
+
+def key(news_id="N1"):
+    return (news_id, "bert", 0.5, 10, None, False)
+
+
+def test_a_new_content_version_drops_older_entries():
+    cache = ResultCache()
+    cache.put(key(), snapshot(1), RESULT)
+    assert cache.get(key(), snapshot(1)) == RESULT
+    assert cache.get(key(), snapshot(2)) is None
+    assert cache.stats()["entries"] == 0
+    cache.put(key(), snapshot(1), RESULT)  # computed on a superseded version
+    assert cache.get(key(), snapshot(2)) is None and cache.stats()["entries"] == 0
+
+
+def test_cf_only_versions_keep_entries_and_invalidate_items_drops_some():
+    cache = ResultCache()
+    cache.put(key("N1"), snapshot(1), RESULT)
+    cache.put(key("N2"), snapshot(1), RESULT)
+    cache.invalidate_items(["N1"], 2)
+    cf_update = snapshot(2, content_version=1)
+    assert cache.get(key("N1"), cf_update) is None
+    assert cache.get(key("N2"), cf_update) == RESULT
+    cache.put(key("N1"), snapshot(1), RESULT)  # a request still on the old snapshot
+    assert cache.get(key("N1"), cf_update) is None
+    cache.put(key("N1"), cf_update, RESULT)
+    assert cache.get(key("N1"), cf_update) == RESULT
+
+
+def test_bounds_and_invalidate():
+    cache = ResultCache(max_entries=2)
+    for news_id in ("N1", "N2", "N3"):
+        cache.put(key(news_id), snapshot(1), RESULT)
+    assert cache.get(key("N1"), snapshot(1)) is None
+    assert cache.stats()["evictions"] == 1
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0 and cache.bytes == 0
+
+    expiring = ResultCache(ttl=-1)
+    expiring.put(key(), snapshot(1), RESULT)
+    assert expiring.get(key(), snapshot(1)) is None
+
+
+def test_writes_without_changes_keep_the_content_version(registry):
+    version = registry.current.content_version
+    with registry.write():
+        pass
+    assert registry.current.content_version == version
+    registry.update_cf_index(lambda cf: cf)
+    assert registry.current.content_version == version < registry.current.version
+
+    cache = ResultCache()
+    assert result_cache.warm(cache, registry.current, ["N1", "N2", "missing"]) == 2
+    assert cache.get(key("N1"), registry.current) is not None
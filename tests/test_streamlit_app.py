@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+import pytest
+import requests
+
+streamlit = pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+APP = Path(__file__).parents[1] / "app" / "streamlit_app.py"
+RESULT = {"News ID": "N2", "Category": "news", "Subcategory": "local", "News Title": "Title", "News Abstract": "Abstract"}
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Answers the API calls of the app, counting them by path; `down` makes every call fail."""
+    state = {"calls": {}, "down": False}
+
+    def request(session, method, url, **kwargs):
+        path = url.split("localhost:8000", 1)[1]
+        state["calls"][path] = state["calls"].get(path, 0) + 1
+        if state["down"]:
+            raise requests.ConnectionError("connection refused")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({"version": 1} if path == "/version" else [RESULT]).encode()
+        return response
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    streamlit.cache_data.clear()
+    return state
+
+
+def recommend(app, news_id):
+    app.text_input[0].input(news_id)
+    return app.button[0].click().run()
+
+
+def test_results_are_cached_per_index_version(backend):
+    app = AppTest.from_file(str(APP), default_timeout=30).run()
+    recommend(app, "N1")
+    recommend(app, "N1")
+    assert not app.exception
+    assert backend["calls"]["/get-hybrid-simil/N1"] == 1
+    assert "Title" in [markdown.value.strip("*") for markdown in app.markdown]
+
+
+def test_an_unavailable_backend_is_reported(backend):
+    backend["down"] = True
+    app = recommend(AppTest.from_file(str(APP), default_timeout=30).run(), "N1")
+    assert not app.exception
+    assert "Backend not available" in app.error[0].value
@@ -0,0 +1,46 @@
+import numpy as np
+from app import utils
+from app.user_profiles import UserProfileStore, recency_weights
+
+
+def expected_profile(recommender, history, decay=0.9):
+    rows = recommender.rows_of(history)
+    weights = recency_weights(len(history), decay)
+    return weights @ recommender.bank.rows(rows) / weights.sum()
+
+
+def test_profile_is_the_recency_weighted_mean(registry):
+    bert = registry.current.recommender("bert")
+    store = UserProfileStore.build({"U1": ["N1", "N2", "N3"]}, bert)
+    np.testing.assert_allclose(store.profile("U1", bert), expected_profile(bert, ["N1", "N2", "N3"]), atol=1e-5)
+
+
+def test_add_clicks_matches_a_rebuild(registry):
+    bert = registry.current.recommender("bert")
+    store = UserProfileStore.build({"U1": ["N1", "N2"]}, bert)
+    store.add_clicks("U1", ["N3", "N4"], bert)
+    store.add_clicks("U2", ["N5"], bert)  # new user
+    rebuilt = UserProfileStore.build({"U1": ["N1", "N2", "N3", "N4"], "U2": ["N5"]}, bert)
+    for user_id in ("U1", "U2"):
+        assert store.history(user_id) == rebuilt.history(user_id)
+        np.testing.assert_allclose(store.profile(user_id, bert), rebuilt.profile(user_id, bert), atol=1e-5)
+
+
+def test_tfidf_profile_and_unknown_clicks(registry):
+    tfidf = registry.current.recommender("tfidf")
+    bert = registry.current.recommender("bert")
+    store = UserProfileStore.build({"U1": ["N1", "unknown", "N2"], "U2": ["unknown"]}, bert)
+    weights = recency_weights(3)[[0, 2]]
+    expected = weights @ tfidf.bank.rows(tfidf.rows_of(["N1", "N2"])).toarray() / weights.sum()
+    np.testing.assert_allclose(store.profile("U1", tfidf).toarray().ravel(), expected, atol=1e-5)
+    assert store.profile("U2", bert) is None
+    assert store.profile("U2", tfidf) is None
+
+
+def test_clicked_articles_are_not_recommended(registry):
+    bert = registry.current.recommender("bert").with_params(topk=20)
+    history = ["N1", "N2", "N3"]
+    store = UserProfileStore.build({"U1": history}, bert)
+    results = bert.recommend_profile(utils.normalize_embeddings(store.profile("U1", bert)), history)
+    assert len(results) == 20
+    assert not {r["News ID"] for r in results} & set(history)
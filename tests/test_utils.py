@@ -0,0 +1,42 @@
+import re
+import string
+import pytest
+from app import utils
+
+TEXTS = [
+    "The Quick brown [note] fox, visit https://example.com now!",
+    "<b>Bold</b> claims\nabout 3rd-quarter results in 2024",
+    "",
+    "Running dogs are the runners' best friends",
+    12345,
+]
+
+
+@pytest.fixture
+def nltk_stand_in(monkeypatch):
+    monkeypatch.setattr(utils, "_stopwords", lambda: frozenset({"the", "are", "about", "in"}))
+    monkeypatch.setattr(utils, "_lemmatize", lambda word: word.rstrip("s"))
+
+
+def original_clean_text(text):
+    """The sequential regex pipeline clean_text replaced."""
+    text = str(text).lower()
+    text = re.sub(r'\[.*?\]', '', text)
+    text = re.sub(r'https?://\S+|www\.\S+', '', text)
+    text = re.sub(r'<.*?>+', '', text)
+    text = re.sub('[%s]' % re.escape(string.punctuation), '', text)
+    text = re.sub('\n', '', text)
+    text = re.sub(r'\w*\d\w*', '', text)
+    text = ' '.join(word for word in text.split(' ') if word not in utils._stopwords())
+    return ' '.join(utils._lemmatize(word) for word in text.split(" "))
+
+
+def test_clean_text_matches_the_original_pipeline(nltk_stand_in):
+    for text in TEXTS:
+        assert utils.clean_text(text) == original_clean_text(text)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_clean_texts_keeps_input_order(nltk_stand_in, n_jobs):
+    texts = TEXTS * 5
+    assert list(utils.clean_texts(iter(texts), n_jobs=n_jobs, chunksize=2)) == [utils.clean_text(t) for t in texts]
@@ -0,0 +1,52 @@
+from app.write_queue import WriteJob, WriteQueue, coalesce
+
+
+def item(news_id, title="title"):
+    return {"News_ID": news_id, "Category": "news", "Subcategory": "local",
+            "News_Title": title, "News_Abstract": "abstract"}
+
+
+def test_coalesce_keeps_the_net_effect_per_id():
+    catalogue = {"N1", "N2", "N3"}
+    jobs = [
+        WriteJob("update", "N1", item("N1", "first")),
+        WriteJob("update", "N1", item("N1", "second")),
+        WriteJob("delete", "N2"),
+        WriteJob("add", "N2", item("N2", "re-added")),
+        WriteJob("add", "X1", item("X1")),
+        WriteJob("delete", "X1"),
+        WriteJob("delete", "N3"),
+    ]
+    upserts, deletes, accepted = coalesce(jobs, catalogue)
+    assert [(u["News_ID"], u["News_Title"]) for u in upserts] == [("N1", "second"), ("N2", "re-added")]
+    assert deletes == ["N3"]  # X1 never reached the catalogue
+    assert accepted == jobs
+
+
+def test_coalesce_fails_jobs_invalid_at_their_point_in_the_sequence():
+    jobs = [
+        WriteJob("add", "N1", item("N1")),      # already exists
+        WriteJob("update", "X1", item("X1")),   # not yet added
+        WriteJob("delete", "N2"),
+        WriteJob("delete", "N2"),               # already deleted by the job before
+    ]
+    upserts, deletes, accepted = coalesce(jobs, {"N1", "N2"})
+    assert (upserts, deletes, accepted) == ([], ["N2"], [jobs[2]])
+    assert [job.status for job in jobs] == ["failed", "failed", "queued", "failed"]
+    assert jobs[0].error == "News item already exists." and jobs[1].error == "News ID not found."
+
+
+def test_queue_applies_a_batch_in_one_version(registry, tmp_path):
+    writes = WriteQueue(registry, journal_dir=tmp_path / "jobs")
+    version = registry.current.version
+    jobs = [writes.submit("add", "X1", item("X1")), writes.submit("delete", "N1"), writes.submit("delete", "X9")]
+    writes.start()
+    assert writes.join(timeout=30)
+
+    assert [job.status for job in jobs] == ["done", "done", "failed"]
+    assert jobs[0].batch == 3
+    assert jobs[0].version == jobs[1].version == registry.current.version > version
+    assert "X1" in registry.current.news and "N1" not in registry.current.news
+    # Another worker reads the status from the journal
+    journal = WriteQueue(registry, journal_dir=tmp_path / "jobs")
+    assert journal.job(jobs[2].job_id).to_dict() == jobs[2].to_dict()